@@ -0,0 +1,123 @@
+import os
+import json
+import math
+from datetime import datetime
+from incremental_analysis import season_points
+from geojson_stream import iter_features
+
+FIRES_PATH = 'static/fires.json'
+FIRE_PROXIMITY_KM = float(os.environ.get('FIRE_PROXIMITY_KM', 50))  # Bu mesafenin dışındaki yangınlar etkisiz
+
+# Öncelik bileşenlerinin ağırlıkları (toplam 1.0)
+PRIORITY_WEIGHTS = {
+    'risk': 0.45,
+    'fire': 0.30,
+    'area': 0.15,
+    'season': 0.10
+}
+
+# Öncelik seviyeleri: (isim, alt sınır). Her seviye bitince ara sonuç yayınlanır.
+PRIORITY_TIERS = [
+    ('kritik', 0.65),
+    ('yuksek', 0.45),
+    ('orta', 0.25),
+    ('dusuk', 0.0)
+]
+
+
+# Öncelik hesabı ve feature kimliği (spatial_index.feature_id) için gereken alanlar
+STUB_PROPERTY_KEYS = (
+    'feature_id', 'id', '@id', 'osm_id', 'name', 'centroid_lat', 'centroid_lon', 'area',
+    'combined_risk_score', 'risk_skoru'
+)
+
+
+def priority_stub(feature):
+    """Feature'ın öncelik ve kimlik hesabına yeten hafif kopyası (geometri ve sonuçlar hariç)"""
+    properties = feature.get('properties') or {}
+    stub = {'properties': {key: properties[key] for key in STUB_PROPERTY_KEYS if key in properties}}
+    if feature.get('id') is not None:
+        stub['id'] = feature['id']
+    return stub
+
+
+def priority_stubs(path):
+    """Kaynak dosyayı akış halinde okuyup öncelik seviyeleri için hafif feature listesi üretir"""
+    return [priority_stub(feature) for feature in iter_features(path)]
+
+
+def load_active_fires(path=FIRES_PATH):
+    """fires.json'dan aktif yangın noktalarını okur"""
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            fires = json.load(f)
+    except Exception as e:
+        print(f"Yangın verisi okunamadı: {e}")
+        return []
+    return [fire for fire in fires if fire.get('status') == 'active' and fire.get('lat') is not None and fire.get('lon') is not None]
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """İki nokta arasındaki büyük daire mesafesi (km)"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 6371.0 * 2 * math.asin(math.sqrt(a))
+
+
+def fire_proximity(lat, lon, fires, radius_km=FIRE_PROXIMITY_KM):
+    """En yakın aktif yangına göre 0-1 arası yakınlık (1: yangının içinde)"""
+    if not fires or lat is None or lon is None:
+        return 0.0
+    nearest = min(haversine_km(lat, lon, fire['lat'], fire['lon']) for fire in fires)
+    return max(0.0, 1.0 - nearest / radius_km)
+
+
+def previous_score(properties, previous=None):
+    """Alanın bilinen son risk skoru (önceki analiz, yoksa mevcut properties)"""
+    for source in (previous, properties):
+        if not source:
+            continue
+        score = source.get('combined_risk_score', source.get('risk_skoru'))
+        if score is not None:
+            return float(score)
+    return 50.0  # Bilinmiyorsa ortada
+
+
+def priority_score(properties, previous, fires, max_log_area, season):
+    """Alanın 0-1 arası analiz önceliği"""
+    area = properties.get('area') or 0
+    area_factor = math.log1p(area) / max_log_area if max_log_area > 0 else 0.0
+    return (
+        PRIORITY_WEIGHTS['risk'] * min(previous_score(properties, previous), 100.0) / 100.0
+        + PRIORITY_WEIGHTS['fire'] * fire_proximity(properties.get('centroid_lat'), properties.get('centroid_lon'), fires)
+        + PRIORITY_WEIGHTS['area'] * area_factor
+        + PRIORITY_WEIGHTS['season'] * season / 10.0
+    )
+
+
+def priority_tiers(features, previous_lookup=None, fires=None, when=None):
+    """
+    Feature indekslerini öncelik seviyelerine ayırır.
+    previous_lookup(feature, index): önceki analiz properties'i veya None
+    [(seviye, [indeks, ...]), ...] döndürür; seviyeler ve içleri en öncelikliden başlar.
+    """
+    fires = load_active_fires() if fires is None else fires
+    season = season_points((when or datetime.now()).month)
+    max_log_area = max((math.log1p((feature.get('properties') or {}).get('area') or 0) for feature in features), default=0.0)
+
+    scored = []
+    for i, feature in enumerate(features):
+        properties = feature.get('properties') or {}
+        previous = previous_lookup(feature, i) if previous_lookup else None
+        scored.append((priority_score(properties, previous, fires, max_log_area, season), i))
+    scored.sort(key=lambda item: -item[0])
+
+    tiers = [(name, []) for name, _ in PRIORITY_TIERS]
+    for score, i in scored:
+        for t, (_, minimum) in enumerate(PRIORITY_TIERS):
+            if score >= minimum:
+                tiers[t][1].append(i)
+                break
+    return [(name, indices) for name, indices in tiers if indices]
@@ -1,10 +1,36 @@
-from flask import Flask, render_template, request, jsonify, make_response, send_file
+from flask import Flask, render_template, request, jsonify, make_response, send_file, Response, stream_with_context
 import requests
 from datetime import datetime, timedelta
 import os
-from auto_updater import auto_updater
+
+# Environment variables yükle (modüllerin ayarları okunmadan önce)
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    print("python-dotenv bulunamadı, environment variables manuel olarak ayarlanmalı")
+
+from auto_updater import auto_updater, configure_logging
 from lm_risk_analyzer import lm_analyzer, get_cached_analysis, cache_analysis, clear_expired_cache, cache_data, update_weather_date
 from cache_manager import cache_manager
+from spatial_index import risk_index, feature_id as compute_feature_id
+from feature_query import feature_query_index, build_lod_data, save_lod_data, lod_path_for
+from risk_grid import risk_grid, grid_path_for, GRID_ZOOM_THRESHOLD
+from vector_tiles import tile_store
+from feature_details import feature_detail_store, save_map_data, map_path_for
+from snapshot_store import Snapshot, write_snapshot, read_snapshot_metadata, SNAPSHOT_DIR
+from geojson_stream import iter_features, iter_selected_in_order, PropertySpool
+from risk_history import risk_history
+from risk_timeline import compact_hourly, build_risk_timeline
+from forecast_projection import forecast_projector, forecast_path_for, weather_cell
+from incremental_analysis import INCREMENTAL_ANALYSIS, analysis_inputs, reanalysis_reason, load_previous_results, previous_for, carry_forward
+from analysis_priority import priority_tiers, priority_stubs
+from run_journal import run_journal
+from run_profile import start_profile, finish_profile, span
+from rate_limit_store import rate_limit_store
+from quota_budget import quota_budget
+from upstream_control import weather_controller, raise_for_overload, upstream_status
+from metrics import registry as metrics_registry, METRICS_CONTENT_TYPE, track_upstream, track_rate_limit, cache_event, record_run_throughput, RUN_DURATION, RUNS_IN_PROGRESS
 import threading
 import concurrent.futures
 import time
@@ -12,30 +38,28 @@ import json
 import hashlib
 from functools import lru_cache
 
-# Environment variables yükle
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except ImportError:
-    print("python-dotenv bulunamadı, environment variables manuel olarak ayarlanmalı")
-
 app = Flask(__name__)
 
 # Global değişkenler
-ANALYZED_GEOJSON_PATH = 'static/analyzed_data.json'
+# Analiz sonucunun asıl kaydı; harita yükü, indeksler, grid ve detaylar bundan türetilir.
+# GeoJSON yalnızca /export/analyzed.geojson ile akış halinde üretilir
+ANALYZED_SNAPSHOT_PATH = 'static/analyzed_data.snap'
+LEGACY_GEOJSON_PATH = 'static/analyzed_data.json'  # Eski sürümlerin yazdığı, artık güncellenmeyen dosya
+FORECAST_PATH = forecast_path_for(ANALYZED_SNAPSHOT_PATH)
 ANALYSIS_LOCK = threading.Lock()
 LAST_ANALYSIS_TIME = None
 ANALYSIS_IN_PROGRESS = False
 
 # WeatherAPI.com API anahtarı
 WEATHERAPI_KEY = os.environ.get('WEATHERAPI_KEY', "ca1b321f6c3948438c8181905250607")
+WEATHERAPI_BASE_URL = os.environ.get('WEATHERAPI_BASE_URL', 'http://api.weatherapi.com/v1')  # Benchmark'ta sahte sunucuya yönlendirilebilir
 
-# Groq API kontrolü
-GROQ_API_KEY = os.environ.get('GROQ_API_KEY')
-if not GROQ_API_KEY:
-    print("⚠️ UYARI: GROQ_API_KEY bulunamadı! LM analizi dummy mod ile çalışacak.")
-else:
-    print("✅ GROQ_API_KEY bulundu. LM analizi aktif.")
+# Arka plan işleri (auto updater, başlangıç ve günlük analiz) bu süreçte çalışsın mı?
+# Birden fazla gunicorn worker'ında sadece birinde açık bırakılmalı
+BACKGROUND_JOBS = os.environ.get('BACKGROUND_JOBS', '1') != '0'
+APP_INITIALIZED = False
+APP_INIT_LOCK = threading.Lock()
+APP_STARTED_AT = None
 
 # Performans optimizasyonu için global değişkenler
 weather_cache = {}
@@ -43,42 +67,49 @@ weather_cache_lock = threading.Lock()
 MAX_WORKERS = 2  # API limiti için azaltıldı
 API_DELAY = 0.7  # 100 req/min için güvenli gecikme
 
-# Rate limiting
-last_request_time = 0
-request_lock = threading.Lock()
-request_queue = []
-
 def check_api_rate_limit():
     """API rate limiting kontrolü - dakikada maksimum 100 istek"""
-    global last_request_time
-    with request_lock:
-        current_time = time.time()
-        time_since_last = current_time - last_request_time
-        
-        # Minimum 0.6 saniye bekle (100 req/min = 1.67 req/sec)
-        if time_since_last < API_DELAY:
-            sleep_time = API_DELAY - time_since_last
-            time.sleep(sleep_time)
-        
-        last_request_time = time.time()
+    # İstekler arası en az API_DELAY saniye (tek jetonluk bucket; durum süreçler arası paylaşılır)
+    wait_time = rate_limit_store.reserve('weatherapi_app', 1, API_DELAY)
+    if wait_time > 0:
+        time.sleep(wait_time)
 
 def get_weather_data_for_coordinates(lat, lon, use_cache=True):
     """Belirli koordinatlar için hava durumu verilerini çeker"""
+    # Aylık kota risk altındaysa aynı hücredeki alanlar hücre merkezini ve cache'i paylaşır
+    if quota_budget.conserving('weatherapi'):
+        _, lat, lon = weather_cell(lat, lon)
     cache_key = f"{lat:.4f}_{lon:.4f}"
     
     # Cache kontrolü
+    stale_weather = None  # Servis erişilemezse kullanılacak süresi dolmuş veri
     if use_cache:
         with weather_cache_lock:
             if cache_key in weather_cache:
                 cache_time, weather_data = weather_cache[cache_key]
-                # 23 saat cache (günlük güncelleme için)
-                if time.time() - cache_time < 82800:  # 23 saat
+                # 23 saat cache (günlük güncelleme için; kota risk altındaysa daha uzun)
+                if time.time() - cache_time < 82800 * quota_budget.ttl_multiplier('weatherapi'):
+                    cache_event('app_weather', 'hit')
                     return weather_data, None
+                del weather_cache[cache_key]
+                cache_event('app_weather', 'eviction')
+                stale_weather = weather_data
+        cache_event('app_weather', 'miss')
+    
+    def throttle():
+        # Rate limit kontrolü (eşzamanlılık slotu tutulmadan, gecikme ölçümü dışında)
+        with track_rate_limit('weatherapi_app'):
+            check_api_rate_limit()
+    
+    def request_weather(endpoint, url, params):
+        # Eşzamanlılık limiti, geri çekilmeli yeniden deneme ve devre kesici ile WeatherAPI çağrısı
+        def fetch():
+            with track_upstream('weatherapi', endpoint):
+                response = requests.get(url, params=params, timeout=5)
+            return raise_for_overload(response)
+        return weather_controller.call(fetch, transient=(requests.exceptions.Timeout, requests.exceptions.ConnectionError), throttle=throttle)
     
     try:
-        # Rate limit kontrolü
-        check_api_rate_limit()
-        
         # Bugünün 12:00 verisi
         today = datetime.now()
         today_noon = today.replace(hour=12, minute=0, second=0, microsecond=0)
@@ -92,14 +123,14 @@ def get_weather_data_for_coordinates(lat, lon, use_cache=True):
         # Saat 12:00'dan sonraysa güncel veri, öncesiyse history API
         if today.hour >= 12 and today_noon.date() == today.date():
             # Güncel veri için current API kullan
-            url = "http://api.weatherapi.com/v1/current.json"
+            url = f"{WEATHERAPI_BASE_URL}/current.json"
             params = {
                 'key': WEATHERAPI_KEY,
                 'q': f"{lat},{lon}",
                 'aqi': 'no'
             }
             
-            response = requests.get(url, params=params, timeout=5)
+            response = request_weather('current', url, params)
             
             if response.status_code != 200:
                 error_data = response.json()
@@ -118,7 +149,7 @@ def get_weather_data_for_coordinates(lat, lon, use_cache=True):
             }
         else:
             # Geçmiş veri için history API kullan
-            url = "http://api.weatherapi.com/v1/history.json"
+            url = f"{WEATHERAPI_BASE_URL}/history.json"
             params = {
                 'key': WEATHERAPI_KEY,
                 'q': f"{lat},{lon}",
@@ -126,7 +157,7 @@ def get_weather_data_for_coordinates(lat, lon, use_cache=True):
                 'aqi': 'no'
             }
             
-            response = requests.get(url, params=params, timeout=5)
+            response = request_weather('history', url, params)
             
             if response.status_code != 200:
                 error_data = response.json()
@@ -144,7 +175,9 @@ def get_weather_data_for_coordinates(lat, lon, use_cache=True):
                     'nem': hour_data['humidity'],
                     'ruzgar_hizi': hour_data['wind_kph'],
                     'yagis_7_gun': hour_data.get('precip_mm', 0),
-                    'data_time': today_noon.isoformat()
+                    'data_time': today_noon.isoformat(),
+                    # Aynı yanıttaki 24 saatin tamamı (gün içi risk eğrisi için)
+                    'hourly': compact_hourly(forecast_day)
                 }
             else:
                 return None, "12:00 verisi bulunamadı"
@@ -158,6 +191,10 @@ def get_weather_data_for_coordinates(lat, lon, use_cache=True):
         
     except Exception as e:
         print(f"Veri çekme hatası: {str(e)}")
+        # Servis erişilemezken (devre açık / aşırı yük) süresi dolmuş veri varsa kullan
+        if stale_weather is not None:
+            cache_event('app_weather', 'stale_hit')
+            return stale_weather, None
         return None, str(e)
 
 def analyze_single_area(feature_data):
@@ -198,11 +235,24 @@ def analyze_single_area(feature_data):
             'name': name
         }
         
-        combined_risk = lm_analyzer.analyze_forest_area(
-            (centroid_lat, centroid_lon),
-            weather_data,
-            area_info
-        )
+        with span('llm_call'):
+            combined_risk = lm_analyzer.analyze_forest_area(
+                (centroid_lat, centroid_lon),
+                weather_data,
+                area_info
+            )
+        
+        with span('scoring'):
+            # Saatlik veri varsa günlük risk eğrisi ve zirve saati
+            combined_risk.update(build_risk_timeline(
+                weather_data.get('hourly'),
+                auto_updater.hesapla_risk_skoru,
+                auto_updater.get_risk_level
+            ))
+            
+            # Sonraki artımlı çalıştırmada karşılaştırılacak girdiler
+            combined_risk['analysis_inputs'] = analysis_inputs(weather_data)
+            combined_risk['analysis_carried_forward'] = False
         
         # Cache'e kaydet
         cache_manager.cache_analysis(
@@ -221,8 +271,116 @@ def analyze_single_area(feature_data):
         print(f"Analiz hatası: {str(e)}")
         return None
 
-def analyze_all_areas_backend(force_refresh=False):
-    """Tüm alanları backend'de analiz eder ve sonucu kaydeder"""
+def load_analysis_metadata():
+    """Son analizin metadata'sını döndürür; sadece snapshot başlığı okunur"""
+    if os.path.exists(ANALYZED_SNAPSHOT_PATH):
+        return read_snapshot_metadata(ANALYZED_SNAPSHOT_PATH)
+    return None
+
+def build_derived_outputs():
+    """Yayınlanan snapshot'tan harita yükünü, detay deposunu, indeksleri, grid'i ve tile'ları üretir"""
+    try:
+        # İndeksler snapshot görünümünü tutar; feature'lar listeye alınmaz, her adım snapshot'ı tarar
+        snapshot = Snapshot(ANALYZED_SNAPSHOT_PATH)
+        analyzed_features = snapshot.features()
+        analyzed_mtime = os.path.getmtime(ANALYZED_SNAPSHOT_PATH)
+        
+        # Harita için sadece stil alanlarını içeren hafif yük ve ağır alanlar için detay deposu
+        save_map_data(analyzed_features, snapshot.metadata, map_path_for(ANALYZED_SNAPSHOT_PATH))
+        feature_detail_store.build(snapshot.features(geometry=False))
+        
+        # Nokta sorguları için mekansal indeksi güncelle
+        risk_index.build(analyzed_features, ANALYZED_SNAPSHOT_PATH, analyzed_mtime)
+        
+        # Zoom seviyelerine göre sadeleştirilmiş geometrileri önceden hesapla
+        lod_data = build_lod_data(analyzed_features)
+        save_lod_data(lod_data, lod_path_for(ANALYZED_SNAPSHOT_PATH))
+        feature_query_index.build(analyzed_features, lod_data, ANALYZED_SNAPSHOT_PATH, analyzed_mtime)
+        
+        # Düşük zoom için risk grid'ini güncelle (sadece değişen hücreler)
+        if risk_grid.updated_at is None:
+            risk_grid.load(grid_path_for(ANALYZED_SNAPSHOT_PATH))
+        risk_grid.update(analyzed_features, source_mtime=analyzed_mtime)
+        risk_grid.save(grid_path_for(ANALYZED_SNAPSHOT_PATH))
+        
+        # Harita için vektör tile'ları önceden üret
+        tile_store.build(analyzed_features)
+        
+        # Sadece değişen değerleri risk geçmişine ekle
+        risk_history.record_run(snapshot.features(geometry=False), source='analyze_all_areas')
+        
+    except Exception as e:
+        print(f"Türetilmiş veri üretim hatası: {str(e)}")
+
+def publish_partial_results(features, metadata, changed):
+    """
+    Öncelik seviyesi bitince ara sonucu yayınlar: sadece harita yükü, grid ve seviyede
+    değişen alanların tile'ları güncellenir; snapshot, detay deposu, indeksler ve risk
+    geçmişi son yayında güncellenir. 'features' her çağrıda yeni bir akış döndürür.
+    """
+    try:
+        save_map_data(features(), metadata, map_path_for(ANALYZED_SNAPSHOT_PATH))
+        
+        # Grid snapshot'a göre güncel sayılır; üzerine sadece seviyenin sonuçları uygulanır
+        if risk_grid.updated_at is None:
+            risk_grid.load(grid_path_for(ANALYZED_SNAPSHOT_PATH))
+        snapshot_mtime = os.path.getmtime(ANALYZED_SNAPSHOT_PATH) if os.path.exists(ANALYZED_SNAPSHOT_PATH) else None
+        risk_grid.update(features(), source_mtime=snapshot_mtime, indices=changed)
+        risk_grid.save(grid_path_for(ANALYZED_SNAPSHOT_PATH))
+        
+        tile_store.update(features(), changed)
+    except Exception as e:
+        print(f"Ara sonuç yayınlama hatası: {str(e)}")
+
+def run_forecast_projection(features=None):
+    """Önümüzdeki günler için hava durumu hücresi başına tek çağrıyla risk projeksiyonu üretir"""
+    with forecast_projector.lock:
+        if forecast_projector.in_progress:
+            print("Tahmin projeksiyonu zaten devam ediyor")
+            return False
+        forecast_projector.in_progress = True
+    
+    try:
+        if features is None:
+            if not os.path.exists(ANALYZED_SNAPSHOT_PATH):
+                return False
+            # Projeksiyon geometri kullanmaz; feature'lar hücre hücre snapshot'tan okunur
+            features = Snapshot(ANALYZED_SNAPSHOT_PATH).features(geometry=False)
+        
+        data = forecast_projector.run(
+            features,
+            WEATHERAPI_KEY,
+            auto_updater.hesapla_risk_skoru,
+            auto_updater.get_risk_level,
+            rate_limit=check_api_rate_limit,
+            max_workers=MAX_WORKERS
+        )
+        forecast_projector.save(data, FORECAST_PATH)
+        return True
+        
+    except Exception as e:
+        print(f"Tahmin projeksiyonu hatası: {str(e)}")
+        return False
+    finally:
+        forecast_projector.in_progress = False
+
+def publish_analysis(analyzed_data):
+    """Analiz sonucunu ikili snapshot olarak kaydeder ve türetilmiş verileri snapshot'tan günceller"""
+    with span('snapshot_write'):
+        write_snapshot(ANALYZED_SNAPSHOT_PATH, analyzed_data['features'], analyzed_data['metadata'])
+    # Eski sürümden kalan GeoJSON güncel değil; static/ altından sunulmaya devam etmesin
+    if os.path.exists(LEGACY_GEOJSON_PATH):
+        os.remove(LEGACY_GEOJSON_PATH)
+    
+    # Harita sorguları için türetilmiş verileri güncelle
+    with span('derived_outputs'):
+        build_derived_outputs()
+
+def analyze_all_areas_backend(force_refresh=False, profile_sampling=None):
+    """
+    Tüm alanları backend'de analiz eder ve sonucu kaydeder.
+    profile_sampling True ise bu çalıştırma için flame graph dosyası da üretilir.
+    """
     global ANALYSIS_IN_PROGRESS, LAST_ANALYSIS_TIME
     
     with ANALYSIS_LOCK:
@@ -231,6 +389,8 @@ def analyze_all_areas_backend(force_refresh=False):
             return False
         ANALYSIS_IN_PROGRESS = True
     
+    RUNS_IN_PROGRESS.labels('analyze_all_areas').inc()
+    profile = start_profile(sampling=profile_sampling)
     try:
         print("=== BACKEND ANALİZİ BAŞLATILIYOR ===")
         print(f"Tarih/Saat: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -241,6 +401,7 @@ def analyze_all_areas_backend(force_refresh=False):
         if force_refresh:
             print("Cache temizleniyor...")
             with weather_cache_lock:
+                cache_event('app_weather', 'eviction', len(weather_cache))
                 weather_cache.clear()
             cache_manager.clear_expired_cache()
         
@@ -249,76 +410,152 @@ def analyze_all_areas_backend(force_refresh=False):
         if not os.path.exists(geojson_path):
             print(f"GeoJSON dosyası bulunamadı: {geojson_path}")
             return False
-            
-        with open(geojson_path, 'r', encoding='utf-8') as f:
-            geojson_data = json.load(f)
         
-        total_features = len(geojson_data['features'])
+        # Öncelik için sadece centroid / skor / kimlik alanları okunur; geometriler belleğe alınmaz
+        with span('geojson_load'):
+            stubs = priority_stubs(geojson_path)
+        
+        total_features = len(stubs)
         print(f"Toplam {total_features} alan analiz edilecek...")
         print(f"Hedef: Bugünün 12:00 verisi")
         
-        analyzed_features = []
         cached_count = 0
         new_count = 0
         failed_count = 0
+        skipped_count = 0
+        resumed_count = 0
+        processed_count = 0
         
-        # Sıralı analiz (API limiti için)
-        for i, feature in enumerate(geojson_data['features']):
-            if i % 10 == 0:
-                print(f"İlerleme: {i}/{total_features} (Cache: {cached_count}, Yeni: {new_count}, Hata: {failed_count})")
-            
-            # Force refresh değilse ve önceki analiz varsa kontrol et
-            if not force_refresh and all(key in feature.get('properties', {}) for key in ['combined_risk_score', 'combined_risk_level', 'weather_data']):
-                # Son 23 saat içinde analiz edilmişse atla
-                analyzed_at = feature['properties'].get('analyzed_at')
-                if analyzed_at:
-                    analysis_time = datetime.fromisoformat(analyzed_at)
-                    if (datetime.now() - analysis_time).total_seconds() < 82800:  # 23 saat
-                        cached_count += 1
-                        analyzed_features.append(feature)
-                        continue
-            
-            # Yeni analiz
-            result = analyze_single_area(feature)
-            if result:
-                analyzed_features.append(result)
-                new_count += 1
-            else:
-                failed_count += 1
-                # Hatalı alanı da ekle ama analiz edilmemiş olarak işaretle
-                feature['properties']['analysis_failed'] = True
-                analyzed_features.append(feature)
-            
-            # API rate limit için bekleme
-            if new_count > 0 and new_count % 5 == 0:
-                time.sleep(1)  # Her 5 yeni analizde 1 saniye bekle
+        # Aynı hava durumu verisini hedefleyen yarım kalmış bir çalıştırma varsa tamamlanan alanlar
+        # günlükten alınır; force refresh'te devam ettirilmez, tüm alanlar yeniden analiz edilir
+        run_id, resumed_results = run_journal.start_or_resume('analyze_all_areas', fresh=force_refresh)
+        profile.run_id = run_id
         
-        # Analiz edilmiş veriyi kaydet
-        analyzed_data = {
-            'type': 'FeatureCollection',
-            'features': analyzed_features,
-            'metadata': {
+        # Artımlı mod: önceki analizin girdileriyle karşılaştırmak için
+        previous_results = load_previous_results(ANALYZED_SNAPSHOT_PATH) if INCREMENTAL_ANALYSIS else {}
+        
+        # Tamamlanan sonuçlar bellekte değil, diskte birikir
+        results = PropertySpool()
+        
+        def pending_feature(feature, i):
+            """Henüz analiz edilmemiş alan: önceki sonuç (varsa) bekliyor olarak işaretlenir"""
+            properties = feature.setdefault('properties', {})
+            properties.update(previous_for(previous_results, feature, i) or {})
+            properties['analysis_pending'] = True
+            return feature
+        
+        def merged_features():
+            """Tamamlanan sonuçlar + bekleyen alanlar: kaynak dosya yeniden akış halinde okunur"""
+            return results.merge(iter_features(geojson_path), pending_feature)
+        
+        def analysis_metadata(partial_tier=None):
+            metadata = {
                 'total_areas': total_features,
-                'analyzed_areas': len(analyzed_features) - failed_count,
+                'analyzed_areas': processed_count - failed_count,
                 'cached_areas': cached_count,
+                'skipped_unchanged': skipped_count,
+                'resumed_from_checkpoint': resumed_count,
+                'run_id': run_id,
                 'new_analyses': new_count,
                 'failed_analyses': failed_count,
                 'analysis_date': datetime.now().isoformat(),
                 'weather_date': datetime.now().replace(hour=12, minute=0, second=0).isoformat(),
-                'analysis_duration': time.time() - start_time
+                'analysis_duration': time.time() - start_time,
+                # Aşama başına toplam / p50 / p99 süreler (yayınlama aşamaları /runs/<id>/profile'da)
+                'profile': profile.summary()['stages']
             }
-        }
+            if partial_tier is not None:
+                metadata['partial'] = True
+                metadata['completed_tier'] = partial_tier
+            return metadata
         
-        # Dosyaya kaydet
-        with open(ANALYZED_GEOJSON_PATH, 'w', encoding='utf-8') as f:
-            json.dump(analyzed_data, f, ensure_ascii=False, indent=2)
+        try:
+            # En riskli alanlar önce: önceki skor, aktif yangın yakınlığı, mevsim ve alan büyüklüğü
+            with span('prioritization'):
+                tiers = priority_tiers(stubs, lambda feature, i: previous_for(previous_results, feature, i))
+            stubs = None
+            print("Öncelik seviyeleri: " + ", ".join(f"{name}: {len(indices)}" for name, indices in tiers))
+            
+            # Sıralı analiz (API limiti için); her seviyede kaynak dosya akış halinde okunur ve
+            # sadece o seviyenin alanları işlenir (seviye içinde öncelik skoru sırasıyla)
+            for tier_number, (tier_name, indices) in enumerate(tiers):
+                for i, feature in iter_selected_in_order(geojson_path, indices):
+                    if processed_count % 10 == 0:
+                        print(f"İlerleme: {processed_count}/{total_features} [{tier_name}] (Cache: {cached_count}, Atlanan: {skipped_count}, Yeni: {new_count}, Hata: {failed_count})")
+                    processed_count += 1
+                    
+                    # Yarım kalan çalıştırmada tamamlanmış alan: API çağrısı yapılmaz
+                    with span('geometry'):
+                        fid = compute_feature_id(feature, i)
+                    if fid in resumed_results:
+                        results.put(i, resumed_results[fid])
+                        resumed_count += 1
+                        continue
+                    
+                    # Force refresh değilse ve önceki analiz varsa kontrol et
+                    if not force_refresh and all(key in feature.get('properties', {}) for key in ['combined_risk_score', 'combined_risk_level', 'weather_data']):
+                        # Son 23 saat içinde analiz edilmişse atla
+                        analyzed_at = feature['properties'].get('analyzed_at')
+                        if analyzed_at:
+                            analysis_time = datetime.fromisoformat(analyzed_at)
+                            if (datetime.now() - analysis_time).total_seconds() < 82800:  # 23 saat
+                                cached_count += 1
+                                results.put(i, feature['properties'])
+                                continue
+                    
+                    # Girdileri anlamlı değişmemişse önceki sonucu taşı (LM çağrısı yapılmaz)
+                    previous = previous_for(previous_results, feature, i)
+                    if previous is not None:
+                        properties = feature.get('properties', {})
+                        weather_data, error = get_weather_data_for_coordinates(properties.get('centroid_lat'), properties.get('centroid_lon'))
+                        if weather_data is not None and reanalysis_reason(previous.get('analysis_inputs'), analysis_inputs(weather_data)) is None:
+                            carry_forward(feature, previous)
+                            results.put(i, feature['properties'])
+                            run_journal.record(run_id, fid, feature['properties'])
+                            skipped_count += 1
+                            continue
+                    
+                    # Yeni analiz
+                    result = analyze_single_area(feature)
+                    if result:
+                        results.put(i, result['properties'])
+                        run_journal.record(run_id, fid, result['properties'])
+                        new_count += 1
+                    else:
+                        failed_count += 1
+                        # Hatalı alanı da ekle ama analiz edilmemiş olarak işaretle
+                        feature['properties']['analysis_failed'] = True
+                        results.put(i, feature['properties'])
+                    
+                    # API rate limit için bekleme
+                    if new_count > 0 and new_count % 5 == 0:
+                        time.sleep(1)  # Her 5 yeni analizde 1 saniye bekle
+                
+                # Son seviye dışında her seviye bitince ara sonucu yayınla
+                if tier_number < len(tiers) - 1:
+                    print(f"Öncelik seviyesi tamamlandı: {tier_name}, ara sonuç yayınlanıyor...")
+                    publish_partial_results(merged_features, analysis_metadata(partial_tier=tier_name), set(indices))
+            
+            # Analiz edilmiş veriyi kaydet (snapshot, tüm türetilmiş veriler ve risk geçmişi)
+            publish_analysis({'type': 'FeatureCollection', 'features': merged_features(), 'metadata': analysis_metadata()})
+        finally:
+            results.close()
+        run_journal.complete(run_id)
+        
+        # Önümüzdeki günlerin projeksiyonunu arka planda güncelle (yeni snapshot'tan)
+        threading.Thread(target=run_forecast_projection, daemon=True).start()
         
         LAST_ANALYSIS_TIME = datetime.now()
+        analysis_duration = time.time() - start_time
+        RUN_DURATION.labels('analyze_all_areas').observe(analysis_duration)
+        record_run_throughput('analyze_all_areas', processed_count - failed_count, failed_count, analysis_duration)
         
         print(f"""
 === ANALİZ TAMAMLANDI ===
 Toplam: {total_features} alan
 Cache'den: {cached_count} alan
+Değişmeyen (atlanan): {skipped_count} alan
+Günlükten devam: {resumed_count} alan
 Yeni analiz: {new_count} alan
 Başarısız: {failed_count} alan
 Süre: {time.time() - start_time:.2f} saniye
@@ -333,6 +570,8 @@ Veri zamanı: Bugün 12:00
         return False
     finally:
         ANALYSIS_IN_PROGRESS = False
+        RUNS_IN_PROGRESS.labels('analyze_all_areas').dec()
+        finish_profile(profile)
 
 @app.route('/')
 def home():
@@ -343,7 +582,7 @@ def get_analyzed_data():
     """Analiz edilmiş veriyi döndürür"""
     try:
         # Analiz edilmiş dosya var mı kontrol et
-        if not os.path.exists(ANALYZED_GEOJSON_PATH):
+        if not os.path.exists(ANALYZED_SNAPSHOT_PATH):
             # Yoksa analizi başlat
             analyze_thread = threading.Thread(target=analyze_all_areas_backend)
             analyze_thread.start()
@@ -354,38 +593,344 @@ def get_analyzed_data():
             }), 202
         
         # Dosya yaşını kontrol et
-        file_age = time.time() - os.path.getmtime(ANALYZED_GEOJSON_PATH)
-        if file_age > 3600:  # 1 saatten eski
-            # Arka planda yeni analiz başlat
+        file_age = time.time() - os.path.getmtime(ANALYZED_SNAPSHOT_PATH)
+        if file_age > 3600 * quota_budget.ttl_multiplier('weatherapi'):  # 1 saatten eski (kota risk altındaysa daha uzun)
+            # Arka planda yeni analiz başlat (kota kritikse atlanır, mevcut sonuç sunulur)
+            if not ANALYSIS_IN_PROGRESS and quota_budget.allow_refresh('weatherapi'):
+                analyze_thread = threading.Thread(target=analyze_all_areas_backend)
+                analyze_thread.start()
+        
+        # Tam veri sadece açıkça istenirse snapshot'tan GeoJSON olarak akıtılır
+        if request.args.get('full') == '1':
+            return export_geojson('analyzed')
+        
+        # Hafif harita yükü yoksa veya eskiyse snapshot'tan yeniden üret
+        map_path = map_path_for(ANALYZED_SNAPSHOT_PATH)
+        if not os.path.exists(map_path) or os.path.getmtime(map_path) < os.path.getmtime(ANALYZED_SNAPSHOT_PATH):
+            with Snapshot(ANALYZED_SNAPSHOT_PATH) as snapshot:
+                save_map_data(snapshot.features(), snapshot.metadata, map_path)
+                feature_detail_store.build(snapshot.features(geometry=False))
+        
+        # send_file göreli yolu çalışma dizinine değil uygulama köküne göre çözer
+        return send_file(os.path.abspath(map_path), mimetype='application/json')
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/features')
+def features():
+    """Görünür alan (bbox) ve zoom seviyesine göre sadeleştirilmiş alanları döndürür"""
+    bbox = None
+    bbox_param = request.args.get('bbox')
+    if bbox_param:
+        try:
+            bbox = tuple(float(v) for v in bbox_param.split(','))
+        except ValueError:
+            bbox = ()
+        if len(bbox) != 4:
+            return jsonify({'error': 'bbox formatı: minLon,minLat,maxLon,maxLat'}), 400
+    zoom = request.args.get('zoom', type=int)
+    
+    try:
+        if not feature_query_index.ensure_loaded(ANALYZED_SNAPSHOT_PATH):
+            # Analiz dosyası yoksa analizi başlat
+            if not ANALYSIS_IN_PROGRESS:
+                analyze_thread = threading.Thread(target=analyze_all_areas_backend)
+                analyze_thread.start()
+            
+            return jsonify({
+                'status': 'analyzing',
+                'message': 'Analiz başlatıldı, lütfen bekleyin...'
+            }), 202
+        
+        result, level, truncated = feature_query_index.query(bbox, zoom)
+        
+        return jsonify({
+            'type': 'FeatureCollection',
+            'features': result,
+            'metadata': {
+                'bbox': bbox,
+                'zoom': zoom,
+                'lod_level': level,
+                'feature_count': len(result),
+                'truncated': truncated
+            }
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/risk_grid')
+def get_risk_grid():
+    """Düşük zoom seviyeleri için hücre bazlı risk özetlerini döndürür"""
+    bbox = None
+    bbox_param = request.args.get('bbox')
+    if bbox_param:
+        try:
+            bbox = tuple(float(v) for v in bbox_param.split(','))
+        except ValueError:
+            bbox = ()
+        if len(bbox) != 4:
+            return jsonify({'error': 'bbox formatı: minLon,minLat,maxLon,maxLat'}), 400
+    zoom = request.args.get('zoom', default=0, type=int)
+    
+    try:
+        if not risk_grid.ensure_loaded(ANALYZED_SNAPSHOT_PATH):
             if not ANALYSIS_IN_PROGRESS:
                 analyze_thread = threading.Thread(target=analyze_all_areas_backend)
                 analyze_thread.start()
+            
+            return jsonify({
+                'status': 'analyzing',
+                'message': 'Analiz başlatıldı, lütfen bekleyin...'
+            }), 202
         
-        # Mevcut dosyayı gönder
-        return send_file(ANALYZED_GEOJSON_PATH, mimetype='application/json')
+        cells, resolution = risk_grid.query(zoom, bbox)
+        
+        return jsonify({
+            'type': 'FeatureCollection',
+            'features': cells,
+            'metadata': {
+                'zoom': zoom,
+                'resolution': resolution,
+                'zoom_threshold': GRID_ZOOM_THRESHOLD,
+                'cell_count': len(cells),
+                'updated_at': risk_grid.updated_at
+            }
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/tiles/<int:z>/<int:x>/<int:y>.pbf')
+def get_tile(z, x, y):
+    """Önceden üretilmiş vektör tile'ı (MVT) döndürür"""
+    # Geçersiz koordinat boş tile değildir; çok büyük zoom değerleriyle hesap da yapılmaz
+    if not tile_store.in_range(z, x, y):
+        return jsonify({'error': 'Geçersiz tile koordinatı', 'max_zoom': tile_store.max_zoom}), 404
+    
+    try:
+        tile = tile_store.get_tile(z, x, y)
+        if tile is None:
+            # Boş tile: sonraki yayında dolabileceği için önbellekte bayat kalmasın
+            response = make_response('', 204)
+            response.headers['Cache-Control'] = 'public, no-cache'
+            return response
+        
+        data, etag = tile
+        if request.if_none_match and etag in request.if_none_match:
+            response = make_response('', 304)
+        else:
+            response = make_response(data)
+            response.headers['Content-Type'] = 'application/vnd.mapbox-vector-tile'
+            response.headers['Content-Encoding'] = 'gzip'
+        
+        # İçerik değişmedikçe ETag aynı kalır; tarayıcı her seferinde ucuzca doğrular
+        response.headers['ETag'] = f'"{etag}"'
+        response.headers['Cache-Control'] = 'public, no-cache'
+        return response
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/feature/<feature_id>/details')
+def get_feature_details(feature_id):
+    """Tek bir alanın popup'ta gösterilen tüm detaylarını döndürür"""
+    try:
+        if not feature_detail_store.available() and os.path.exists(ANALYZED_SNAPSHOT_PATH):
+            with Snapshot(ANALYZED_SNAPSHOT_PATH) as snapshot:
+                feature_detail_store.build(snapshot.features(geometry=False))
+        
+        properties = feature_detail_store.get(feature_id)
+        if properties is None:
+            return jsonify({'error': 'Alan bulunamadı', 'id': feature_id}), 404
+        
+        return jsonify({'id': feature_id, 'properties': properties})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/feature/<feature_id>/history')
+def get_feature_history(feature_id):
+    """Tek bir alanın risk ve hava durumu değişim geçmişini döndürür"""
+    days = request.args.get('days', type=int)
+    source = request.args.get('source')  # ör. analyze_all_areas, update_forest_lm_risks
+    try:
+        history = risk_history.feature_history(feature_id, days=days, source=source)
+        if not history:
+            return jsonify({'error': 'Bu alan için geçmiş bulunamadı', 'id': feature_id}), 404
+        
+        return jsonify({'id': feature_id, 'history': history})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/history')
+def get_history():
+    """Verilen günün sonundaki tüm alanların risk değerlerini döndürür"""
+    date_arg = request.args.get('date')
+    try:
+        target_date = datetime.strptime(date_arg, '%Y-%m-%d').date() if date_arg else datetime.now().date()
+    except ValueError:
+        return jsonify({'error': 'date parametresi YYYY-MM-DD formatında olmalı'}), 400
+    
+    try:
+        run_ts, values = risk_history.values_at(target_date, source=request.args.get('source'))
+        if run_ts is None:
+            return jsonify({'error': 'Bu tarih için geçmiş bulunamadı', 'date': target_date.isoformat()}), 404
+        
+        return jsonify({
+            'date': target_date.isoformat(),
+            'run_timestamp': run_ts,
+            'total_features': len(values),
+            'features': values
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/forecast')
+def get_forecast():
+    """Tüm alanlar için önümüzdeki günlerin zirve risk projeksiyonu"""
+    try:
+        if not forecast_projector.ensure_loaded(FORECAST_PATH):
+            if not forecast_projector.in_progress:
+                threading.Thread(target=run_forecast_projection, daemon=True).start()
+            return jsonify({
+                'status': 'projecting',
+                'message': 'Tahmin projeksiyonu hazırlanıyor, lütfen bekleyin...'
+            }), 202
+        
+        return jsonify(forecast_projector.summary(auto_updater.get_risk_level))
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/feature/<feature_id>/forecast')
+def get_feature_forecast(feature_id):
+    """Tek bir alanın saatlik risk projeksiyonu"""
+    try:
+        if not forecast_projector.ensure_loaded(FORECAST_PATH):
+            return jsonify({
+                'status': 'projecting',
+                'message': 'Tahmin projeksiyonu henüz hazır değil'
+            }), 503
+        
+        projection = forecast_projector.feature_projection(feature_id, auto_updater.get_risk_level)
+        if projection is None:
+            return jsonify({'error': 'Bu alan için tahmin bulunamadı', 'id': feature_id}), 404
+        
+        return jsonify(projection)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/risk_at')
+def risk_at():
+    """Verilen koordinatı kapsayan alanın risk bilgilerini döndürür"""
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    if lat is None or lon is None:
+        return jsonify({'error': 'lat ve lon parametreleri gerekli'}), 400
+    
+    try:
+        if not risk_index.ensure_loaded(ANALYZED_SNAPSHOT_PATH):
+            return jsonify({
+                'status': 'analyzing',
+                'message': 'Analiz verisi henüz hazır değil'
+            }), 503
+        
+        result = risk_index.risk_at(lat, lon)
+        if result is None:
+            return jsonify({
+                'lat': lat,
+                'lon': lon,
+                'message': 'Bu konumda analiz edilmiş alan bulunamadı'
+            }), 404
+        
+        return jsonify(result)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/export/<name>.geojson')
+def export_geojson(name):
+    """İkili snapshot'tan GeoJSON görünümünü akış olarak üretir"""
+    # Yayınlanan analiz veya zamanlayıcının arşivdeki (SNAPSHOT_DIR) sonuçları; başka yol kabul edilmez
+    if name == 'analyzed':
+        snapshot_path = ANALYZED_SNAPSHOT_PATH
+    else:
+        snapshot_path = os.path.join(SNAPSHOT_DIR, f"{os.path.basename(name)}.snap")
+    
+    if not os.path.exists(snapshot_path):
+        return jsonify({'error': 'Snapshot bulunamadı', 'name': name}), 404
+    
+    def generate():
+        with Snapshot(snapshot_path) as snapshot:
+            for chunk in snapshot.iter_geojson_chunks():
+                yield chunk
+    
+    return Response(stream_with_context(generate()), mimetype='application/geo+json')
+
 @app.route('/analysis_status')
 def analysis_status():
     """Analiz durumunu döndürür"""
     try:
-        metadata = None
-        if os.path.exists(ANALYZED_GEOJSON_PATH):
-            with open(ANALYZED_GEOJSON_PATH, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                metadata = data.get('metadata', {})
+        metadata = load_analysis_metadata()
         
         return jsonify({
             'analyzing': ANALYSIS_IN_PROGRESS,
             'last_analysis': LAST_ANALYSIS_TIME.isoformat() if LAST_ANALYSIS_TIME else None,
             'metadata': metadata,
-            'cache_stats': cache_manager.get_cache_stats()
+            'cache_stats': cache_manager.get_cache_stats(),
+            'run_plans': auto_updater.last_run_plans,
+            'upstreams': upstream_status(),
+            'rate_limits': rate_limit_store.status(),
+            'quota': quota_budget.status(),
+            'runs': run_journal.runs(limit=5)
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/ready')
+def ready():
+    """Hazırlık kontrolü: son yayınlanan snapshot'ın metadata'sı (sadece başlık okunur, cache beklenmez)"""
+    try:
+        snapshot = read_snapshot_metadata(ANALYZED_SNAPSHOT_PATH) if os.path.exists(ANALYZED_SNAPSHOT_PATH) else None
+        map_ready = os.path.exists(map_path_for(ANALYZED_SNAPSHOT_PATH))
+        is_ready = snapshot is not None or map_ready
+
+        return jsonify({
+            'ready': is_ready,
+            'snapshot': snapshot,
+            'map_data': map_ready,
+            'cache_loaded': cache_manager.loaded.is_set(),
+            'analyzing': ANALYSIS_IN_PROGRESS,
+            'started_at': APP_STARTED_AT.isoformat() if APP_STARTED_AT else None
+        }), 200 if is_ready else 503
+    except Exception as e:
+        return jsonify({'ready': False, 'error': str(e)}), 503
+
+@app.route('/runs/<run_id>/profile')
+def run_profile(run_id):
+    """Çalıştırmanın aşama süreleri; flame graph varsa ?format=folded ile indirilebilir"""
+    profile = run_journal.profile(run_id)
+    if profile is None:
+        return jsonify({'error': 'Profil bulunamadı'}), 404
+    
+    if request.args.get('format') == 'folded':
+        flamegraph = profile.get('flamegraph')
+        if not flamegraph or not os.path.exists(flamegraph):
+            return jsonify({'error': 'Bu çalıştırma için örnekleyici profil yok'}), 404
+        return send_file(os.path.abspath(flamegraph), mimetype='text/plain', as_attachment=True, download_name=os.path.basename(flamegraph))
+    
+    return jsonify(profile)
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metin formatında metrikler (dış servis gecikmeleri, rate limit, cache, çalıştırmalar)"""
+    return Response(metrics_registry.render(), content_type=METRICS_CONTENT_TYPE)
+
 @app.route('/trigger_analysis', methods=['POST'])
 def trigger_analysis():
     """Manuel olarak analiz başlatır"""
@@ -395,7 +940,9 @@ def trigger_analysis():
             'message': 'Analiz zaten devam ediyor'
         }), 409
     
-    analyze_thread = threading.Thread(target=analyze_all_areas_backend)
+    # ?profile=1: bu çalıştırma için örnekleyici profil (flame graph) üret
+    profile_sampling = request.args.get('profile') == '1'
+    analyze_thread = threading.Thread(target=analyze_all_areas_backend, kwargs={'profile_sampling': profile_sampling})
     analyze_thread.start()
     
     return jsonify({
@@ -408,6 +955,7 @@ def clear_cache():
     """Cache'i temizler"""
     clear_expired_cache()
     with weather_cache_lock:
+        cache_event('app_weather', 'eviction', len(weather_cache))
         weather_cache.clear()
     return jsonify({'message': 'Cache temizlendi'})
 
@@ -422,87 +970,101 @@ def add_cache_headers(response):
     return response
 
 def startup_analysis():
-    """Sunucu başladığında analizi kontrol et"""
-    time.sleep(2)  # Flask'ın başlamasını bekle
-    
-    if not os.path.exists(ANALYZED_GEOJSON_PATH):
+    """Sunucu başladığında analizi kontrol et (arka planda; istekleri bekletmez)"""
+    if run_journal.has_unfinished('analyze_all_areas'):
+        print("Yarım kalmış analiz bulundu, kaldığı yerden devam ediliyor...")
+        analyze_all_areas_backend()
+    elif not os.path.exists(ANALYZED_SNAPSHOT_PATH):
         print("Analiz dosyası bulunamadı, yeni analiz başlatılıyor...")
         analyze_all_areas_backend()
     else:
-        file_age = time.time() - os.path.getmtime(ANALYZED_GEOJSON_PATH)
-        if file_age > 3600:
-            print(f"Analiz dosyası {file_age/3600:.1f} saat eski, yenileniyor...")
+        # Dosyanın metadata'sını kontrol et
+        try:
+            metadata = load_analysis_metadata() or {}
+                
+            if metadata.get('analysis_date'):
+                analysis_date = datetime.fromisoformat(metadata['analysis_date'])
+                hours_old = (datetime.now() - analysis_date).total_seconds() / 3600
+                
+                if hours_old > 24 and not quota_budget.allow_refresh('weatherapi'):
+                    print(f"Analiz {hours_old:.1f} saat eski, WeatherAPI aylık kotası risk altında olduğu için yenilenmiyor")
+                elif hours_old > 24:
+                    print(f"Analiz {hours_old:.1f} saat eski, yenileniyor...")
+                    analyze_all_areas_backend(force_refresh=True)
+                else:
+                    print(f"Güncel analiz mevcut ({hours_old:.1f} saat önce)")
+            else:
+                print("Metadata bulunamadı, yeni analiz başlatılıyor...")
+                analyze_all_areas_backend()
+        except Exception as e:
+            print(f"Dosya okuma hatası: {e}, yeni analiz başlatılıyor...")
             analyze_all_areas_backend()
-        else:
-            print(f"Güncel analiz mevcut ({file_age/60:.1f} dakika önce)")
 
-if __name__ == '__main__':
-    print("=== ORMAN ERKEN UYARI SİSTEMİ BAŞLATILIYOR ===")
-    
-    # Auto updater'ı başlat
-    auto_updater.start()
-    print("✓ Auto updater başlatıldı")
+def daily_analysis():
+    """Günlük otomatik analiz - Her gün 12:15'te (12:00 verileri hazır olduğunda)"""
+    while True:
+        try:
+            now = datetime.now()
+            # Bir sonraki 12:15'i hesapla
+            next_run = now.replace(hour=12, minute=15, second=0, microsecond=0)
+            if now >= next_run:
+                next_run += timedelta(days=1)
+            
+            # Bekleme süresi
+            wait_seconds = (next_run - now).total_seconds()
+            print(f"Sonraki otomatik analiz: {next_run.strftime('%Y-%m-%d %H:%M:%S')} ({wait_seconds/3600:.1f} saat sonra)")
+            
+            time.sleep(wait_seconds)
+            
+            if not quota_budget.allow_refresh('weatherapi'):
+                print(f"Günlük analiz atlandı, WeatherAPI aylık kotası risk altında: {quota_budget.usage('weatherapi')}")
+                continue
+            print("📊 Günlük analiz başlatılıyor (12:00 verileri)...")
+            analyze_all_areas_backend(force_refresh=True)
+            
+        except Exception as e:
+            print(f"Günlük analiz hatası: {e}")
+            time.sleep(3600)  # Hata durumunda 1 saat bekle
+
+def create_app(background_jobs=None):
+    """
+    Uygulamayı başlatır ve Flask nesnesini döndürür. Import yan etkisizdir; logging,
+    cache yüklemesi ve arka plan işleri burada, bir kez başlatılır.
+    gunicorn için: gunicorn 'app:create_app()'
+    """
+    global APP_INITIALIZED, APP_STARTED_AT
+    with APP_INIT_LOCK:
+        if APP_INITIALIZED:
+            return app
+        APP_INITIALIZED = True
+    APP_STARTED_AT = datetime.now()
     
-    # Başlangıç analizini başlat
-    def startup_analysis():
-        time.sleep(2)  # Flask'ın başlamasını bekle
-        
-        if not os.path.exists(ANALYZED_GEOJSON_PATH):
-            print("Analiz dosyası bulunamadı, yeni analiz başlatılıyor...")
-            analyze_all_areas_backend()
-        else:
-            # Dosyanın metadata'sını kontrol et
-            try:
-                with open(ANALYZED_GEOJSON_PATH, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    metadata = data.get('metadata', {})
-                    
-                if metadata.get('analysis_date'):
-                    analysis_date = datetime.fromisoformat(metadata['analysis_date'])
-                    hours_old = (datetime.now() - analysis_date).total_seconds() / 3600
-                    
-                    if hours_old > 24:
-                        print(f"Analiz {hours_old:.1f} saat eski, yenileniyor...")
-                        analyze_all_areas_backend(force_refresh=True)
-                    else:
-                        print(f"Güncel analiz mevcut ({hours_old:.1f} saat önce)")
-                else:
-                    print("Metadata bulunamadı, yeni analiz başlatılıyor...")
-                    analyze_all_areas_backend()
-            except Exception as e:
-                print(f"Dosya okuma hatası: {e}, yeni analiz başlatılıyor...")
-                analyze_all_areas_backend()
+    configure_logging()
+    if not os.environ.get('GROQ_API_KEY'):
+        print("⚠️ UYARI: GROQ_API_KEY bulunamadı! LM analizi dummy mod ile çalışacak.")
+    else:
+        print("✅ GROQ_API_KEY bulundu. LM analizi aktif.")
     
-    startup_thread = threading.Thread(target=startup_analysis, daemon=True)
-    startup_thread.start()
-    print("✓ Başlangıç analizi kontrol ediliyor...")
+    # Analiz cache'i büyük olabilir; ilk istekleri bekletmemek için arka planda yüklenir
+    cache_manager.load_in_background()
     
-    # Günlük otomatik analiz - Her gün 12:15'te (12:00 verileri hazır olduğunda)
-    def daily_analysis():
-        while True:
-            try:
-                now = datetime.now()
-                # Bir sonraki 12:15'i hesapla
-                next_run = now.replace(hour=12, minute=15, second=0, microsecond=0)
-                if now >= next_run:
-                    next_run += timedelta(days=1)
-                
-                # Bekleme süresi
-                wait_seconds = (next_run - now).total_seconds()
-                print(f"Sonraki otomatik analiz: {next_run.strftime('%Y-%m-%d %H:%M:%S')} ({wait_seconds/3600:.1f} saat sonra)")
-                
-                time.sleep(wait_seconds)
-                
-                print("📊 Günlük analiz başlatılıyor (12:00 verileri)...")
-                analyze_all_areas_backend(force_refresh=True)
-                
-            except Exception as e:
-                print(f"Günlük analiz hatası: {e}")
-                time.sleep(3600)  # Hata durumunda 1 saat bekle
+    if background_jobs is None:
+        background_jobs = BACKGROUND_JOBS
+    if background_jobs:
+        auto_updater.start()
+        print("✓ Auto updater başlatıldı")
+        
+        threading.Thread(target=startup_analysis, daemon=True).start()
+        print("✓ Başlangıç analizi kontrol ediliyor...")
+        
+        threading.Thread(target=daily_analysis, daemon=True).start()
+        print("✓ Günlük analiz scheduler'ı başlatıldı (Her gün 12:15)")
     
-    daily_thread = threading.Thread(target=daily_analysis, daemon=True)
-    daily_thread.start()
-    print("✓ Günlük analiz scheduler'ı başlatıldı (Her gün 12:15)")
+    return app
+
+if __name__ == '__main__':
+    print("=== ORMAN ERKEN UYARI SİSTEMİ BAŞLATILIYOR ===")
+    create_app()
     
     try:
         # Render için port ayarı
@@ -8,13 +8,26 @@ import os
 import logging
 import random
 import concurrent.futures
-from collections import deque
-from lm_risk_analyzer import lm_analyzer, get_cached_analysis, update_weather_date
+from lm_risk_analyzer import lm_analyzer, get_cached_analysis, update_weather_date, MAX_REQUESTS_PER_MINUTE as LM_MAX_REQUESTS_PER_MINUTE
 from cache_manager import cache_manager
+from vector_tiles import tile_store
+from snapshot_store import Snapshot, write_snapshot, read_snapshot_metadata, archive_path, latest_snapshot, prune_snapshots
+from geojson_stream import iter_features, iter_selected_in_order, GeoJSONWriter, PropertySpool
+from risk_history import risk_history
+from risk_timeline import compact_hourly, build_risk_timeline
+from incremental_analysis import INCREMENTAL_ANALYSIS, analysis_inputs, reanalysis_reason, load_previous_results, previous_for, carry_forward
+from analysis_priority import priority_tiers, priority_stubs
+from forecast_projection import weather_cell, group_by_weather_cell
+from spatial_index import feature_id
+from run_journal import run_journal
+from metrics import track_upstream, track_rate_limit, track_run, record_run_throughput, cache_event
+from run_profile import start_profile, finish_profile, span
+from upstream_control import weather_controller, groq_controller, raise_for_overload, UpstreamOverloaded, CircuitOpenError
+from rate_limit_store import rate_limit_store
+from quota_budget import quota_budget
+from run_planner import latency_tracker, plan_run, deadline_today, DeadlineMonitor, CLASSIC_RUN_DEADLINE, LM_RUN_DEADLINE
 
-# WeatherAPI rate limiting
-weather_request_times = deque()
-weather_rate_limit_lock = threading.Lock()
+# WeatherAPI rate limiting (durum süreçler ve yeniden başlatmalar arasında paylaşılır)
 WEATHER_MAX_REQUESTS_PER_MINUTE = 50  # WeatherAPI için güvenli limit
 WEATHER_RATE_LIMIT_WINDOW = 60
 
@@ -22,56 +35,77 @@ def check_weather_rate_limit():
     """
     WeatherAPI rate limit kontrolü - dakikada maksimum 50 istek
     """
-    with weather_rate_limit_lock:
-        now = time.time()
-        
-        # 60 saniyeden eski istekleri temizle
-        while weather_request_times and now - weather_request_times[0] > WEATHER_RATE_LIMIT_WINDOW:
-            weather_request_times.popleft()
-        
-        # Rate limit kontrolü
-        if len(weather_request_times) >= WEATHER_MAX_REQUESTS_PER_MINUTE:
-            # En eski istekten sonraki süreyi bekle
-            wait_time = WEATHER_RATE_LIMIT_WINDOW - (now - weather_request_times[0])
-            if wait_time > 0:
-                logging.warning(f"WeatherAPI rate limit aşıldı, {wait_time:.2f} saniye bekleniyor...")
-                time.sleep(wait_time)
-                return check_weather_rate_limit()  # Tekrar kontrol et
-        
-        # Yeni istek zamanını ekle
-        weather_request_times.append(now)
-        return True
-
-# Logging ayarları
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('auto_updater.log'),
-        logging.StreamHandler()
-    ]
-)
-
-# WeatherAPI.com API anahtarı - Environment variable'dan oku
-WEATHERAPI_KEY = os.environ.get('WEATHERAPI_KEY')
-if not WEATHERAPI_KEY:
-    raise RuntimeError('WEATHERAPI_KEY environment variable tanımlı değil!')
+    wait_time = rate_limit_store.reserve('weatherapi', WEATHER_MAX_REQUESTS_PER_MINUTE, WEATHER_RATE_LIMIT_WINDOW)
+    if wait_time > 0:
+        logging.warning(f"WeatherAPI rate limit aşıldı, {wait_time:.2f} saniye bekleniyor...")
+        time.sleep(wait_time)
+    return True
+
+# Logging ayarları (import sırasında değil, servis başlatılırken yapılır)
+LOG_FILE = os.environ.get('AUTO_UPDATER_LOG', 'auto_updater.log')
+logging_configured = False
+
+def configure_logging():
+    """Dosya ve konsol log handler'larını bir kez kurar"""
+    global logging_configured
+    if logging_configured:
+        return
+    logging_configured = True
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(LOG_FILE),
+            logging.StreamHandler()
+        ]
+    )
+
+def weatherapi_key():
+    """WeatherAPI.com API anahtarı - Environment variable'dan ilk kullanımda okunur"""
+    key = os.environ.get('WEATHERAPI_KEY')
+    if not key:
+        raise RuntimeError('WEATHERAPI_KEY environment variable tanımlı değil!')
+    return key
+
+WEATHERAPI_BASE_URL = os.environ.get('WEATHERAPI_BASE_URL', 'http://api.weatherapi.com/v1')  # Benchmark'ta sahte sunucuya yönlendirilebilir
 
 # Performans optimizasyonu için global değişkenler
 weather_cache = {}  # Hava durumu cache'i
 weather_cache_lock = threading.Lock()
 MAX_WORKERS = 4  # Paralel işlem sayısı
+WINDOW_PER_WORKER = 4  # Öncelik seviyesi işlenirken bellekte tutulan feature: eşzamanlılık x bu değer
+
+# LM analizi yapılmamış alanlar için varsayılan faktörler (tüm alanlar aynı listeyi paylaşır)
+DEFAULT_HUMAN_RISK_FACTORS = [
+    {"factor": "Yerleşim yakınlığı", "score": 50, "description": "Orta seviye risk"},
+    {"factor": "Turizm aktiviteleri", "score": 40, "description": "Düşük-orta risk"},
+    {"factor": "Yol ağı", "score": 60, "description": "Orta-yüksek risk"}
+]
+
+def trailing_members(members):
+    """Kaynak dosyanın type / features dışındaki üst düzey alanları (akış sonunda yazılır)"""
+    return {key: value for key, value in (members or {}).items() if key not in ('type', 'features')}
+
+def write_through(features, writer):
+    """Feature'ları GeoJSON dosyasına yazarken aynen geçirir (snapshot ile tek geçişte yazmak için)"""
+    for feature in features:
+        writer.write(feature)
+        yield feature
 
 class AutoUpdater:
     def __init__(self):
         self.is_running = False
         self.thread = None
         self.last_update = None
+        self.weather_sampling = False  # Planlayıcı açarsa hava durumu hücre merkezinden alınır
+        self.last_run_plans = {}
         
-    def get_test_weather_data(self, lat, lon):
+    def get_test_weather_data(self, lat, lon, rng=None):
         """
         Test amaçlı koordinat bazlı hava durumu verileri üretir
+        rng: tekrarlanabilir sonuç için random.Random örneği (verilmezse global random)
         """
+        rng = rng or random
         # Koordinat bazlı gerçekçi test verileri
         # Enlem (lat) etkisi: Güney daha sıcak
         lat_factor = (lat - 35) / 10  # Türkiye için normalize
@@ -81,19 +115,19 @@ class AutoUpdater:
         
         # Koordinat bazlı sıcaklık hesaplama
         base_temp = 25 + (lat_factor * 5) + (lon_factor * 2)
-        sicaklik = max(10, min(40, base_temp + random.uniform(-5, 5)))
+        sicaklik = max(10, min(40, base_temp + rng.uniform(-5, 5)))
         
         # Koordinat bazlı nem hesaplama
         base_humidity = 60 - (lat_factor * 10) + (lon_factor * 5)
-        nem = max(20, min(90, base_humidity + random.uniform(-10, 10)))
+        nem = max(20, min(90, base_humidity + rng.uniform(-10, 10)))
         
         # Koordinat bazlı rüzgar hesaplama
         base_wind = 15 + (lon_factor * 5)
-        ruzgar_hizi = max(0, min(50, base_wind + random.uniform(-5, 5)))
+        ruzgar_hizi = max(0, min(50, base_wind + rng.uniform(-5, 5)))
         
         # Koordinat bazlı yağış hesaplama
         base_rain = max(0, 20 - (lat_factor * 10) - (lon_factor * 5))
-        yagis_7_gun = max(0, min(100, base_rain + random.uniform(-10, 10)))
+        yagis_7_gun = max(0, min(100, base_rain + rng.uniform(-10, 10)))
         
         weather_info = {
             'sicaklik': round(sicaklik, 1),
@@ -113,17 +147,20 @@ class AutoUpdater:
         cache_key = f"{lat:.4f}_{lon:.4f}"
         
         # Cache'den kontrol et
+        stale_weather = None  # Servis erişilemezse kullanılacak süresi dolmuş veri
         with weather_cache_lock:
             if cache_key in weather_cache:
                 cache_time, weather_data = weather_cache[cache_key]
-                # Cache 1 saat geçerli
-                if time.time() - cache_time < 3600:
+                # Cache 1 saat geçerli (kota risk altındaysa daha uzun)
+                if time.time() - cache_time < 3600 * quota_budget.ttl_multiplier('weatherapi'):
+                    cache_event('auto_weather', 'hit')
                     return weather_data, None
+                del weather_cache[cache_key]
+                cache_event('auto_weather', 'eviction')
+                stale_weather = weather_data
+        cache_event('auto_weather', 'miss')
         
         try:
-            # Rate limit kontrolü
-            check_weather_rate_limit()
-            
             # 1 gün önceki 12:00'ı hesapla
             yesterday = datetime.now() - timedelta(days=1)
             yesterday_noon = yesterday.replace(hour=12, minute=0, second=0, microsecond=0)
@@ -134,20 +171,20 @@ class AutoUpdater:
                 logging.info(f"🔄 Yeni hava durumu verisi tespit edildi: {weather_date}")
             
             # WeatherAPI.com çağrısı - Geçmiş veri için
-            url = "http://api.weatherapi.com/v1/history.json"
+            url = f"{WEATHERAPI_BASE_URL}/history.json"
             params = {
-                'key': WEATHERAPI_KEY,
+                'key': weatherapi_key(),
                 'q': f"{lat},{lon}",
                 'dt': weather_date,
                 'aqi': 'no'
             }
             
-            response = requests.get(url, params=params, timeout=5)  # Timeout azaltıldı
+            response = self.request_weather('history', url, params)
             
             if response.status_code != 200:
                 error_data = response.json()
                 logging.warning(f"WeatherAPI Hatası ({response.status_code}): {error_data.get('error', {}).get('message', 'Bilinmeyen hata')}")
-                # Hata durumunda mevcut veriyi kullan
+                # İstek hatası (429 / 5xx değil): mevcut veriyi dene
                 return self.get_current_weather_data(lat, lon)
             
             data = response.json()
@@ -161,7 +198,9 @@ class AutoUpdater:
                     'sicaklik': hour_data['temp_c'],
                     'nem': hour_data['humidity'],
                     'ruzgar_hizi': hour_data['wind_kph'],
-                    'yagis_7_gun': hour_data.get('precip_mm', 0)
+                    'yagis_7_gun': hour_data.get('precip_mm', 0),
+                    # Aynı yanıttaki 24 saatin tamamı (gün içi risk eğrisi için)
+                    'hourly': compact_hourly(forecast_day)
                 }
                 
                 # Cache'e kaydet
@@ -174,32 +213,66 @@ class AutoUpdater:
                 # Geçmiş veri yoksa mevcut veriyi al
                 return self.get_current_weather_data(lat, lon)
                 
-        except requests.exceptions.Timeout:
-            logging.warning(f"API timeout: {lat}, {lon}")
-            return self.get_current_weather_data(lat, lon)
-        except requests.exceptions.RequestException as e:
-            logging.error(f"API bağlantı hatası: {str(e)}")
-            return self.get_current_weather_data(lat, lon)
+        except CircuitOpenError as e:
+            # Servis çökmüşken ikinci (current) çağrı yapılmaz; eski veri varsa o kullanılır
+            return self.weather_fallback(stale_weather, str(e))
+        except (UpstreamOverloaded, requests.exceptions.RequestException) as e:
+            logging.warning(f"WeatherAPI aşırı yük / bağlantı hatası ({lat}, {lon}): {str(e)}")
+            return self.weather_fallback(stale_weather, str(e))
         except Exception as e:
+            # Beklenmeyen hata: ikinci bir (current) çağrı yapılmaz
             logging.error(f"Veri çekme hatası: {str(e)}")
-            return self.get_current_weather_data(lat, lon)
+            return self.weather_fallback(stale_weather, str(e))
+
+    def request_weather(self, endpoint, url, params):
+        """
+        WeatherAPI çağrısı: eşzamanlılık limiti, 429 / 5xx / zaman aşımında geri çekilmeli
+        yeniden deneme ve devre kesici (weather_controller) ile
+        """
+        def throttle():
+            # Rate limit beklemesi eşzamanlılık slotu tutulmadan yapılır, gecikmeye sayılmaz
+            with track_rate_limit('weatherapi'):
+                check_weather_rate_limit()
+        
+        def fetch():
+            request_start = time.time()
+            with track_upstream('weatherapi', endpoint):
+                response = requests.get(url, params=params, timeout=5)  # Timeout azaltıldı
+            latency_tracker.record('weather', time.time() - request_start)
+            return raise_for_overload(response)
+        
+        return weather_controller.call(fetch, transient=(requests.exceptions.Timeout, requests.exceptions.ConnectionError), throttle=throttle)
+
+    def weather_fallback(self, stale_weather, error):
+        """Servis erişilemezken süresi dolmuş cache verisi, yoksa hata"""
+        if stale_weather is not None:
+            cache_event('auto_weather', 'stale_hit')
+            return stale_weather, None
+        return None, f"WeatherAPI erişilemiyor: {error}"
+
+    def weather_coordinates(self, lat, lon):
+        """
+        Hava durumu sorgusu için koordinat. Örnekleme açıksa (planlayıcı veya aylık
+        kota bütçesi) aynı hücredeki alanlar hücre merkezini kullanır ve cache'i paylaşır.
+        """
+        if not self.weather_sampling and not quota_budget.conserving('weatherapi'):
+            return lat, lon
+        _, center_lat, center_lon = weather_cell(lat, lon)
+        return center_lat, center_lon
 
     def get_current_weather_data(self, lat, lon):
         """
         Mevcut hava durumu verilerini çeker (fallback için)
         """
         try:
-            # Rate limit kontrolü
-            check_weather_rate_limit()
-            
-            url = "http://api.weatherapi.com/v1/current.json"
+            url = f"{WEATHERAPI_BASE_URL}/current.json"
             params = {
-                'key': WEATHERAPI_KEY,
+                'key': weatherapi_key(),
                 'q': f"{lat},{lon}",
                 'aqi': 'no'
             }
             
-            response = requests.get(url, params=params, timeout=5)  # Timeout azaltıldı
+            response = self.request_weather('current', url, params)
             
             if response.status_code != 200:
                 error_data = response.json()
@@ -359,13 +432,14 @@ class AutoUpdater:
                     coordinates = geometry['coordinates'][0]
                 else:
                     return None
-                centroid_lat, centroid_lon = self.calculate_centroid(coordinates)
+                with span('geometry'):
+                    centroid_lat, centroid_lon = self.calculate_centroid(coordinates)
             
             if centroid_lat is None or centroid_lon is None:
                 return None
             
             # Hava durumu verilerini çek
-            weather_data, error = self.get_weather_data_for_coordinates(centroid_lat, centroid_lon)
+            weather_data, error = self.get_weather_data_for_coordinates(*self.weather_coordinates(centroid_lat, centroid_lon))
             
             if error or weather_data is None:
                 logging.warning(f"Feature {i}: {error}")
@@ -373,13 +447,14 @@ class AutoUpdater:
                 return None
             else:
                 # Temel risk hesapla
-                risk_skoru = self.hesapla_risk_skoru(
-                    weather_data.get('sicaklik', 25),
-                    weather_data.get('nem', 50),
-                    weather_data.get('ruzgar_hizi', 15),
-                    weather_data.get('yagis_7_gun', 10)
-                )
-                risk_seviyesi = self.get_risk_level(risk_skoru)
+                with span('scoring'):
+                    risk_skoru = self.hesapla_risk_skoru(
+                        weather_data.get('sicaklik', 25),
+                        weather_data.get('nem', 50),
+                        weather_data.get('ruzgar_hizi', 15),
+                        weather_data.get('yagis_7_gun', 10)
+                    )
+                    risk_seviyesi = self.get_risk_level(risk_skoru)
                 
                 # Cache'den analiz kontrolü
                 cached_analysis = get_cached_analysis(
@@ -401,11 +476,7 @@ class AutoUpdater:
                 else:
                     # Varsayılan değerler
                     feature['properties']['human_risk_score'] = 50
-                    feature['properties']['human_risk_factors'] = [
-                        {"factor": "Yerleşim yakınlığı", "score": 50, "description": "Orta seviye risk"},
-                        {"factor": "Turizm aktiviteleri", "score": 40, "description": "Düşük-orta risk"},
-                        {"factor": "Yol ağı", "score": 60, "description": "Orta-yüksek risk"}
-                    ]
+                    feature['properties']['human_risk_factors'] = DEFAULT_HUMAN_RISK_FACTORS
                     feature['properties']['lm_analysis'] = "LM analizi sadece harita üzerinde tıklanan alanlar için yapılır."
                     feature['properties']['weather_weight'] = 60.0
                     feature['properties']['human_weight'] = 40.0
@@ -431,6 +502,13 @@ class AutoUpdater:
                 feature['properties']['ruzgar_hizi'] = 0
                 feature['properties']['yagis_7_gun'] = 0
             
+            # Saatlik veri varsa günlük risk eğrisi ve zirve saati
+            if weather_data is not None:
+                with span('scoring'):
+                    feature['properties'].update(build_risk_timeline(
+                        weather_data.get('hourly'), self.hesapla_risk_skoru, self.get_risk_level
+                    ))
+            
             feature['properties']['son_guncelleme'] = datetime.now().isoformat()
             
             return feature
@@ -439,11 +517,110 @@ class AutoUpdater:
             logging.error(f"Feature {i} işleme hatası: {str(e)}")
             return None
 
+    def process_in_priority_tiers(self, source_path, tiers, process_fn, results, workers=MAX_WORKERS):
+        """
+        Kaynak dosyadaki feature'ları öncelik seviyelerine göre paralel işler. Her seviyede
+        dosya akış halinde okunur ve sadece o seviyenin feature'ları öncelik skoru sırasıyla
+        işlenir; aynı anda en fazla workers * WINDOW_PER_WORKER feature bellekte tutulur
+        (seviyenin geri kalanı geçici spool'da bekler). Başarılı sonuçların
+        properties'i 'results'a (PropertySpool) yazılır.
+        Her seviye bitince (sonuncusu hariç) seviyede tamamlanan alanların tile'ları güncellenir.
+        """
+        logging.info("Öncelik seviyeleri: " + ", ".join(f"{name}: {len(indices)}" for name, indices in tiers))
+        
+        total = sum(len(indices) for _, indices in tiers)
+        window_size = max(1, workers) * WINDOW_PER_WORKER
+        processed_count = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            for tier_number, (tier_name, indices) in enumerate(tiers):
+                completed = []
+                future_to_index = {}
+                for i, feature in iter_selected_in_order(source_path, indices):
+                    if len(future_to_index) >= window_size:
+                        finished, _ = concurrent.futures.wait(future_to_index, return_when=concurrent.futures.FIRST_COMPLETED)
+                        processed_count = self.collect_results(finished, future_to_index, results, completed, processed_count, total)
+                    future_to_index[executor.submit(process_fn, (i, feature))] = i
+                processed_count = self.collect_results(list(future_to_index), future_to_index, results, completed, processed_count, total)
+                
+                if tier_number < len(tiers) - 1:
+                    logging.info(f"Öncelik seviyesi tamamlandı: {tier_name}, ara sonuç yayınlanıyor...")
+                    try:
+                        self.publish_partial(source_path, results, completed)
+                    except Exception as e:
+                        logging.error(f"Ara sonuç yayınlama hatası: {str(e)}")
+        
+        return processed_count
+
+    def collect_results(self, futures, future_to_index, results, completed, processed_count, total):
+        """Biten işlerin sonuçlarını spool'a yazar; güncel başarılı sayısını döndürür"""
+        for future in concurrent.futures.as_completed(futures):
+            i = future_to_index.pop(future)
+            result = future.result()
+            if result:
+                results.put(i, result['properties'])
+                completed.append(i)
+                processed_count += 1
+                if processed_count % 50 == 0:
+                    logging.info(f"İşlenen alan: {processed_count}/{total}")
+        return processed_count
+
+    def plan_job(self, name, features, deadline_hhmm, lm_per_minute=None):
+        """İşin süresini tahmin edip deadline'a uyan planı seçer ve uygular"""
+        deadline = deadline_today(deadline_hhmm)
+        plan = plan_run(
+            len(features),
+            len(group_by_weather_cell(features)),
+            deadline,
+            WEATHER_MAX_REQUESTS_PER_MINUTE,
+            lm_per_minute=lm_per_minute,
+            max_workers=MAX_WORKERS
+        )
+        self.weather_sampling = plan.weather_sampling
+        self.last_run_plans[name] = plan.to_dict()
+        logging.info(f"Çalıştırma planı ({name}, deadline {deadline.strftime('%H:%M')}): {plan.to_dict()}")
+        return plan, deadline
+
+    def deterministic_combined_risk(self, weather_data, reason="Zaman bütçesi nedeniyle"):
+        """Zaman bütçesi aşıldığında ya da LM servisi erişilemezken kullanılan deterministik birleşik risk"""
+        risk_skoru = self.hesapla_risk_skoru(
+            weather_data.get('sicaklik', 25),
+            weather_data.get('nem', 50),
+            weather_data.get('ruzgar_hizi', 15),
+            weather_data.get('yagis_7_gun', 10)
+        )
+        risk_level = self.get_risk_level(risk_skoru)
+        if risk_skoru >= 60:
+            risk_color = "red"
+        elif risk_skoru >= 30:
+            risk_color = "orange"
+        else:
+            risk_color = "green"
+        return {
+            'combined_risk_score': risk_skoru,
+            'combined_risk_level': risk_level,
+            'combined_risk_color': risk_color,
+            'weather_data': weather_data,
+            'analysis': f"{reason} bu alan için deterministik hava durumu skoru kullanıldı.",
+            'analysis_degraded': True
+        }
+
+    def publish_partial(self, source_path, results, completed):
+        """
+        Ara sonuç: sadece seviyede tamamlanan alanların vektör tile'ları güncellenir;
+        dosyalar ve risk geçmişi çalıştırma sonunda yazılır
+        """
+        with span('derived_outputs'):
+            tile_store.update(results.merge(iter_features(source_path)), completed)
+
     def update_forest_risks(self):
         """
         Tüm orman alanlarının risk verilerini günceller (paralel işlem ile)
         """
+        profile = start_profile(f"update_forest_risks-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
         try:
+            if not quota_budget.allow_refresh('weatherapi'):
+                logging.warning(f"WeatherAPI aylık kotası risk altında, risk güncellemesi atlanıyor: {quota_budget.usage('weatherapi')}")
+                return
             logging.info("Risk güncellemesi başlatılıyor...")
             
             # GeoJSON dosyasını yükle
@@ -451,71 +628,96 @@ class AutoUpdater:
             if not os.path.exists(geojson_path):
                 logging.error(f"GeoJSON dosyası bulunamadı: {geojson_path}")
                 return
-                
-            with open(geojson_path, 'r', encoding='utf-8') as f:
-                geojson_data = json.load(f)
             
-            logging.info(f"Toplam {len(geojson_data['features'])} alan işlenecek...")
-            
-            # Paralel işlem için ThreadPoolExecutor kullan
-            with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-                # Tüm feature'ları işlem için hazırla
-                feature_data = [(i, feature) for i, feature in enumerate(geojson_data['features'])]
-                
-                # Paralel olarak işle
-                future_to_feature = {executor.submit(self.process_single_feature, fd): fd for fd in feature_data}
-                
-                processed_count = 0
-                for future in concurrent.futures.as_completed(future_to_feature):
-                    result = future.result()
-                    if result:
-                        processed_count += 1
-                        if processed_count % 50 == 0:
-                            logging.info(f"İşlenen alan: {processed_count}/{len(geojson_data['features'])}")
+            # Plan ve öncelik için sadece hafif kopyalar; geometriler belleğe alınmaz
+            with span('geojson_load'):
+                stubs = priority_stubs(geojson_path)
+            total = len(stubs)
             
-            # Güncellenmiş GeoJSON'u kaydet
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_filename = f'static/export_with_risk_auto_{timestamp}.geojson'
+            logging.info(f"Toplam {total} alan işlenecek...")
             
+            # Tamamlanan sonuçlar diskte birikir; çıktılar kaynak yeniden okunurken birleştirilir
+            results = PropertySpool()
             try:
-                with open(output_filename, 'w', encoding='utf-8') as f:
-                    json.dump(geojson_data, f, ensure_ascii=False, indent=2)
+                # LM işi başlamadan bitecek şekilde planla (gerekirse hava durumu örneklenir)
+                plan, _ = self.plan_job('update_forest_risks', stubs, CLASSIC_RUN_DEADLINE)
                 
-                # JSON dosyasının geçerli olduğunu kontrol et
-                with open(output_filename, 'r', encoding='utf-8') as f:
-                    json.load(f)
+                # En riskli alanlar önce işlenir, her seviye bitince ara sonuç yayınlanır
+                with span('prioritization'):
+                    tiers = priority_tiers(stubs)
+                stubs = None
+                run_start = time.time()
+                with track_run('update_forest_risks'):
+                    processed_count = self.process_in_priority_tiers(geojson_path, tiers, self.process_single_feature, results, workers=plan.workers)
+                record_run_throughput('update_forest_risks', processed_count, total - processed_count, time.time() - run_start)
                 
-                # En son güncellenmiş dosyayı işaretle
+                # Güncellenmiş GeoJSON'u kaydet
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                output_filename = archive_path('export_with_risk_auto', timestamp)
                 latest_file = 'static/export_with_risk_latest.geojson'
-                with open(latest_file, 'w', encoding='utf-8') as f:
-                    json.dump(geojson_data, f, ensure_ascii=False, indent=2)
                 
-                logging.info(f"Risk güncellemesi tamamlandı. Sonuç: {output_filename}")
-                
-            except Exception as e:
-                logging.error(f"JSON kaydetme hatası: {str(e)}")
-                # Hata durumunda dosyayı sil
-                if os.path.exists(output_filename):
-                    os.remove(output_filename)
-                raise
+                try:
+                    # Zaman damgalı kopya kompakt ikili snapshot olarak saklanır
+                    # (GeoJSON gerektiğinde /export/<isim>.geojson ile türetilir);
+                    # en son GeoJSON dosyası aynı geçişte yazılır
+                    with span('snapshot_write'):
+                        members = {}
+                        with GeoJSONWriter(latest_file) as writer:
+                            write_snapshot(output_filename, write_through(results.merge(iter_features(geojson_path, members)), writer), {
+                                'source': 'update_forest_risks', 'created_at': timestamp,
+                                'run_id': profile.run_id, 'profile': profile.summary()['stages']
+                            })
+                            writer.close(trailing_members(members))
+                    
+                    # Snapshot başlığının okunabildiğini kontrol et
+                    read_snapshot_metadata(output_filename)
+                    
+                    # Vektör tile'ları güncelle (sadece değişen alanların tile'ları)
+                    try:
+                        with span('derived_outputs'):
+                            with Snapshot(output_filename) as snapshot:
+                                tile_store.build(snapshot.features())
+                    except Exception as e:
+                        logging.error(f"Vektör tile üretim hatası: {str(e)}")
+                    
+                    # Eski zaman damgalı sonuçlar birikmez
+                    prune_snapshots('export_with_risk_auto')
+                    
+                    logging.info(f"Risk güncellemesi tamamlandı. Sonuç: {output_filename}")
+                    
+                except Exception as e:
+                    logging.error(f"JSON kaydetme hatası: {str(e)}")
+                    # Hata durumunda dosyayı sil
+                    if os.path.exists(output_filename):
+                        os.remove(output_filename)
+                    raise
+            finally:
+                results.close()
             
             self.last_update = datetime.now()
             logging.info(f"Risk güncellemesi tamamlandı. Sonuç: {output_filename}")
             
         except Exception as e:
             logging.error(f"Risk güncellemesi sırasında hata: {str(e)}")
+        finally:
+            finish_profile(profile)
 
     def update_forest_lm_risks(self):
         """
         Tüm orman alanlarının LM destekli birleşik risk verilerini günceller
         """
+        profile = start_profile()
         try:
+            if not quota_budget.allow_refresh('weatherapi'):
+                logging.warning(f"WeatherAPI aylık kotası risk altında, LM risk güncellemesi atlanıyor: {quota_budget.usage('weatherapi')}")
+                return
             logging.info("Birleşik LM risk güncellemesi başlatılıyor...")
             
             # LM analizi başladığını işaretle
             cache_manager.start_lm_analysis()
             
             geojson_path = 'static/export_with_risk_latest.geojson'
+            latest_file = 'static/export_with_lm_risk_latest.geojson'
             fires_path = 'static/fires.json'
             fire_points = []
             
@@ -527,53 +729,121 @@ class AutoUpdater:
                 logging.error(f"GeoJSON dosyası bulunamadı: {geojson_path}")
                 cache_manager.complete_lm_analysis()
                 return
+            
+            # Plan ve öncelik için sadece hafif kopyalar; geometriler belleğe alınmaz
+            with span('geojson_load'):
+                stubs = priority_stubs(geojson_path)
+            total = len(stubs)
                 
-            with open(geojson_path, 'r', encoding='utf-8') as f:
-                geojson_data = json.load(f)
-                
-            logging.info(f"Toplam {len(geojson_data['features'])} alan LM analizi için hazırlanıyor...")
+            logging.info(f"Toplam {total} alan LM analizi için hazırlanıyor...")
+            
+            # Artımlı mod: önceki LM sonucunun girdileriyle karşılaştırmak için
+            # (güncel snapshot varsa properties istendiğinde ondan okunur)
+            previous_path = latest_snapshot('export_with_lm_risk', newer_than=latest_file) or latest_file
+            previous_results = load_previous_results(previous_path) if INCREMENTAL_ANALYSIS else {}
+            
+            # Tamamlanan sonuçlar diskte birikir; çıktılar kaynak yeniden okunurken birleştirilir
+            results = PropertySpool()
             
-            # Paralel işlem için ThreadPoolExecutor kullan
-            with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-                # Tüm alanları analiz için hazırla
-                feature_data = [(i, feature) for i, feature in enumerate(geojson_data['features'])]
+            try:
+                # Deadline'a sığacak plan; bütçe aşılırsa en düşük öncelikliler deterministik skorla
+                plan, deadline = self.plan_job('update_forest_lm_risks', stubs, LM_RUN_DEADLINE, lm_per_minute=LM_MAX_REQUESTS_PER_MINUTE)
+                monitor = DeadlineMonitor(plan, deadline)
+                
+                # En riskli alanlar önce işlenir, her seviye bitince ara sonuç yayınlanır
+                with span('prioritization'):
+                    tiers = priority_tiers(stubs, lambda feature, i: previous_for(previous_results, feature, i))
+                stubs = None
+                ranks = {}
+                for _, indices in tiers:
+                    for i in indices:
+                        ranks[i] = len(ranks)
                 
-                # Paralel olarak analiz et
-                future_to_feature = {executor.submit(self.process_lm_single_feature, fd, fire_points): fd for fd in feature_data}
+                # Aynı hava durumu verisini hedefleyen yarım kalmış çalıştırma varsa tamamlanan alanlar günlükten alınır
+                run_id, resumed_results = run_journal.start_or_resume('update_forest_lm_risks')
+                profile.run_id = run_id
                 
-                processed_count = 0
-                for future in concurrent.futures.as_completed(future_to_feature):
-                    result = future.result()
+                def process_with_journal(fd):
+                    i, feature = fd
+                    with span('geometry'):
+                        fid = feature_id(feature, i)
+                    if fid in resumed_results:
+                        feature['properties'] = resumed_results[fid]
+                        return feature
+                    result = self.process_lm_single_feature(fd, fire_points, previous_results, monitor, ranks.get(i, 0))
                     if result:
-                        processed_count += 1
-                        if processed_count % 50 == 0:
-                            logging.info(f"LM Analizi ilerleme: {processed_count}/{len(geojson_data['features'])} alan işlendi")
+                        run_journal.record(run_id, fid, result['properties'])
+                    return result
+                
+                run_start = time.time()
+                with track_run('update_forest_lm_risks'):
+                    processed_count = self.process_in_priority_tiers(geojson_path, tiers, process_with_journal, results, workers=plan.workers)
+                record_run_throughput('update_forest_lm_risks', processed_count, total - processed_count, time.time() - run_start)
+                self.last_run_plans['update_forest_lm_risks'] = monitor.summary()
+                
+                # Kaydet
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                output_filename = archive_path('export_with_lm_risk', timestamp)
+                skipped = []
+                
+                def counted(features):
+                    # Girdileri değişmediği için taşınan sonuçlar yazılırken sayılır
+                    for feature in features:
+                        if feature.get('properties', {}).get('analysis_carried_forward'):
+                            skipped.append(1)
+                        yield feature
+                
+                try:
+                    # En son GeoJSON dosyası snapshot ile aynı geçişte yazılır
+                    with span('snapshot_write'):
+                        members = {}
+                        with GeoJSONWriter(latest_file) as writer:
+                            features = write_through(counted(results.merge(iter_features(geojson_path, members))), writer)
+                            write_snapshot(output_filename, features, lambda: {
+                                'source': 'update_forest_lm_risks', 'created_at': timestamp, 'skipped_unchanged': len(skipped),
+                                'run_id': run_id, 'resumed_from_checkpoint': len(resumed_results),
+                                'profile': profile.summary()['stages']
+                            })
+                            writer.close(trailing_members(members))
+                    logging.info(f"LM analizi: {processed_count} alan işlendi, {len(skipped)} alan girdileri değişmediği için atlandı, {monitor.degraded_count} alan deterministik skorla işlendi")
                     
-            # Kaydet
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_filename = f'static/export_with_lm_risk_{timestamp}.geojson'
-            
-            try:
-                with open(output_filename, 'w', encoding='utf-8') as f:
-                    json.dump(geojson_data, f, ensure_ascii=False, indent=2)
+                    with Snapshot(output_filename) as snapshot:
+                        # Vektör tile'ları güncelle (sadece değişen alanların tile'ları)
+                        try:
+                            with span('derived_outputs'):
+                                tile_store.build(snapshot.features())
+                        except Exception as e:
+                            logging.error(f"Vektör tile üretim hatası: {str(e)}")
+                        
+                        # Değişen birleşik risk değerlerini geçmişe ekle
+                        try:
+                            risk_history.record_run(snapshot.features(geometry=False), source='update_forest_lm_risks')
+                        except Exception as e:
+                            logging.error(f"Risk geçmişi kaydetme hatası: {str(e)}")
+                        
+                    run_journal.complete(run_id)
+                    prune_snapshots('export_with_lm_risk')
+                    logging.info(f"Birleşik LM risk güncellemesi tamamlandı. Sonuç: {output_filename}")
                     
-                with open('static/export_with_lm_risk_latest.geojson', 'w', encoding='utf-8') as f:
-                    json.dump(geojson_data, f, ensure_ascii=False, indent=2)
+                except Exception as e:
+                    logging.error(f"LM analizi dosya kaydetme hatası: {str(e)}")
                     
-                logging.info(f"Birleşik LM risk güncellemesi tamamlandı. Sonuç: {output_filename}")
-                
-            except Exception as e:
-                logging.error(f"LM analizi dosya kaydetme hatası: {str(e)}")
-                
+                finally:
+                    # LM analizi tamamlandığını işaretle
+                    cache_manager.complete_lm_analysis()
+                    
+                    # Çalışma 13:01'i aştıysa ertelenen cache temizliğini şimdi yap
+                    cache_manager.clear_expired_cache()
             finally:
-                # LM analizi tamamlandığını işaretle
-                cache_manager.complete_lm_analysis()
+                results.close()
                 
         except Exception as e:
             logging.error(f"Birleşik LM risk güncellemesi sırasında hata: {str(e)}")
             cache_manager.complete_lm_analysis()
+        finally:
+            finish_profile(profile)
 
-    def process_lm_single_feature(self, feature_data, fire_points):
+    def process_lm_single_feature(self, feature_data, fire_points, previous_results=None, monitor=None, rank=0):
         """
         Tek bir alanı LM analizi ile işler (paralel işlem için)
         """
@@ -595,19 +865,49 @@ class AutoUpdater:
                     coordinates = geometry['coordinates'][0]
                 else:
                     return None
-                centroid_lat, centroid_lon = self.calculate_centroid(coordinates)
+                with span('geometry'):
+                    centroid_lat, centroid_lon = self.calculate_centroid(coordinates)
                 
             if centroid_lat is None or centroid_lon is None:
                 return None
                 
             # Hava durumu verisini çek
-            weather_data, error = self.get_weather_data_for_coordinates(centroid_lat, centroid_lon)
+            weather_data, error = self.get_weather_data_for_coordinates(*self.weather_coordinates(centroid_lat, centroid_lon))
+            previous = previous_for(previous_results, feature, i)
             if error or weather_data is None:
                 logging.warning(f"Feature {i}: Hava durumu hatası - {error}")
+                # Servis erişilemezken önceki sonuç varsa onu taşı
+                if previous is not None:
+                    return carry_forward(feature, previous)
                 return None
                 
-            # LM analizli birleşik risk hesapla
-            combined_risk = lm_analyzer.analyze_forest_area((centroid_lat, centroid_lon), weather_data, area_info)
+            # Girdileri anlamlı değişmemişse önceki sonucu taşı (LM çağrısı yapılmaz)
+            inputs = analysis_inputs(weather_data)
+            if previous is not None and reanalysis_reason(previous.get('analysis_inputs'), inputs) is None:
+                return carry_forward(feature, previous)
+                
+            # Zaman bütçesi kalmadıysa ya da LM devresi açıksa deterministik skor
+            # (analysis_inputs yazılmaz, sonraki çalıştırmada yeniden denenir)
+            lm_budget = monitor is None or monitor.allow_lm(rank)
+            if not lm_budget or not groq_controller.available():
+                with span('scoring'):
+                    combined_risk = self.deterministic_combined_risk(
+                        weather_data, "Zaman bütçesi nedeniyle" if not lm_budget else "LM servisi erişilemediği için")
+                combined_risk['analysis_carried_forward'] = False
+                used_lm = False
+            else:
+                # LM analizli birleşik risk hesapla
+                lm_start = time.time()
+                with span('llm_call'):
+                    combined_risk = lm_analyzer.analyze_forest_area((centroid_lat, centroid_lon), weather_data, area_info)
+                latency_tracker.record('lm', time.time() - lm_start)
+                combined_risk['analysis_inputs'] = inputs
+                combined_risk['analysis_carried_forward'] = False
+                combined_risk['analysis_degraded'] = False
+                used_lm = True
+            
+            if monitor is not None:
+                monitor.feature_done(used_lm)
             
             # Sonuçları properties'e yaz
             for k, v in combined_risk.items():
@@ -634,6 +934,11 @@ class AutoUpdater:
         # Cache temizleme - 13:01'de (LM analizi bittikten sonra)
         schedule.every().day.at("13:01").do(cache_manager.clear_expired_cache)
         
+        # Yeniden başlatma öncesi yarım kalan bugünkü LM çalıştırmasını tamamla
+        if run_journal.has_unfinished('update_forest_lm_risks'):
+            logging.info("Yarım kalmış LM analizi bulundu, kaldığı yerden devam ediliyor...")
+            self.update_forest_lm_risks()
+        
         logging.info("Zamanlayıcı başlatıldı:")
         logging.info("- 12:00: Klasik risk güncellemesi")
         logging.info("- 13:00: LM destekli risk güncellemesi")
@@ -648,6 +953,8 @@ class AutoUpdater:
         Background thread'i başlatır
         """
         if not self.is_running:
+            configure_logging()
+            weatherapi_key()  # Anahtar yoksa zamanlayıcı başlamadan hata ver
             self.is_running = True
             self.thread = threading.Thread(target=self.start_scheduler, daemon=True)
             self.thread.start()
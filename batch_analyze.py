@@ -0,0 +1,248 @@
+"""
+Web sunucusu veya zamanlayıcı olmadan herhangi bir GeoJSON dosyasını analiz eden komut satırı aracı.
+
+Kullanım:
+    python batch_analyze.py girdi.geojson cikti.geojson --weather synthetic --scorer classic --workers 8
+    python batch_analyze.py girdi.geojson cikti.snap --format snapshot --weather cached --scorer dummy
+    python batch_analyze.py girdi.geojson cikti.ndjson --format ndjson --weather live --scorer lm --limit 500
+
+Hava durumu kaynakları:
+    live       WeatherAPI.com (WEATHERAPI_KEY gerekir, rate limit uygulanır)
+    cached     Girdi dosyasındaki hava durumu değerleri (önceki analiz çıktısı); API çağrısı yapılmaz
+    synthetic  AutoUpdater.get_test_weather_data ile koordinat bazlı sentetik veri
+
+Skorlayıcılar:
+    classic    hesapla_risk_skoru (deterministik hava durumu skoru)
+    lm         lm_analyzer (GROQ_API_KEY yoksa dummy analize düşer)
+    dummy      LM çağrısı yapmadan dummy birleşik analiz
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import itertools
+import collections
+import concurrent.futures
+from datetime import datetime
+from risk_timeline import build_risk_timeline
+from geojson_stream import iter_features, GeoJSONWriter
+
+WEATHER_PROVIDERS = ['live', 'cached', 'synthetic']
+SCORERS = ['classic', 'lm', 'dummy']
+OUTPUT_FORMATS = ['geojson', 'ndjson', 'snapshot']
+WEATHER_FIELDS = ['sicaklik', 'nem', 'ruzgar_hizi', 'yagis_7_gun']
+WINDOW_PER_WORKER = 4  # Bellekte tutulan feature sayısı: eşzamanlılık x bu değer
+
+
+def cached_weather(properties):
+    """Girdi feature'ında daha önce kaydedilmiş hava durumu değerleri"""
+    source = properties.get('weather_data') or properties
+    if any(source.get(name) is None for name in WEATHER_FIELDS):
+        return None, "Girdide hava durumu verisi yok"
+    weather_data = {name: source[name] for name in WEATHER_FIELDS}
+    if source.get('hourly'):
+        weather_data['hourly'] = source['hourly']
+    return weather_data, None
+
+
+class BatchAnalyzer:
+    """Seçilen hava durumu kaynağı ve skorlayıcı ile feature'ları analiz eder"""
+
+    def __init__(self, weather_provider='synthetic', scorer='classic', sample_weather=False, seed=None):
+        from auto_updater import auto_updater
+        from lm_risk_analyzer import lm_analyzer
+
+        self.updater = auto_updater
+        self.updater.weather_sampling = sample_weather
+        self.weather_provider = weather_provider
+        self.scorer = scorer
+        self.seed = seed
+        self.lm_analyzer = lm_analyzer
+
+    def weather_for(self, i, properties, lat, lon):
+        if self.weather_provider == 'cached':
+            return cached_weather(properties)
+        if self.weather_provider == 'synthetic':
+            # Tohum verildiyse her feature kendi üretecini kullanır: sonuç iş parçacığı sırasından bağımsızdır
+            rng = random.Random(self.seed ^ i) if self.seed is not None else None
+            return self.updater.get_test_weather_data(lat, lon, rng)
+        return self.updater.get_weather_data_for_coordinates(*self.updater.weather_coordinates(lat, lon))
+
+    def score(self, lat, lon, weather_data, area_info):
+        updater = self.updater
+        if self.scorer == 'classic':
+            combined_risk = updater.deterministic_combined_risk(weather_data)
+            combined_risk['analysis'] = "Deterministik hava durumu skoru (toplu analiz)."
+            combined_risk['analysis_degraded'] = False
+            combined_risk['risk_skoru'] = combined_risk['combined_risk_score']
+            combined_risk['risk_seviyesi'] = combined_risk['combined_risk_level']
+            return combined_risk
+        if self.scorer == 'dummy':
+            # Gerçek Groq analizörü yüklüyse bile API'ye gidilmez
+            dummy = getattr(self.lm_analyzer, '_dummy_analysis', self.lm_analyzer.analyze_forest_area)
+            return dummy((lat, lon), weather_data, area_info)
+        return self.lm_analyzer.analyze_forest_area((lat, lon), weather_data, area_info)
+
+    def process(self, feature_data):
+        """Tek bir feature'ı analiz eder; başarısızsa None döndürür"""
+        i, feature = feature_data
+        try:
+            properties = feature.setdefault('properties', {})
+            lat = properties.get('centroid_lat')
+            lon = properties.get('centroid_lon')
+            if lat is None or lon is None:
+                geometry = feature.get('geometry') or {}
+                if geometry.get('type') == 'Polygon':
+                    coordinates = geometry['coordinates']
+                elif geometry.get('type') == 'MultiPolygon':
+                    coordinates = geometry['coordinates'][0]
+                else:
+                    return None
+                lat, lon = self.updater.calculate_centroid(coordinates)
+            if lat is None or lon is None:
+                return None
+
+            weather_data, error = self.weather_for(i, properties, lat, lon)
+            if error or weather_data is None:
+                print(f"Feature {i}: hava durumu alınamadı - {error}")
+                return None
+
+            area_info = {
+                'landuse': properties.get('landuse', 'forest'),
+                'area': properties.get('area', 0),
+                'name': properties.get('name', 'Orman Alanı')
+            }
+            properties.update(self.score(lat, lon, weather_data, area_info))
+            for name in WEATHER_FIELDS:
+                properties[name] = weather_data.get(name, 0)
+            properties.update(build_risk_timeline(
+                weather_data.get('hourly'), self.updater.hesapla_risk_skoru, self.updater.get_risk_level
+            ))
+            properties.pop('analysis_failed', None)
+            properties['son_guncelleme'] = datetime.now().isoformat()
+            return feature
+        except Exception as e:
+            print(f"Feature {i} analiz hatası: {e}")
+            return None
+
+
+def iter_analyzed(features, analyzer, workers=4, counts=None):
+    """
+    Feature'ları paralel analiz edip girdi sırasıyla üretir. Aynı anda en fazla
+    workers * WINDOW_PER_WORKER feature bellekte tutulur; girdi bir akış olabilir.
+    'counts' sözlüğüne analiz edilen / başarısız sayıları yazılır.
+    """
+    counts = counts if counts is not None else {}
+    counts.update({'total': 0, 'analyzed': 0, 'failed': 0})
+    window = collections.deque()
+    window_size = max(1, workers) * WINDOW_PER_WORKER
+
+    def finish(feature, future):
+        if future.result() is None:
+            feature.setdefault('properties', {})['analysis_failed'] = True
+            counts['failed'] += 1
+        else:
+            counts['analyzed'] += 1
+        counts['total'] += 1
+        if counts['total'] % 500 == 0:
+            print(f"İşlenen alan: {counts['total']}")
+        return feature
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for i, feature in enumerate(features):
+            window.append((feature, executor.submit(analyzer.process, (i, feature))))
+            if len(window) >= window_size:
+                yield finish(*window.popleft())
+        while window:
+            yield finish(*window.popleft())
+
+
+def run_batch(features, analyzer, workers=4):
+    """Feature listesini yerinde analiz eder; (analiz edilen, başarısız) sayılarını döndürür"""
+    counts = {}
+    for _ in iter_analyzed(features, analyzer, workers, counts):
+        pass
+    return counts['analyzed'], counts['failed']
+
+
+def write_output(path, output_format, features, metadata):
+    """
+    Feature akışını istenen formatta geçici dosya + atomik değiştirme ile yazar.
+    'metadata' tüm feature'lar yazıldıktan sonra çağrılan bir fonksiyondur.
+    """
+    if output_format == 'snapshot':
+        from snapshot_store import write_snapshot
+        return write_snapshot(path, features, metadata)
+
+    with GeoJSONWriter(path, ndjson=output_format == 'ndjson') as writer:
+        for feature in features:
+            writer.write(feature)
+        return writer.close({'metadata': metadata()})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='GeoJSON dosyası için toplu orman yangını riski analizi')
+    parser.add_argument('input', help='Girdi GeoJSON dosyası')
+    parser.add_argument('output', help='Çıktı dosyası')
+    parser.add_argument('--workers', type=int, default=4, help='Eşzamanlı analiz sayısı')
+    parser.add_argument('--weather', choices=WEATHER_PROVIDERS, default='synthetic', help='Hava durumu kaynağı')
+    parser.add_argument('--scorer', choices=SCORERS, default='classic', help='Risk skorlayıcısı')
+    parser.add_argument('--format', dest='output_format', choices=OUTPUT_FORMATS, default='geojson', help='Çıktı formatı')
+    parser.add_argument('--limit', type=int, help='Yalnızca ilk N alanı analiz et')
+    parser.add_argument('--sample-weather', action='store_true', help='Canlı hava durumunu 0.1° hücre merkezinden al')
+    parser.add_argument('--seed', type=int, help='Sentetik hava durumu için rastgele tohum (eşzamanlılıktan bağımsız tekrarlanabilir)')
+    args = parser.parse_args(argv)
+
+    # Girdi akış halinde okunur; bellekte yalnızca analiz penceresindeki feature'lar durur
+    input_members = {}
+    features = iter_features(args.input, input_members)
+    if args.limit is not None:
+        # Erken durulduğunda features'tan sonra gelen girdi metadata'sı okunmaz
+        features = itertools.islice(features, args.limit)
+
+    analyzer = BatchAnalyzer(args.weather, args.scorer, args.sample_weather, args.seed)
+    print(f"Toplu analiz: {args.input}, hava durumu={args.weather}, skorlayıcı={args.scorer}, "
+          f"eşzamanlılık={args.workers}")
+
+    counts = {}
+    start_time = time.time()
+    summary = {}
+
+    def metadata():
+        # Tüm feature'lar yazıldıktan sonra çağrılır (girdideki metadata da o zamana kadar okunmuştur)
+        duration = time.time() - start_time
+        summary['duration'] = duration
+        summary['features_per_second'] = counts['total'] / duration if duration > 0 else 0.0
+        result = dict(input_members.get('metadata') or {})
+        result.update({
+            'total_areas': counts['total'],
+            'analyzed_areas': counts['analyzed'],
+            'failed_analyses': counts['failed'],
+            'analysis_date': datetime.now().isoformat(),
+            'analysis_duration': round(duration, 2),
+            'features_per_second': round(summary['features_per_second'], 2),
+            'batch': {
+                'source': os.path.abspath(args.input),
+                'weather_provider': args.weather,
+                'scorer': args.scorer,
+                'workers': args.workers,
+                'seed': args.seed
+            }
+        })
+        return result
+
+    write_output(args.output, args.output_format, iter_analyzed(features, analyzer, args.workers, counts), metadata)
+    analyzed_count, failed_count, total = counts['analyzed'], counts['failed'], counts['total']
+    duration = summary['duration']
+    features_per_second = summary['features_per_second']
+
+    print(f"Tamamlandı: {analyzed_count}/{total} alan analiz edildi, {failed_count} başarısız")
+    print(f"Süre: {duration:.2f} saniye - {features_per_second:.1f} alan/saniye")
+    print(f"Çıktı: {args.output} ({args.output_format})")
+    return 0 if analyzed_count or not total else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
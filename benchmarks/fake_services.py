@@ -0,0 +1,239 @@
+"""
+Benchmark'lar için yerel sahte WeatherAPI ve Groq sunucuları.
+
+Her iki sunucu da ayarlanabilir gecikme ve belirli oranda 429 (rate limit)
+yanıtı üretir. Yanıtlar koordinattan türetildiği için tekrarlanabilirdir.
+
+Kullanım (elle deneme için):
+    python -m benchmarks.fake_services --weather-port 8081 --groq-port 8082 --latency 0.2 --error-rate 0.05
+    WEATHERAPI_BASE_URL=http://127.0.0.1:8081/v1 GROQ_BASE_URL=http://127.0.0.1:8082 python app.py
+"""
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class ServiceBehavior:
+    """Sahte servisin gecikme ve hata davranışı; istek sayılarını da tutar"""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'rate_limited': 0}
+
+    def before_response(self, endpoint):
+        """Gecikmeyi uygular; bu istek 429 ile yanıtlanacaksa True döndürür"""
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats[endpoint] = self.stats.get(endpoint, 0) + 1
+            delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+            limited = self.rng.random() < self.error_rate
+            if limited:
+                self.stats['rate_limited'] += 1
+        if delay:
+            time.sleep(delay)
+        return limited
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats)
+
+
+def _unit(key, salt):
+    """Anahtar için 0-1 arası tekrarlanabilir değer"""
+    digest = hashlib.md5(f"{salt}:{key}".encode('utf-8')).digest()
+    return int.from_bytes(digest[:4], 'little') / 0xFFFFFFFF
+
+
+def weather_values(query, hour=12, day=0):
+    """Koordinat sorgusu için gerçekçi hava durumu değerleri (saat ve gün etkisiyle)"""
+    key = f"{query}:{day}"
+    daily_wave = -abs(hour - 15) / 15.0  # Öğleden sonra en sıcak, en kuru
+    return {
+        'temp_c': round(12 + 22 * _unit(key, 'temp') + 6 * daily_wave, 1),
+        'humidity': max(5, min(100, int(25 + 55 * _unit(key, 'humidity') - 15 * daily_wave))),
+        'wind_kph': round(45 * _unit(key, 'wind') * (0.7 + 0.3 * _unit(f"{key}:{hour}", 'gust')), 1),
+        'precip_mm': round(max(0.0, 30 * _unit(key, 'rain') - 18), 1)
+    }
+
+
+def forecast_day(query, date, day=0):
+    hours = []
+    for hour in range(24):
+        values = weather_values(query, hour, day)
+        values['time'] = f"{date} {hour:02d}:00"
+        hours.append(values)
+    return {'date': date, 'hour': hours}
+
+
+def location(query):
+    lat, _, lon = query.partition(',')
+    return {'name': 'Sahte Konum', 'country': 'Turkey', 'lat': float(lat or 0), 'lon': float(lon or 0)}
+
+
+class FakeWeatherHandler(BaseHTTPRequestHandler):
+    """current.json, history.json, forecast.json ve bulk (POST current.json?q=bulk) uç noktaları"""
+    behavior = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _rate_limited(self):
+        self._send(429, {'error': {'code': 2007, 'message': 'API key has exceeded calls per minute quota.'}})
+
+    def _current(self, query):
+        values = weather_values(query)
+        return {'location': location(query), 'current': values}
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        params = {name: values[0] for name, values in parse_qs(parsed.query).items()}
+        endpoint = parsed.path.rsplit('/', 1)[-1]
+        if endpoint not in ('current.json', 'history.json', 'forecast.json'):
+            return self._send(404, {'error': {'code': 1005, 'message': 'API URL is invalid.'}})
+        if self.behavior.before_response(endpoint):
+            return self._rate_limited()
+
+        query = params.get('q', '0,0')
+        if endpoint == 'current.json':
+            return self._send(200, self._current(query))
+        if endpoint == 'history.json':
+            date = params.get('dt', '2025-01-01')
+            return self._send(200, {'location': location(query), 'forecast': {'forecastday': [forecast_day(query, date)]}})
+
+        days = max(1, min(14, int(params.get('days', 1))))
+        forecast_days = [forecast_day(query, f"forecast-{day}", day) for day in range(days)]
+        return self._send(200, {'location': location(query), 'current': weather_values(query),
+                                'forecast': {'forecastday': forecast_days}})
+
+    def do_POST(self):
+        parsed = urlparse(self.path)
+        params = {name: values[0] for name, values in parse_qs(parsed.query).items()}
+        if not parsed.path.endswith('current.json') or params.get('q') != 'bulk':
+            return self._send(404, {'error': {'code': 1005, 'message': 'API URL is invalid.'}})
+        if self.behavior.before_response('bulk'):
+            return self._rate_limited()
+
+        length = int(self.headers.get('Content-Length') or 0)
+        request_body = json.loads(self.rfile.read(length) or b'{}')
+        bulk = []
+        for item in request_body.get('locations', []):
+            query = item.get('q', '0,0')
+            response = self._current(query)
+            response.update({'custom_id': item.get('custom_id'), 'q': query})
+            bulk.append({'query': response})
+        return self._send(200, {'bulk': bulk})
+
+
+class FakeGroqHandler(BaseHTTPRequestHandler):
+    """OpenAI uyumlu /openai/v1/chat/completions uç noktası"""
+    behavior = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if status == 429:
+            self.send_header('Retry-After', '0')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            return self._send(404, {'error': {'message': 'Unknown request URL', 'type': 'invalid_request_error'}})
+        length = int(self.headers.get('Content-Length') or 0)
+        request_body = json.loads(self.rfile.read(length) or b'{}')
+        if self.behavior.before_response('chat.completions'):
+            return self._send(429, {'error': {'message': 'Rate limit reached', 'type': 'tokens', 'code': 'rate_limit_exceeded'}})
+
+        content = ("- Risk seviyesi: Orta\n- Risk skoru: 55\n"
+                   "- Ana risk faktörleri: sıcaklık, düşük nem, rüzgar\n"
+                   "- Öneriler: düzenli devriye, erken uyarı\n- Renk kodu: orange")
+        self._send(200, {
+            'id': f"chatcmpl-fake-{int(time.time() * 1000)}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request_body.get('model', 'fake-model'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': 200, 'completion_tokens': 60, 'total_tokens': 260}
+        })
+
+
+class FakeServer:
+    """Sahte servisi arka plan thread'inde çalıştırır"""
+
+    def __init__(self, handler_class, behavior, port=0):
+        handler = type(handler_class.__name__, (handler_class,), {'behavior': behavior})
+        self.behavior = behavior
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name='fake-service', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def start_fake_weather(latency=0.0, jitter=0.0, error_rate=0.0, seed=0, port=0):
+    return FakeServer(FakeWeatherHandler, ServiceBehavior(latency, jitter, error_rate, seed), port).start()
+
+
+def start_fake_groq(latency=0.0, jitter=0.0, error_rate=0.0, seed=0, port=0):
+    return FakeServer(FakeGroqHandler, ServiceBehavior(latency, jitter, error_rate, seed), port).start()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Sahte WeatherAPI ve Groq sunucuları')
+    parser.add_argument('--weather-port', type=int, default=8081)
+    parser.add_argument('--groq-port', type=int, default=8082)
+    parser.add_argument('--latency', type=float, default=0.0, help='Ortalama yanıt gecikmesi (saniye)')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='429 ile yanıtlanan istek oranı')
+    args = parser.parse_args(argv)
+
+    weather = start_fake_weather(args.latency, args.jitter, args.error_rate, port=args.weather_port)
+    groq = start_fake_groq(args.latency, args.jitter, args.error_rate, port=args.groq_port)
+    print(f"WEATHERAPI_BASE_URL={weather.url}/v1")
+    print(f"GROQ_BASE_URL={groq.url}")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        weather.stop()
+        groq.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,242 @@
+"""
+Flask uç noktaları için HTTP yük testi.
+
+Gerçekçi istemci davranışını taklit eder: her istemci önce haritayı yükler
+(/ ve /get_analyzed_data), ardından belirli aralıklarla /analysis_status
+sorgular. İstekler, yanıt anında arka planda analiz sürüp sürmediğine göre
+ayrı raporlanır; böylece analiz JSON serileştirirken (GIL) yanıt süreleri görülür.
+
+Kullanım:
+    python -m benchmarks.load_harness --url http://127.0.0.1:5000 --clients 50 --duration 120
+    python -m benchmarks.load_harness --clients 100 --duration 300 --trigger-analysis --output load.json
+
+    # Sahte WeatherAPI / Groq ile yerel sunucuyu kendisi başlatır
+    python -m benchmarks.load_harness --spawn-server --clients 50 --duration 120 --trigger-analysis
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import threading
+import tempfile
+import subprocess
+import requests
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_URL = 'http://127.0.0.1:5000'
+POLL_INTERVAL = 10.0  # Tarayıcıdaki analiz durumu sorgulama aralığı
+REQUEST_TIMEOUT = 60
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q / 100.0 * len(ordered)))]
+
+
+class LoadStats:
+    """İstek sonuçlarını uç nokta ve analiz durumuna göre toplar"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}  # (endpoint, phase) -> [(latency, ok, bytes)]
+        self.errors = {}
+        self.analysis_active = False
+
+    def record(self, endpoint, latency, ok, size, error=None):
+        phase = 'during_analysis' if self.analysis_active else 'idle'
+        with self.lock:
+            self.samples.setdefault((endpoint, phase), []).append((latency, ok, size))
+            if error:
+                self.errors[error] = self.errors.get(error, 0) + 1
+
+    def report(self, duration):
+        with self.lock:
+            samples = {key: list(values) for key, values in self.samples.items()}
+            errors = dict(self.errors)
+
+        def summarize(values):
+            latencies = [latency for latency, _, _ in values]
+            failed = sum(1 for _, ok, _ in values if not ok)
+            return {
+                'requests': len(values),
+                'errors': failed,
+                'throughput_rps': round(len(values) / duration, 2) if duration > 0 else None,
+                'mean_bytes': int(sum(size for _, _, size in values) / len(values)) if values else 0,
+                'p50_ms': round(1000 * percentile(latencies, 50), 1),
+                'p90_ms': round(1000 * percentile(latencies, 90), 1),
+                'p99_ms': round(1000 * percentile(latencies, 99), 1),
+                'max_ms': round(1000 * max(latencies), 1) if latencies else 0.0
+            }
+
+        endpoints = {}
+        for (endpoint, phase), values in sorted(samples.items()):
+            endpoints.setdefault(endpoint, {})[phase] = summarize(values)
+        all_values = [sample for values in samples.values() for sample in values]
+        return {'overall': summarize(all_values), 'endpoints': endpoints, 'errors': errors}
+
+
+class SimulatedClient(threading.Thread):
+    """Haritayı açan ve analiz durumunu periyodik olarak sorgulayan kullanıcı"""
+
+    def __init__(self, number, base_url, stats, stop_at, start_delay, poll_interval):
+        super().__init__(name=f"client-{number}", daemon=True)
+        self.base_url = base_url.rstrip('/')
+        self.stats = stats
+        self.stop_at = stop_at
+        self.start_delay = start_delay
+        self.poll_interval = poll_interval
+        self.session = requests.Session()
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate'
+
+    def request(self, endpoint, method='GET'):
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, f"{self.base_url}{endpoint}", timeout=REQUEST_TIMEOUT)
+            body = response.content
+            ok = response.status_code < 400 or (endpoint == '/trigger_analysis' and response.status_code == 409)
+            error = None if ok else f"HTTP {response.status_code}"
+            self.stats.record(endpoint, time.perf_counter() - start, ok, len(body), error)
+            return response if ok else None
+        except requests.exceptions.RequestException as e:
+            self.stats.record(endpoint, time.perf_counter() - start, False, 0, type(e).__name__)
+            return None
+
+    def run(self):
+        time.sleep(self.start_delay)
+        # İlk yükleme: sayfa + analiz verisi
+        self.request('/')
+        self.request('/get_analyzed_data')
+        # Sonrasında sadece durum sorgusu (tarayıcılar aynı anda sorgulamasın diye sapmalı)
+        while time.time() < self.stop_at:
+            response = self.request('/analysis_status')
+            if response is not None:
+                try:
+                    self.stats.analysis_active = bool(response.json().get('analyzing'))
+                except ValueError:
+                    pass
+            time.sleep(min(max(0.0, self.stop_at - time.time()), self.poll_interval * random.uniform(0.9, 1.1)))
+
+
+def spawn_server(port, workdir):
+    """Sahte WeatherAPI / Groq ile yerel Flask sunucusunu geçici dizinde başlatır
+    (cache ve analiz dosyaları depoya yazılmaz)"""
+    from benchmarks.fake_services import start_fake_weather, start_fake_groq
+
+    shutil.copytree(os.path.join(REPO_DIR, 'static'), os.path.join(workdir, 'static'))
+
+    weather = start_fake_weather(latency=0.05, jitter=0.02)
+    groq = start_fake_groq(latency=0.3, jitter=0.1)
+    env = dict(os.environ)
+    env.update({
+        'PORT': str(port),
+        'WEATHERAPI_KEY': env.get('WEATHERAPI_KEY', 'loadtest'),
+        'WEATHERAPI_BASE_URL': f"{weather.url}/v1",
+        'GROQ_API_KEY': env.get('GROQ_API_KEY', 'loadtest'),
+        'GROQ_BASE_URL': groq.url
+    })
+    process = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, 'app.py')], cwd=workdir, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return process, (weather, groq)
+
+
+def wait_until_ready(base_url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{base_url}/analysis_status", timeout=2).status_code < 500:
+                return True
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def run_load_test(base_url, clients, duration, ramp_up, poll_interval, trigger_analysis):
+    stats = LoadStats()
+    started = time.time()
+    stop_at = started + duration
+
+    if trigger_analysis:
+        trigger = SimulatedClient(-1, base_url, stats, stop_at, 0, poll_interval)
+        if trigger.request('/trigger_analysis', method='POST') is not None:
+            stats.analysis_active = True
+            print("Arka plan analizi başlatıldı")
+
+    workers = [
+        SimulatedClient(n, base_url, stats, stop_at, ramp_up * n / max(clients, 1), poll_interval)
+        for n in range(clients)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=max(0.0, stop_at - time.time()) + REQUEST_TIMEOUT)
+
+    return stats.report(time.time() - started)
+
+
+def print_report(report):
+    print("\n=== YÜK TESTİ SONUCU ===")
+    overall = report['overall']
+    print(f"Toplam: {overall['requests']} istek, {overall['errors']} hata, {overall['throughput_rps']} istek/sn")
+    for endpoint, phases in report['endpoints'].items():
+        for phase, summary in phases.items():
+            print(f"{endpoint} [{phase}]: {summary['requests']} istek, {summary['errors']} hata, "
+                  f"p50 {summary['p50_ms']} ms, p90 {summary['p90_ms']} ms, p99 {summary['p99_ms']} ms, max {summary['max_ms']} ms")
+    if report['errors']:
+        print(f"Hatalar: {report['errors']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Flask uç noktaları için yük testi')
+    parser.add_argument('--url', default=DEFAULT_URL)
+    parser.add_argument('--clients', type=int, default=20, help='Eşzamanlı simüle edilen kullanıcı sayısı')
+    parser.add_argument('--duration', type=float, default=60, help='Test süresi (saniye)')
+    parser.add_argument('--ramp-up', type=float, default=10, help='Tüm istemcilerin başlaması için geçen süre')
+    parser.add_argument('--poll-interval', type=float, default=POLL_INTERVAL)
+    parser.add_argument('--trigger-analysis', action='store_true', help='Test başında arka plan analizi başlat')
+    parser.add_argument('--spawn-server', action='store_true', help='Sahte servislerle yerel sunucuyu başlat')
+    parser.add_argument('--port', type=int, default=5055, help='--spawn-server için port')
+    parser.add_argument('--output', help='Sonuçların yazılacağı JSON dosyası')
+    args = parser.parse_args(argv)
+
+    base_url = args.url
+    process = None
+    services = ()
+    workdir = None
+    if args.spawn_server:
+        workdir = tempfile.mkdtemp(prefix='forest-load-')
+        process, services = spawn_server(args.port, workdir)
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        if not wait_until_ready(base_url):
+            print(f"Sunucu hazır değil: {base_url}")
+            return 1
+        print(f"Yük testi: {base_url}, {args.clients} istemci, {args.duration:.0f} sn")
+        report = run_load_test(base_url, args.clients, args.duration, args.ramp_up, args.poll_interval, args.trigger_analysis)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+        for service in services:
+            service.stop()
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report['config'] = {'url': base_url, 'clients': args.clients, 'duration': args.duration,
+                        'poll_interval': args.poll_interval, 'trigger_analysis': args.trigger_analysis}
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Sonuçlar yazıldı: {args.output}")
+    return 0 if report['overall']['errors'] == 0 else 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,365 @@
+"""
+Tekrarlanabilir benchmark takımı.
+
+Sentetik veri seti ve yerel sahte WeatherAPI / Groq sunucularıyla analiz
+yollarını ölçer; sonuçları commit'ler arasında karşılaştırılabilecek JSON
+olarak yazar.
+
+Kullanım (depo kök dizininden):
+    python -m benchmarks.run_benchmarks --size 1k --output bench.json
+    python -m benchmarks.run_benchmarks --size 10k --only update_forest_risks,cache_manager --latency 0.05 --error-rate 0.02
+    python -m benchmarks.run_benchmarks --size 1k --output yeni.json --compare eski.json
+
+Benchmark'lar geçici bir çalışma dizininde çalışır; depodaki static/ dosyalarına dokunulmaz.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timedelta
+
+from benchmarks.synthetic_data import parse_size, generate_features, load_templates, DEFAULT_SEED
+from benchmarks.fake_services import start_fake_weather, start_fake_groq
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_GEOJSON = 'static/export_with_risk_latest.geojson'
+BENCHMARKS = ['cache_manager', 'update_forest_risks', 'update_forest_lm_risks', 'analyze_all_areas_backend', 'flask_endpoints']
+UNLIMITED_PER_MINUTE = 10 ** 6
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q / 100.0 * len(ordered)))]
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+class BenchmarkContext:
+    """Çalışma dizini, veri seti ve sahte servislerin yönetimi"""
+
+    def __init__(self, features, workdir, weather_server, groq_server):
+        self.features = features
+        self.workdir = workdir
+        self.weather_server = weather_server
+        self.groq_server = groq_server
+
+    def fresh_directory(self, name):
+        """Benchmark için boş bir static/ dizini hazırlar ve oraya geçer"""
+        path = os.path.join(self.workdir, name)
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(os.path.join(path, 'static'))
+        os.chdir(path)
+        with open(SOURCE_GEOJSON, 'w', encoding='utf-8') as f:
+            json.dump({'type': 'FeatureCollection', 'features': self.features}, f, ensure_ascii=False, separators=(',', ':'))
+        reset_process_caches()
+        return path
+
+    def service_stats(self):
+        return {'weatherapi': self.weather_server.behavior.snapshot(), 'groq': self.groq_server.behavior.snapshot()}
+
+
+def reset_process_caches():
+    """
+    Süreç içi cache'leri temizler; her benchmark soğuk cache ile başlar. Kota sayaçları,
+    rate limit bucket'ları ve devre kesiciler de çalışma dizinine taşınır / sıfırlanır;
+    benchmark trafiği gerçek aylık kotaya yazılmaz ve sonraki benchmark'ları etkilemez.
+    """
+    import app
+    import auto_updater as auto_updater_module
+    import lm_risk_analyzer
+    from cache_manager import cache_manager
+    from quota_budget import quota_budget
+    from rate_limit_store import rate_limit_store
+    from upstream_control import weather_controller, groq_controller
+
+    with app.weather_cache_lock:
+        app.weather_cache.clear()
+    with auto_updater_module.weather_cache_lock:
+        auto_updater_module.weather_cache.clear()
+    lm_risk_analyzer.clear_all_cache()
+    cache_manager.cache = {}
+
+    quota_budget.reopen(os.path.abspath(os.path.join('data', 'quota_usage.db')))
+    # Çağrılar sayılır ama bütçe uygulanmaz: büyük veri setinde ay sonu tahmini seviyeyi değiştirmesin
+    quota_budget.quotas = {provider: 0 for provider in quota_budget.quotas}
+    rate_limit_store.reopen(os.path.abspath(os.path.join('data', 'rate_limits.db')))
+    weather_controller.reset()
+    groq_controller.reset()
+
+
+def lift_rate_limits():
+    """Sahte servisler rate limit uygulamadığı için istemci tarafı bekleme kapatılır"""
+    import app
+    import auto_updater as auto_updater_module
+    import lm_risk_analyzer
+
+    auto_updater_module.WEATHER_MAX_REQUESTS_PER_MINUTE = UNLIMITED_PER_MINUTE
+    lm_risk_analyzer.MAX_REQUESTS_PER_MINUTE = UNLIMITED_PER_MINUTE
+    app.API_DELAY = 0
+
+
+def relax_deadlines():
+    """Planlayıcının bozulmaya gitmemesi için deadline bir gün sonrasına çekilir"""
+    import auto_updater as auto_updater_module
+
+    just_passed = (datetime.now() - timedelta(minutes=1)).strftime('%H:%M')
+    auto_updater_module.CLASSIC_RUN_DEADLINE = just_passed
+    auto_updater_module.LM_RUN_DEADLINE = just_passed
+
+
+def timed_run(context, name, fn):
+    """fn'i yeni bir dizinde çalıştırıp süre, alan/saniye ve servis çağrılarını döndürür"""
+    context.fresh_directory(name)
+    before = context.service_stats()
+    start = time.perf_counter()
+    fn()
+    duration = time.perf_counter() - start
+    after = context.service_stats()
+
+    calls = {}
+    for service, stats in after.items():
+        calls[service] = {key: value - before[service].get(key, 0) for key, value in stats.items()}
+    count = len(context.features)
+    return {
+        'seconds': round(duration, 3),
+        'features': count,
+        'features_per_second': round(count / duration, 2) if duration > 0 else None,
+        'service_calls': calls
+    }
+
+
+def bench_update_forest_risks(context):
+    from auto_updater import auto_updater
+    return timed_run(context, 'update_forest_risks', auto_updater.update_forest_risks)
+
+
+def bench_update_forest_lm_risks(context):
+    from auto_updater import auto_updater
+    return timed_run(context, 'update_forest_lm_risks', auto_updater.update_forest_lm_risks)
+
+
+def bench_analyze_all_areas_backend(context):
+    import app
+    return timed_run(context, 'analyze_all_areas_backend', lambda: app.analyze_all_areas_backend(force_refresh=True))
+
+
+def bench_cache_manager(context, put_count=500):
+    """CacheManager okuma / yazma / temizleme işlemlerinin hızı"""
+    from cache_manager import CacheManager
+
+    context.fresh_directory('cache_manager')
+    manager = CacheManager(cache_file='static/bench_cache.json')
+    keys = []
+    for feature in context.features[:put_count]:
+        properties = feature['properties']
+        keys.append((properties['centroid_lat'], properties['centroid_lon'], properties['area'], properties['landuse'], properties['name']))
+    payload = {'combined_risk_score': 55, 'combined_risk_level': 'Orta', 'analysis': 'x' * 400}
+
+    results = {}
+    start = time.perf_counter()
+    for key in keys:
+        manager.cache_analysis(*key, payload)
+    duration = time.perf_counter() - start
+    results['cache_analysis'] = {'operations': len(keys), 'seconds': round(duration, 4),
+                                 'operations_per_second': round(len(keys) / duration, 1) if duration > 0 else None}
+
+    lookups = keys * 10 + [(0.0, 0.0, 0, 'forest', 'yok')] * len(keys)
+    start = time.perf_counter()
+    for key in lookups:
+        manager.get_cached_analysis(*key)
+    duration = time.perf_counter() - start
+    results['get_cached_analysis'] = {'operations': len(lookups), 'seconds': round(duration, 4),
+                                      'operations_per_second': round(len(lookups) / duration, 1) if duration > 0 else None}
+
+    start = time.perf_counter()
+    manager.clear_expired_cache()
+    results['clear_expired_cache'] = {'operations': 1, 'seconds': round(time.perf_counter() - start, 4)}
+
+    start = time.perf_counter()
+    manager = CacheManager(cache_file='static/bench_cache.json')
+    results['load_cache'] = {'operations': 1, 'seconds': round(time.perf_counter() - start, 4), 'entries': len(manager.cache)}
+    return results
+
+
+def bench_flask_endpoints(context, requests_per_endpoint=30):
+    """Analiz sonucu yayınlandıktan sonra Flask uç noktalarının yanıt süreleri"""
+    import app
+    from batch_analyze import BatchAnalyzer, run_batch
+    from spatial_index import feature_id
+
+    context.fresh_directory('flask_endpoints')
+    features = json.loads(json.dumps(context.features))
+    run_batch(features, BatchAnalyzer('synthetic', 'dummy'), workers=4)
+    app.publish_analysis({'type': 'FeatureCollection', 'features': features,
+                          'metadata': {'total_areas': len(features), 'analysis_date': datetime.now().isoformat()}})
+
+    sample = features[len(features) // 2]['properties']
+    lat, lon = sample['centroid_lat'], sample['centroid_lon']
+    fid = feature_id(features[len(features) // 2], len(features) // 2)
+    endpoints = {
+        'get_analyzed_data': '/get_analyzed_data',
+        'features_bbox': f"/features?bbox={lon - 1},{lat - 1},{lon + 1},{lat + 1}&zoom=10",
+        'risk_grid': '/risk_grid?bbox=26,36,45,42&zoom=5',
+        'tile': '/tiles/6/37/24.pbf',
+        'feature_details': f"/feature/{fid}/details",
+        'risk_at': f"/risk_at?lat={lat}&lon={lon}",
+        'analysis_status': '/analysis_status',
+        'metrics': '/metrics'
+    }
+
+    client = app.app.test_client()
+    results = {}
+    for name, url in endpoints.items():
+        durations = []
+        status = None
+        size = 0
+        error = None
+        for _ in range(requests_per_endpoint):
+            start = time.perf_counter()
+            response = client.get(url)
+            body = response.get_data()
+            durations.append(time.perf_counter() - start)
+            status = response.status_code
+            size = len(body)
+            # Hata yanıtlarının süreleri sonuç sayılmaz
+            if not 200 <= status < 300:
+                error = body[:200].decode('utf-8', errors='replace')
+                break
+        if error is not None:
+            print(f"{name} uç noktası başarısız: HTTP {status} - {error}")
+            results[name] = {'status': status, 'error': error}
+            continue
+        results[name] = {
+            'status': status,
+            'bytes': size,
+            'requests': len(durations),
+            'mean_ms': round(1000 * sum(durations) / len(durations), 3),
+            'p50_ms': round(1000 * percentile(durations, 50), 3),
+            'p99_ms': round(1000 * percentile(durations, 99), 3)
+        }
+    return results
+
+
+BENCHMARK_FUNCTIONS = {
+    'cache_manager': bench_cache_manager,
+    'update_forest_risks': bench_update_forest_risks,
+    'update_forest_lm_risks': bench_update_forest_lm_risks,
+    'analyze_all_areas_backend': bench_analyze_all_areas_backend,
+    'flask_endpoints': bench_flask_endpoints
+}
+
+
+def compare_results(old, new):
+    """İki sonuç dosyasındaki ana sürelerin oranlarını yazdırır"""
+    print("\n=== KARŞILAŞTIRMA (yeni / eski) ===")
+    for name, result in new['benchmarks'].items():
+        previous = old.get('benchmarks', {}).get(name)
+        if not previous or 'error' in result or 'error' in previous:
+            continue
+        if 'seconds' in result and previous.get('seconds'):
+            ratio = result['seconds'] / previous['seconds']
+            print(f"{name}: {previous['seconds']:.3f}s -> {result['seconds']:.3f}s ({ratio:.2f}x)")
+            continue
+        for item, values in result.items():
+            old_values = previous.get(item) or {}
+            for key in ('seconds', 'p50_ms'):
+                if key in values and old_values.get(key):
+                    print(f"{name}.{item}: {old_values[key]} -> {values[key]} {key} ({values[key] / old_values[key]:.2f}x)")
+                    break
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Orman riski analizi benchmark takımı')
+    parser.add_argument('--size', type=parse_size, default=1000, help='Sentetik alan sayısı (1k / 10k / 100k veya sayı)')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--only', help='Virgülle ayrılmış benchmark listesi: ' + ', '.join(BENCHMARKS))
+    parser.add_argument('--latency', type=float, default=0.0, help='Sahte servis yanıt gecikmesi (saniye)')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Sahte servislerin 429 döndürme oranı')
+    parser.add_argument('--keep-rate-limits', action='store_true', help='İstemci tarafı rate limit beklemelerini koru')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help='Karşılaştırılacak önceki sonuç dosyası')
+    args = parser.parse_args(argv)
+
+    selected = args.only.split(',') if args.only else BENCHMARKS
+    unknown = [name for name in selected if name not in BENCHMARK_FUNCTIONS]
+    if unknown:
+        parser.error(f"Bilinmeyen benchmark: {', '.join(unknown)}")
+    output_path = os.path.abspath(args.output)
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+
+    weather_server = start_fake_weather(args.latency, args.jitter, args.error_rate, seed=args.seed)
+    groq_server = start_fake_groq(args.latency, args.jitter, args.error_rate, seed=args.seed)
+
+    # Modüller import edilmeden önce sahte servislere yönlendir
+    os.environ['WEATHERAPI_KEY'] = 'benchmark'
+    os.environ['WEATHERAPI_BASE_URL'] = f"{weather_server.url}/v1"
+    os.environ['GROQ_API_KEY'] = 'benchmark'
+    os.environ['GROQ_BASE_URL'] = groq_server.url
+
+    features = generate_features(args.size, args.seed, load_templates(os.path.join(REPO_DIR, 'static', 'test_forest.geojson')))
+    workdir = tempfile.mkdtemp(prefix='forest-bench-')
+    original_cwd = os.getcwd()
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_DIR)
+
+    context = BenchmarkContext(features, workdir, weather_server, groq_server)
+    if not args.keep_rate_limits:
+        lift_rate_limits()
+    relax_deadlines()
+
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'created_at': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'size': args.size,
+            'seed': args.seed,
+            'latency': args.latency,
+            'jitter': args.jitter,
+            'error_rate': args.error_rate,
+            'client_rate_limits': args.keep_rate_limits
+        },
+        'benchmarks': {}
+    }
+
+    try:
+        for name in selected:
+            print(f"=== {name} ({args.size} alan) ===")
+            try:
+                results['benchmarks'][name] = BENCHMARK_FUNCTIONS[name](context)
+            except Exception as e:
+                print(f"{name} benchmark hatası: {e}")
+                results['benchmarks'][name] = {'error': str(e)}
+            print(json.dumps(results['benchmarks'][name], ensure_ascii=False))
+    finally:
+        os.chdir(original_cwd)
+        weather_server.stop()
+        groq_server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"Sonuçlar yazıldı: {output_path}")
+
+    if compare_path:
+        with open(compare_path, 'r', encoding='utf-8') as f:
+            compare_results(json.load(f), results)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Benchmark'lar için sentetik orman alanı veri seti üretici.
+
+static/test_forest.geojson'daki poligon şekilleri Türkiye sınırları içinde
+rastgele konum, ölçek ve dönüşle çoğaltılır. Aynı tohum her zaman aynı
+dosyayı üretir; böylece farklı commit'lerin sonuçları karşılaştırılabilir.
+
+Kullanım:
+    python -m benchmarks.synthetic_data --count 10000 --output /tmp/forest_10k.geojson
+"""
+import sys
+import json
+import math
+import random
+import argparse
+
+TEMPLATE_PATH = 'static/test_forest.geojson'
+TURKEY_BBOX = (26.0, 36.0, 44.8, 42.0)  # (min_lon, min_lat, max_lon, max_lat)
+STANDARD_SIZES = {'1k': 1000, '10k': 10000, '100k': 100000}
+DEFAULT_SEED = 42
+
+
+def load_templates(path=TEMPLATE_PATH):
+    """Şablon poligonları merkezlerine göre göreli koordinatlara çevirir"""
+    with open(path, 'r', encoding='utf-8') as f:
+        features = json.load(f)['features']
+
+    templates = []
+    for feature in features:
+        geometry = feature['geometry']
+        rings = geometry['coordinates'] if geometry['type'] == 'Polygon' else geometry['coordinates'][0]
+        outer = rings[0]
+        center_lon = sum(point[0] for point in outer) / len(outer)
+        center_lat = sum(point[1] for point in outer) / len(outer)
+        templates.append({
+            'rings': [[(lon - center_lon, lat - center_lat) for lon, lat in ring] for ring in rings],
+            'area': feature['properties'].get('area', 1.0),
+            'landuse': feature['properties'].get('landuse', 'forest')
+        })
+    return templates
+
+
+def generate_features(count, seed=DEFAULT_SEED, templates=None):
+    """count adet sentetik poligon feature'ı üretir"""
+    rng = random.Random(seed)
+    templates = templates or load_templates()
+    min_lon, min_lat, max_lon, max_lat = TURKEY_BBOX
+
+    features = []
+    for i in range(count):
+        template = templates[i % len(templates)]
+        center_lon = rng.uniform(min_lon, max_lon)
+        center_lat = rng.uniform(min_lat, max_lat)
+        scale = rng.uniform(0.5, 3.0)
+        angle = rng.uniform(0, 2 * math.pi)
+        cos_a, sin_a = math.cos(angle), math.sin(angle)
+
+        rings = []
+        for ring in template['rings']:
+            rings.append([
+                [round(center_lon + scale * (dx * cos_a - dy * sin_a), 6),
+                 round(center_lat + scale * (dx * sin_a + dy * cos_a), 6)]
+                for dx, dy in ring
+            ])
+
+        features.append({
+            'type': 'Feature',
+            'properties': {
+                'name': f"Sentetik Orman Alanı {i + 1}",
+                'landuse': template['landuse'],
+                'area': round(template['area'] * scale * scale, 3),
+                'centroid_lat': round(center_lat, 6),
+                'centroid_lon': round(center_lon, 6)
+            },
+            'geometry': {'type': 'Polygon', 'coordinates': rings}
+        })
+    return features
+
+
+def write_dataset(path, count, seed=DEFAULT_SEED):
+    """Sentetik veri setini GeoJSON olarak yazar"""
+    geojson_data = {'type': 'FeatureCollection', 'features': generate_features(count, seed)}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(geojson_data, f, ensure_ascii=False, separators=(',', ':'))
+    return path
+
+
+def parse_size(value):
+    """'1k', '10k', '100k' veya sayı"""
+    return STANDARD_SIZES.get(value) or int(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Sentetik orman alanı GeoJSON üretici')
+    parser.add_argument('--count', type=parse_size, default=1000, help="Alan sayısı (1k / 10k / 100k veya sayı)")
+    parser.add_argument('--output', required=True)
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    args = parser.parse_args(argv)
+
+    write_dataset(args.output, args.count, args.seed)
+    print(f"{args.count} alan yazıldı: {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,31 +1,110 @@
 import json
 import os
+import threading
 from datetime import datetime, timedelta
 import logging
+from metrics import cache_event
+from risk_result import RiskResult
+
+CACHE_FORMAT_VERSION = 2
 
 class CacheManager:
     def __init__(self, cache_file="analysis_cache.json"):
         self.cache_file = cache_file
-        self.cache = self.load_cache()
+        self._cache = None  # İlk erişimde (ya da load_in_background ile) yüklenir
+        self.load_lock = threading.Lock()
+        self.loaded = threading.Event()
         self.lm_analysis_running = False
         self.lm_analysis_completed = False
+    
+    @property
+    def cache(self):
+        if self._cache is None:
+            self.ensure_loaded()
+        return self._cache
+    
+    @cache.setter
+    def cache(self, value):
+        self._cache = value
+        self.loaded.set()
+    
+    def ensure_loaded(self):
+        """Cache dosyası henüz okunmadıysa okur (eşzamanlı çağrılar aynı yüklemeyi bekler)"""
+        with self.load_lock:
+            if self._cache is None:
+                self._cache = self.load_cache()
+                self.loaded.set()
+        return self._cache
+    
+    def load_in_background(self):
+        """Cache dosyasını arka plan thread'inde yükler; başlangıç isteklerini bekletmez"""
+        if not self.loaded.is_set():
+            threading.Thread(target=self.ensure_loaded, name='cache-load', daemon=True).start()
         
     def load_cache(self):
-        """Cache dosyasını yükle"""
+        """Cache dosyasını yükle (eski düz biçim de okunur, sonuçlar RiskResult'a çevrilir)"""
         try:
             if os.path.exists(self.cache_file):
                 with open(self.cache_file, 'r', encoding='utf-8') as f:
                     print(f"DEBUG: Cache dosyası yüklendi: {self.cache_file}")
-                    return json.load(f)
+                    return self.decode_cache(json.load(f))
         except Exception as e:
             print(f"Cache yükleme hatası: {e}")
         return {}
     
+    @staticmethod
+    def decode_cache(stored):
+        """
+        Dosyadaki cache'i bellekteki biçime çevirir. Sürüm 2'de hava durumu kayıtları
+        bir kez yazılır ve sonuçlar referansla bağlanır; aynı kaydı gösteren sonuçlar
+        bellekte de aynı sözlüğü paylaşır.
+        """
+        if stored.get('version') != CACHE_FORMAT_VERSION:
+            # Eski biçim: {key: {'timestamp', 'data': sözlük}}
+            cache = {}
+            for key, entry in stored.items():
+                result = RiskResult.from_dict(entry.get('data'))
+                cache[key] = {'timestamp': entry.get('timestamp'), 'data': result if result is not None else entry.get('data')}
+            return cache
+        
+        weather = stored.get('weather', {})
+        cache = {}
+        for key, entry in stored.get('entries', {}).items():
+            if 'result' in entry:
+                result = entry['result']
+                data = RiskResult.from_compact(result, weather.get(result.get('weather_ref')))
+            else:
+                data = entry.get('data')
+            cache[key] = {'timestamp': entry.get('timestamp'), 'data': data}
+        return cache
+    
+    @staticmethod
+    def encode_cache(cache):
+        """Bellekteki cache'i dosya biçimine çevirir (JSON'a yalnızca burada dönüşür)"""
+        weather = {}
+        weather_refs = {}  # hava durumu içeriği -> referans (aynı değerler bir kez yazılır)
+        entries = {}
+        for key, entry in cache.items():
+            data = entry.get('data')
+            if isinstance(data, RiskResult):
+                weather_ref = None
+                if data.weather_data is not None:
+                    content = json.dumps(data.weather_data, sort_keys=True, ensure_ascii=False)
+                    weather_ref = weather_refs.get(content)
+                    if weather_ref is None:
+                        weather_ref = str(len(weather_refs))
+                        weather_refs[content] = weather_ref
+                        weather[weather_ref] = data.weather_data
+                entries[key] = {'timestamp': entry.get('timestamp'), 'result': data.to_compact(weather_ref)}
+            else:
+                entries[key] = entry
+        return {'version': CACHE_FORMAT_VERSION, 'weather': weather, 'entries': entries}
+    
     def save_cache(self):
         """Cache'i dosyaya kaydet"""
         try:
             with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(self.cache, f, ensure_ascii=False, indent=2)
+                json.dump(self.encode_cache(self.cache), f, ensure_ascii=False, separators=(',', ':'))
             print(f"DEBUG: Cache dosyası kaydedildi: {self.cache_file}")
         except Exception as e:
             print(f"Cache kaydetme hatası: {e}")
@@ -61,8 +140,10 @@ class CacheManager:
             cache_entry = self.cache[cache_key]
             if self.is_cache_valid(cache_entry):
                 print(f"DEBUG: Cache'den analiz sonucu alındı: {cache_key}")
+                cache_event('analysis_file', 'hit')
                 return cache_entry['data']
         
+        cache_event('analysis_file', 'miss')
         return None
     
     def cache_analysis(self, lat, lon, area, landuse, name, analysis_data):
@@ -111,15 +192,25 @@ class CacheManager:
             del self.cache[key]
         
         if expired_keys:
+            cache_event('analysis_file', 'eviction', len(expired_keys))
             self.save_cache()
             print(f"{len(expired_keys)} adet süresi dolmuş cache temizlendi")
     
     def get_cache_stats(self):
         """Cache istatistiklerini döndür"""
+        if not self.loaded.is_set():
+            # Yükleme sürerken durum sorgusu beklemez
+            return {
+                'loaded': False,
+                'lm_analysis_running': self.lm_analysis_running,
+                'lm_analysis_completed': self.lm_analysis_completed
+            }
+        
         total_entries = len(self.cache)
         valid_entries = sum(1 for entry in self.cache.values() if self.is_cache_valid(entry))
         
         return {
+            'loaded': True,
             'total_entries': total_entries,
             'valid_entries': valid_entries,
             'expired_entries': total_entries - valid_entries,
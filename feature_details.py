@@ -0,0 +1,128 @@
+import os
+import json
+import sqlite3
+import threading
+from spatial_index import feature_id
+from geojson_stream import GeoJSONWriter
+
+# Harita çizimi için gereken alanlar (geri kalanı detay deposunda tutulur)
+MAP_FIELDS = [
+    'combined_risk_score',
+    'combined_risk_level',
+    'combined_risk_color',
+    'peak_risk_score',
+    'peak_risk_hour',
+    'analysis_failed'
+]
+# Klasik (AutoUpdater) çıktısında birleşik alanlar yoksa kullanılan karşılıklar
+MAP_FIELD_FALLBACKS = {
+    'combined_risk_score': 'risk_skoru',
+    'combined_risk_level': 'risk_seviyesi'
+}
+
+DETAILS_DB_PATH = os.environ.get('DETAILS_DB_PATH', 'data/feature_details.db')
+
+
+def map_path_for(analyzed_path):
+    """Analiz dosyasına karşılık gelen hafif harita dosyasının yolu"""
+    base, _ = os.path.splitext(analyzed_path)
+    return f"{base}_map.json"
+
+
+def project_properties(properties, fid):
+    """Properties'ten sadece harita stilinde kullanılan alanları seçer"""
+    projected = {'id': fid}
+    for key in MAP_FIELDS:
+        value = properties.get(key)
+        if value is None and key in MAP_FIELD_FALLBACKS:
+            value = properties.get(MAP_FIELD_FALLBACKS[key])
+        if value is not None and value is not False:
+            projected[key] = value
+    return projected
+
+
+def project_feature(feature, index, geometry=None):
+    """Feature'ı harita yükü için hafif hale getirir"""
+    fid = feature_id(feature, index)
+    return {
+        'type': 'Feature',
+        'id': fid,
+        'properties': project_properties(feature.get('properties') or {}, fid),
+        'geometry': geometry if geometry is not None else feature.get('geometry')
+    }
+
+
+def save_map_data(features, metadata, path):
+    """Sadece stil alanlarını içeren harita yükünü feature feature yazar"""
+    with GeoJSONWriter(path) as writer:
+        for i, feature in enumerate(features):
+            writer.write(project_feature(feature, i))
+        return writer.close({'metadata': metadata or {}})
+
+
+class FeatureDetailStore:
+    """
+    Popup'ta gösterilen ağır alanları (LM analizi, insan kaynaklı risk,
+    hava durumu) feature id ile anahtarlanmış SQLite dosyasında tutar.
+    """
+
+    def __init__(self, db_path=DETAILS_DB_PATH):
+        self.db_path = db_path
+        self.build_lock = threading.Lock()
+        self.local = threading.local()
+
+    def build(self, features):
+        """Detay deposunu yeniden oluşturur ve dosyayı atomik olarak değiştirir"""
+        with self.build_lock:
+            tmp_path = f"{self.db_path}.tmp"
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+            conn = sqlite3.connect(tmp_path)
+            try:
+                conn.execute("CREATE TABLE details (id TEXT PRIMARY KEY, data TEXT)")
+                # Satırlar akış halinde eklenir; aynı id tekrar gelirse sonuncusu kalır
+                rows = (
+                    (feature_id(feature, i), json.dumps(feature.get('properties') or {}, ensure_ascii=False, separators=(',', ':')))
+                    for i, feature in enumerate(features)
+                )
+                conn.executemany("INSERT OR REPLACE INTO details VALUES (?, ?)", rows)
+                count = conn.execute("SELECT COUNT(*) FROM details").fetchone()[0]
+                conn.commit()
+            finally:
+                conn.close()
+
+            os.replace(tmp_path, self.db_path)
+            print(f"Detay deposu oluşturuldu: {count} alan")
+            return count
+
+    def _connection(self):
+        """Thread başına okuma bağlantısı; dosya yenilendiyse yeniden açılır"""
+        mtime = os.path.getmtime(self.db_path)
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.mtime != mtime:
+            if conn is not None:
+                conn.close()
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            self.local.conn = conn
+            self.local.mtime = mtime
+        return conn
+
+    def available(self):
+        return os.path.exists(self.db_path)
+
+    def get(self, fid):
+        """Feature'ın tüm properties'ini döndürür, yoksa None"""
+        if not self.available():
+            return None
+        row = self._connection().execute("SELECT data FROM details WHERE id = ?", (fid,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+
+# Global detay deposu instance
+feature_detail_store = FeatureDetailStore()
@@ -0,0 +1,158 @@
+import json
+import os
+import threading
+from datetime import datetime
+from spatial_index import STRTree, feature_id, geometry_polygons, polygons_bbox
+from feature_details import project_properties
+from snapshot_store import Snapshot, SnapshotFeatures
+from geometry_simplifier import LOD_ZOOM_LEVELS, build_lod_geometries, lod_level_for_zoom, quantize_geometry
+
+MAX_FEATURES_PER_QUERY = 5000  # Tek sorguda döndürülecek maksimum alan
+
+
+def lod_path_for(analyzed_path):
+    """Analiz dosyasına karşılık gelen LOD dosyasının yolu"""
+    base, _ = os.path.splitext(analyzed_path)
+    return f"{base}_lod.json"
+
+
+def build_lod_data(features):
+    """
+    Analiz sonucu için zoom seviyelerine göre sadeleştirilmiş geometrileri hazırlar.
+    Analiz sırasında bir kez hesaplanır, /features sorgularında tekrar kullanılır.
+    """
+    lod_features = []
+    for i, feature in enumerate(features):
+        geometry = feature.get('geometry')
+        lod_features.append({
+            'id': feature_id(feature, i),
+            'bbox': polygons_bbox(geometry_polygons(geometry)),
+            'geometries': build_lod_geometries(geometry)
+        })
+
+    return {
+        'levels': LOD_ZOOM_LEVELS,
+        'created_at': datetime.now().isoformat(),
+        'features': lod_features
+    }
+
+
+def save_lod_data(lod_data, path):
+    """LOD verisini kompakt JSON olarak kaydeder"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(lod_data, f, ensure_ascii=False, separators=(',', ':'))
+
+
+class FeatureQueryIndex:
+    """
+    Görünür alan (bbox) ve zoom seviyesine göre feature sorgulayan indeks.
+    Geometriler önceden hesaplanmış LOD seviyelerinden döndürülür.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.source_path = None
+        self.source_mtime = None
+        self.tree = STRTree([])
+        self.features = []
+        self.full_geometry = None
+        self.lod_geometries = []
+
+    def build(self, features, lod_data=None, source_path=None, source_mtime=None):
+        """Feature dizisi (liste veya snapshot görünümü) ve LOD verisinden indeksi oluşturur"""
+        if lod_data is None or len(lod_data.get('features', [])) != len(features):
+            # LOD hesabı tam geometri ister; geometrisiz görünüm verildiyse snapshot'tan okunur
+            lod_source = features.snapshot.features() if isinstance(features, SnapshotFeatures) else features
+            lod_data = build_lod_data(lod_source)
+
+        if isinstance(features, SnapshotFeatures):
+            # Sorgu sonuçları için sadece özellikler okunur; tam geometri yalnızca tam çözünürlükte çözülür
+            full_geometry = features.snapshot.geometry
+            features = features.snapshot.features(geometry=False)
+        else:
+            full_geometry = lambda i, features=features: features[i].get('geometry')
+
+        lod_features = lod_data['features']
+        tree = STRTree([entry.get('bbox') for entry in lod_features])
+        lod_geometries = [entry.get('geometries', {}) for entry in lod_features]
+
+        with self.lock:
+            self.tree = tree
+            self.features = features
+            self.full_geometry = full_geometry
+            self.lod_geometries = lod_geometries
+            self.source_path = source_path
+            self.source_mtime = source_mtime
+        print(f"Feature sorgu indeksi oluşturuldu: {tree.size} alan")
+
+    def ensure_loaded(self, path):
+        """Analiz snapshot'ı değiştiyse indeksi ondan yeniden oluşturur"""
+        if not os.path.exists(path):
+            return False
+        mtime = os.path.getmtime(path)
+        if self.source_path == path and self.source_mtime == mtime:
+            return True
+
+        # Feature'lar belleğe alınmaz; sorgu sonuçları geometrisiz snapshot görünümünden okunur
+        features = Snapshot(path).features(geometry=False)
+
+        # Önceden hesaplanmış LOD dosyası varsa ve güncelse kullan
+        lod_data = None
+        lod_path = lod_path_for(path)
+        if os.path.exists(lod_path) and os.path.getmtime(lod_path) >= mtime:
+            try:
+                with open(lod_path, 'r', encoding='utf-8') as f:
+                    lod_data = json.load(f)
+            except Exception as e:
+                print(f"LOD dosyası okuma hatası: {e}")
+
+        self.build(features, lod_data, source_path=path, source_mtime=mtime)
+        return True
+
+    def query(self, bbox, zoom=None, limit=MAX_FEATURES_PER_QUERY):
+        """
+        bbox (minx, miny, maxx, maxy) ile kesişen feature'ları zoom'a uygun
+        geometriyle döndürür. bbox None ise tüm alanlar döner.
+        """
+        with self.lock:
+            tree = self.tree
+            features = self.features
+            full_geometry = self.full_geometry
+            lod_geometries = self.lod_geometries
+
+        if bbox is None:
+            items = range(len(features))
+        else:
+            items = sorted(tree.query_bbox(*bbox))
+
+        level = lod_level_for_zoom(zoom)
+        result = []
+        truncated = False
+        for item in items:
+            if len(result) >= limit:
+                truncated = True
+                break
+
+            if level is not None:
+                geometry = lod_geometries[item].get(str(level))
+            else:
+                geometry = quantize_geometry(full_geometry(item), zoom)
+            if not geometry:
+                # Bu zoom'da piksel altında kalan alan
+                continue
+
+            feature = features[item]
+            # Sadece stil alanları; detaylar /feature/<id>/details ile alınır
+            fid = feature_id(feature, item)
+            result.append({
+                'type': 'Feature',
+                'id': fid,
+                'properties': project_properties(feature.get('properties') or {}, fid),
+                'geometry': geometry
+            })
+
+        return result, level, truncated
+
+
+# Global feature sorgu indeksi instance
+feature_query_index = FeatureQueryIndex()
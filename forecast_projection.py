@@ -0,0 +1,252 @@
+import os
+import json
+import threading
+import concurrent.futures
+import requests
+from datetime import datetime
+from spatial_index import feature_id
+from risk_timeline import compact_hourly
+from metrics import track_upstream, track_rate_limit
+from upstream_control import weather_controller, raise_for_overload
+
+# Tahmin ayarları
+FORECAST_DAYS = int(os.environ.get('FORECAST_DAYS', 3))
+WEATHER_CELL_DEGREES = float(os.environ.get('WEATHER_CELL_DEGREES', 0.1))  # ~11 km, WeatherAPI çözünürlüğü
+FORECAST_WORKERS = 2
+WEATHERAPI_BASE_URL = os.environ.get('WEATHERAPI_BASE_URL', 'http://api.weatherapi.com/v1')  # Benchmark'ta sahte sunucuya yönlendirilebilir
+HOURS_PER_DAY = 24
+
+
+def forecast_path_for(analyzed_path):
+    """Analiz dosyasına karşılık gelen tahmin dosyasının yolu"""
+    base, _ = os.path.splitext(analyzed_path)
+    return f"{base}_forecast.json"
+
+
+def weather_cell(lat, lon, cell_degrees=WEATHER_CELL_DEGREES):
+    """Koordinatın düştüğü hava durumu hücresinin anahtarı ve merkezi"""
+    row = int(lat // cell_degrees)
+    col = int(lon // cell_degrees)
+    center_lat = round((row + 0.5) * cell_degrees, 4)
+    center_lon = round((col + 0.5) * cell_degrees, 4)
+    return f"{row}_{col}", center_lat, center_lon
+
+
+def group_by_weather_cell(features, cell_degrees=WEATHER_CELL_DEGREES):
+    """
+    Feature'ları hava durumu hücrelerine gruplar.
+    Aynı hücredeki alanlar için tek API çağrısı yapılır.
+    """
+    cells = {}
+    for i, feature in enumerate(features):
+        properties = feature.get('properties') or {}
+        lat = properties.get('centroid_lat')
+        lon = properties.get('centroid_lon')
+        if lat is None or lon is None:
+            continue
+        key, center_lat, center_lon = weather_cell(lat, lon, cell_degrees)
+        cell = cells.setdefault(key, {'lat': center_lat, 'lon': center_lon, 'features': []})
+        cell['features'].append(i)
+    return cells
+
+
+def combine_with_human_risk(weather_scores, properties):
+    """Saatlik hava skorlarını alanın insan kaynaklı riskiyle ağırlıklandırır"""
+    human_score = properties.get('human_risk_score')
+    weather_weight = properties.get('weather_weight')
+    human_weight = properties.get('human_weight')
+    if human_score is None or not weather_weight or not human_weight:
+        return list(weather_scores)
+
+    total = weather_weight + human_weight
+    return [
+        int(round((score * weather_weight + human_score * human_weight) / total))
+        for score in weather_scores
+    ]
+
+
+def daily_peaks(scores, level_fn=None):
+    """Saatlik skor dizisinden gün bazında zirve skor ve saatini çıkarır"""
+    peaks = []
+    for start in range(0, len(scores), HOURS_PER_DAY):
+        day = scores[start:start + HOURS_PER_DAY]
+        if not day:
+            break
+        peak_hour = max(range(len(day)), key=day.__getitem__)
+        peak = {'peak_score': day[peak_hour], 'peak_hour': peak_hour}
+        if level_fn is not None:
+            peak['peak_level'] = level_fn(day[peak_hour])
+        peaks.append(peak)
+    return peaks
+
+
+class ForecastProjector:
+    """
+    forecast.json ile önümüzdeki günler için saatlik risk projeksiyonu üretir.
+    Her hava durumu hücresi için tek çağrı yapılır; skorlar hücredeki tüm
+    alanlara uygulanır ve alan başına kompakt dizi olarak saklanır.
+    """
+
+    def __init__(self, days=FORECAST_DAYS):
+        self.days = days
+        self.lock = threading.Lock()
+        self.in_progress = False
+        self.source_path = None
+        self.source_mtime = None
+        self.data = None
+
+    def fetch_cell_forecast(self, lat, lon, api_key, rate_limit=None):
+        """Tek hücre için forecast.json'dan saatlik tahmini çeker"""
+        url = f"{WEATHERAPI_BASE_URL}/forecast.json"
+        params = {
+            'key': api_key,
+            'q': f"{lat},{lon}",
+            'days': self.days,
+            'aqi': 'no',
+            'alerts': 'no'
+        }
+
+        def throttle():
+            if rate_limit is not None:
+                with track_rate_limit('forecast'):
+                    rate_limit()
+
+        def fetch():
+            with track_upstream('weatherapi', 'forecast'):
+                response = requests.get(url, params=params, timeout=10)
+            return raise_for_overload(response)
+
+        # Eşzamanlılık limiti, geri çekilmeli yeniden deneme ve devre kesici (devre açıksa hücre atlanır)
+        response = weather_controller.call(fetch, transient=(requests.exceptions.Timeout, requests.exceptions.ConnectionError), throttle=throttle)
+        if response.status_code != 200:
+            error_data = response.json()
+            raise RuntimeError(f"WeatherAPI Hatası ({response.status_code}): {error_data.get('error', {}).get('message', 'Bilinmeyen hata')}")
+
+        forecast_days = response.json().get('forecast', {}).get('forecastday', [])
+        dates = []
+        hourly = None
+        for forecast_day in forecast_days:
+            dates.append(forecast_day.get('date'))
+            day_hourly = compact_hourly(forecast_day)
+            if hourly is None:
+                hourly = day_hourly
+            else:
+                for name, values in day_hourly.items():
+                    hourly[name].extend(values)
+        return dates, hourly
+
+    def run(self, features, api_key, score_fn, level_fn, rate_limit=None, max_workers=FORECAST_WORKERS):
+        """
+        Tüm alanlar için projeksiyon üretir.
+        Skor fonksiyonu her hücrenin saatlik dizileri üzerinde bir kez çalışır.
+        """
+        cells = group_by_weather_cell(features)
+        print(f"Tahmin projeksiyonu başlatılıyor: {len(features)} alan, {len(cells)} hava durumu hücresi")
+
+        cell_results = {}
+        errors = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            future_to_key = {
+                executor.submit(self.fetch_cell_forecast, cell['lat'], cell['lon'], api_key, rate_limit): key
+                for key, cell in cells.items()
+            }
+            for future in concurrent.futures.as_completed(future_to_key):
+                key = future_to_key[future]
+                try:
+                    dates, hourly = future.result()
+                except Exception as e:
+                    errors += 1
+                    print(f"Tahmin hatası ({key}): {str(e)}")
+                    continue
+                if not hourly:
+                    continue
+                scores = list(map(score_fn, hourly['sicaklik'], hourly['nem'], hourly['ruzgar_hizi'], hourly['yagis']))
+                cell_results[key] = {'dates': dates, 'hourly': hourly, 'scores': scores}
+
+        days = []
+        for result in cell_results.values():
+            if len(result['dates']) > len(days):
+                days = result['dates']
+
+        projected_features = {}
+        for key, cell in cells.items():
+            result = cell_results.get(key)
+            if result is None:
+                continue
+            for i in cell['features']:
+                feature = features[i]
+                scores = combine_with_human_risk(result['scores'], feature.get('properties') or {})
+                projected_features[feature_id(feature, i)] = {'cell': key, 'scores': scores}
+
+        data = {
+            'generated_at': datetime.now().isoformat(),
+            'days': days,
+            'hours_per_day': HOURS_PER_DAY,
+            'api_calls': len(cells),
+            'failed_cells': errors,
+            'cells': {
+                key: {'lat': cells[key]['lat'], 'lon': cells[key]['lon'], 'hourly': result['hourly']}
+                for key, result in cell_results.items()
+            },
+            'features': projected_features
+        }
+        print(f"Tahmin projeksiyonu tamamlandı: {len(projected_features)} alan, {len(cells)} API çağrısı, {errors} hata")
+        return data
+
+    def save(self, data, path):
+        """Projeksiyonu kompakt JSON olarak kaydeder"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        with self.lock:
+            self.data = data
+            self.source_path = path
+            self.source_mtime = os.path.getmtime(path)
+
+    def ensure_loaded(self, path):
+        """Tahmin dosyası değiştiyse yeniden yükler"""
+        if not os.path.exists(path):
+            return False
+        mtime = os.path.getmtime(path)
+        if self.source_path == path and self.source_mtime == mtime:
+            return True
+
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        with self.lock:
+            self.data = data
+            self.source_path = path
+            self.source_mtime = mtime
+        return True
+
+    def summary(self, level_fn=None):
+        """Tüm alanların gün bazında zirve skorları"""
+        data = self.data or {}
+        return {
+            'generated_at': data.get('generated_at'),
+            'days': data.get('days', []),
+            'features': {
+                fid: daily_peaks(entry['scores'], level_fn)
+                for fid, entry in data.get('features', {}).items()
+            }
+        }
+
+    def feature_projection(self, fid, level_fn=None):
+        """Tek alanın saatlik projeksiyonu ve hücresinin hava durumu tahmini"""
+        data = self.data or {}
+        entry = data.get('features', {}).get(fid)
+        if entry is None:
+            return None
+
+        cell = data.get('cells', {}).get(entry['cell'], {})
+        return {
+            'id': fid,
+            'generated_at': data.get('generated_at'),
+            'days': data.get('days', []),
+            'hourly_risk': entry['scores'],
+            'daily': daily_peaks(entry['scores'], level_fn),
+            'hourly_weather': cell.get('hourly')
+        }
+
+
+# Global tahmin projeksiyonu instance
+forecast_projector = ForecastProjector()
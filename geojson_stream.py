@@ -0,0 +1,317 @@
+import os
+import json
+import sqlite3
+import tempfile
+import threading
+
+# Akış halinde GeoJSON okuma / yazma
+#
+# Büyük FeatureCollection dosyaları json.load ile bir kerede okunursa hem ham metin
+# hem de tüm feature nesneleri aynı anda bellekte durur. iter_features dosyayı parça
+# parça okuyup feature'ları tek tek üretir; GeoJSONWriter çıktıyı feature feature
+# yazar. Böylece bellek kullanımı veri boyutuna değil, aynı anda işlenen feature
+# sayısına bağlı kalır. Kaynağı birden çok kez tarayan işler (öncelik seviyeleri)
+# ara sonuçları PropertySpool ile diskte biriktirir.
+
+CHUNK_SIZE = 1 << 16  # karakter
+WHITESPACE = ' \t\n\r'
+
+_decoder = json.JSONDecoder()
+
+
+class _StreamReader:
+    """Dosyadan parça parça okunan tampon üzerinde JSON değerlerini sırayla çözer"""
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size=None):
+        # İşlenmiş kısım atılır; tampon en fazla işlenen tek değer kadar büyür
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        chunk = self.f.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+        self.buf += chunk
+
+    def _skip_whitespace(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf) or self.eof:
+                return
+            self._fill()
+
+    def next_char(self):
+        """Boşlukları atlayıp sıradaki ayırıcı karakteri tüketir ('' = dosya sonu)"""
+        self._skip_whitespace()
+        if self.pos >= len(self.buf):
+            return ''
+        char = self.buf[self.pos]
+        self.pos += 1
+        return char
+
+    def peek_char(self):
+        self._skip_whitespace()
+        return self.buf[self.pos] if self.pos < len(self.buf) else ''
+
+    def expect(self, expected):
+        char = self.next_char()
+        if char != expected:
+            raise ValueError(f"Geçersiz GeoJSON: '{expected}' bekleniyordu, '{char}' bulundu (konum {self.pos})")
+
+    def decode_value(self):
+        """Sıradaki JSON değerini çözer; değer tampona sığmıyorsa okuma boyutu ikiye katlanır"""
+        self._skip_whitespace()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            else:
+                # Tamponun sonunda biten sayı / literal yarım okunmuş olabilir
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            self._fill(size)
+            size *= 2
+
+
+def iter_features(path, members=None):
+    """
+    GeoJSON FeatureCollection dosyasındaki feature'ları sırayla üretir.
+    'members' sözlüğü verilirse 'features' dışındaki üst düzey alanlar (type,
+    metadata...) okundukça buna yazılır; features'tan sonra gelen alanlar
+    (ör. metadata) ancak tüm feature'lar tüketildikten sonra dolar.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        reader = _StreamReader(f)
+        reader.expect('{')
+        if reader.peek_char() == '}':
+            return
+        while True:
+            key = reader.decode_value()
+            reader.expect(':')
+            if key == 'features':
+                reader.expect('[')
+                if reader.peek_char() == ']':
+                    reader.next_char()
+                else:
+                    while True:
+                        yield reader.decode_value()
+                        separator = reader.next_char()
+                        if separator == ']':
+                            break
+                        if separator != ',':
+                            raise ValueError(f"Geçersiz GeoJSON: features dizisinde beklenmeyen '{separator}'")
+            else:
+                value = reader.decode_value()
+                if members is not None:
+                    members[key] = value
+            separator = reader.next_char()
+            if separator == '}':
+                return
+            if separator != ',':
+                raise ValueError(f"Geçersiz GeoJSON: beklenmeyen '{separator}'")
+
+
+def iter_selected(path, indices):
+    """
+    Dosyayı akış halinde okuyup sadece verilen sıra numaralarındaki feature'ları
+    (i, feature) olarak dosya sırasıyla üretir; son istenen feature'dan sonra okuma durur.
+    """
+    wanted = set(indices)
+    last = max(wanted) if wanted else -1
+    for i, feature in enumerate(iter_features(path)):
+        if i > last:
+            return
+        if i in wanted:
+            yield i, feature
+
+
+def iter_selected_in_order(path, indices, directory=None):
+    """
+    iter_selected gibi, ancak feature'ları verilen indeks sırasıyla (ör. öncelik
+    skoruna göre) üretir. Seçilen feature'lar önce geçici bir spool'a yazılır;
+    bellekte aynı anda tek feature tutulur.
+    """
+    spool = PropertySpool(directory)
+    try:
+        for i, feature in iter_selected(path, indices):
+            spool.put(i, feature)
+        for i in indices:
+            feature = spool.get(i)
+            if feature is not None:
+                yield i, feature
+    finally:
+        spool.close()
+
+
+def load_geojson(path):
+    """
+    json.load ile aynı sözlüğü döndürür, ancak dosyanın ham metnini bir kerede
+    belleğe almaz (tüm feature'lar yine bellekte tutulur).
+    """
+    members = {}
+    features = list(iter_features(path, members))
+    geojson_data = {'type': members.pop('type', 'FeatureCollection'), 'features': features}
+    geojson_data.update(members)
+    return geojson_data
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+class GeoJSONWriter:
+    """
+    FeatureCollection'ı feature feature yazar (geçici dosya + atomik değiştirme).
+    Metadata gibi sonda belli olan alanlar close()'a verilir ve features'tan sonra
+    yazılır; okuyan taraf için json.dump çıktısıyla aynı nesnedir.
+    ndjson=True ise her satıra bir feature yazılır, üst düzey alanlar yazılmaz.
+
+        with GeoJSONWriter(path) as writer:
+            for feature in features:
+                writer.write(feature)
+            writer.close({'metadata': metadata})
+    """
+
+    def __init__(self, path, members=None, ndjson=False):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.ndjson = ndjson
+        self.count = 0
+        self.f = open(self.tmp_path, 'w', encoding='utf-8')
+        if not ndjson:
+            header = {'type': 'FeatureCollection'}
+            header.update(members or {})
+            for key, value in header.items():
+                self.f.write('{' if key == 'type' else ',')
+                self.f.write(f"{_dumps(key)}:{_dumps(value)}")
+            self.f.write(',"features":[')
+
+    def write(self, feature):
+        if self.ndjson:
+            self.f.write(_dumps(feature))
+            self.f.write('\n')
+        else:
+            if self.count:
+                self.f.write(',')
+            self.f.write(_dumps(feature))
+        self.count += 1
+
+    def close(self, members=None):
+        """Sondaki alanları yazar ve dosyayı yerine koyar"""
+        if self.f.closed:
+            return self.path
+        if not self.ndjson:
+            self.f.write(']')
+            for key, value in (members or {}).items():
+                self.f.write(f",{_dumps(key)}:{_dumps(value)}")
+            self.f.write('}')
+        self.f.close()
+        os.replace(self.tmp_path, self.path)
+        return self.path
+
+    def abort(self):
+        """Yarım kalan geçici dosyayı siler; hedef dosya değişmez"""
+        if not self.f.closed:
+            self.f.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+        return False
+
+
+def write_geojson(path, geojson_data):
+    """
+    json.dump ile aynı çıktıyı, tüm dosyayı tek bir metin olarak üretmeden yazar.
+    Sözlükte 'features'tan önce gelen alanlar başa, sonra gelenler sona yazılır.
+    """
+    keys = list(geojson_data)
+    split = keys.index('features') if 'features' in keys else len(keys)
+    header = {key: geojson_data[key] for key in keys[:split]}
+    trailer = {key: geojson_data[key] for key in keys[split + 1:]}
+    with GeoJSONWriter(path, header) as writer:
+        for feature in geojson_data.get('features', []):
+            writer.write(feature)
+        return writer.close(trailer)
+
+
+class PropertySpool:
+    """
+    Akış halinde işlenen feature'ların sonuç properties'ini sıra numarasıyla geçici
+    bir SQLite dosyasında tutar; sonuçlar bellekte birikmez. merge() kaynak dosya
+    yeniden okunurken her feature'ı kendi sonucuyla birleştirir.
+
+        spool = PropertySpool()
+        spool.put(i, feature['properties'])
+        write_snapshot(path, spool.merge(iter_features(source_path)))
+        spool.close()
+    """
+
+    def __init__(self, directory=None):
+        fd, self.path = tempfile.mkstemp(suffix='.spool', dir=directory)
+        os.close(fd)
+        self.lock = threading.Lock()
+        # Geçici dosya: çökmede korunması gerekmez, yazımlar fsync'siz yapılır
+        self.conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=OFF")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.execute("CREATE TABLE results (idx INTEGER PRIMARY KEY, data TEXT NOT NULL)")
+
+    def put(self, index, properties):
+        """i. feature'ın sonucunu yazar (varsa öncekinin yerine)"""
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?)", (index, _dumps(properties)))
+
+    def get(self, index):
+        with self.lock:
+            row = self.conn.execute("SELECT data FROM results WHERE idx = ?", (index,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def __contains__(self, index):
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM results WHERE idx = ?", (index,)).fetchone() is not None
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def merge(self, features, pending=None):
+        """
+        Feature akışını sonuçlarla sırayla birleştirir: sonucu olan feature'ın properties'i
+        sonuçla değiştirilir, olmayanlar pending(feature, i) ile (verilmezse aynen) üretilir.
+        Birleştirme sürerken put() çağrılmamalıdır.
+        """
+        cursor = self.conn.execute("SELECT idx, data FROM results ORDER BY idx")
+        row = cursor.fetchone()
+        for i, feature in enumerate(features):
+            while row is not None and row[0] < i:
+                row = cursor.fetchone()
+            if row is not None and row[0] == i:
+                feature['properties'] = json.loads(row[1])
+            elif pending is not None:
+                feature = pending(feature, i)
+            yield feature
+
+    def close(self):
+        """Bağlantıyı kapatıp geçici dosyayı siler"""
+        self.conn.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
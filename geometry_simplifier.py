@@ -0,0 +1,188 @@
+import math
+
+# Önceden sadeleştirilmiş geometrilerin hazırlandığı zoom seviyeleri
+LOD_ZOOM_LEVELS = [6, 8, 10, 12]
+TOLERANCE_PIXELS = 0.75  # Douglas-Peucker toleransı (piksel cinsinden)
+TILE_SIZE = 256
+
+
+def degrees_per_pixel(zoom):
+    """Verilen zoom seviyesinde bir pikselin derece karşılığı (ekvator)"""
+    return 360.0 / (TILE_SIZE * (2 ** zoom))
+
+
+def zoom_tolerance(zoom):
+    """Zoom seviyesine göre Douglas-Peucker toleransı (derece)"""
+    return degrees_per_pixel(zoom) * TOLERANCE_PIXELS
+
+
+def zoom_precision(zoom):
+    """Zoom seviyesinde piksel altı hassasiyet için gereken ondalık basamak sayısı"""
+    if zoom is None:
+        return 6
+    return max(1, min(6, math.ceil(-math.log10(degrees_per_pixel(zoom)))))
+
+
+def lod_level_for_zoom(zoom):
+    """
+    İstenen zoom için kullanılacak önceden hesaplanmış seviye.
+    En az istenen kadar detaylı en kaba seviye seçilir; yoksa None (tam geometri).
+    """
+    if zoom is None:
+        return None
+    for level in LOD_ZOOM_LEVELS:
+        if level >= zoom:
+            return level
+    return None
+
+
+def douglas_peucker(points, tolerance):
+    """Douglas-Peucker ile çizgi sadeleştirme (iteratif)"""
+    n = len(points)
+    if n < 3:
+        return list(points)
+
+    keep = [False] * n
+    keep[0] = keep[n - 1] = True
+    tolerance_sq = tolerance * tolerance
+    stack = [(0, n - 1)]
+
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+
+        x1, y1 = points[start][0], points[start][1]
+        x2, y2 = points[end][0], points[end][1]
+        dx = x2 - x1
+        dy = y2 - y1
+        length_sq = dx * dx + dy * dy
+
+        max_dist_sq = -1.0
+        index = start
+        for i in range(start + 1, end):
+            px, py = points[i][0], points[i][1]
+            if length_sq == 0:
+                dist_sq = (px - x1) ** 2 + (py - y1) ** 2
+            else:
+                t = ((px - x1) * dx + (py - y1) * dy) / length_sq
+                if t < 0:
+                    t = 0
+                elif t > 1:
+                    t = 1
+                cx = x1 + t * dx
+                cy = y1 + t * dy
+                dist_sq = (px - cx) ** 2 + (py - cy) ** 2
+            if dist_sq > max_dist_sq:
+                max_dist_sq = dist_sq
+                index = i
+
+        if max_dist_sq > tolerance_sq:
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def simplify_ring(ring, tolerance, is_outer=True):
+    """
+    Kapalı bir halkayı sadeleştirir.
+    Dış halka en az bir üçgen olarak korunur, çok küçülen delikler atılır.
+    """
+    if len(ring) <= 4:
+        return list(ring)
+
+    simplified = douglas_peucker(ring, tolerance)
+    if len(simplified) >= 4:
+        return simplified
+    if not is_outer:
+        return None
+
+    # Alan piksel altına indi; halkayı kabaca koru
+    n = len(ring) - 1
+    return [ring[0], ring[n // 3], ring[(2 * n) // 3], ring[0]]
+
+
+def quantize_rings(rings, precision):
+    """Halka koordinatlarını verilen ondalık hassasiyete yuvarlar"""
+    result = []
+    for i, ring in enumerate(rings):
+        quantized = []
+        last = None
+        for point in ring:
+            q = [round(point[0], precision), round(point[1], precision)]
+            # Yuvarlama sonrası tekrar eden noktaları at
+            if q != last:
+                quantized.append(q)
+                last = q
+        if len(quantized) >= 4:
+            result.append(quantized)
+        elif i == 0:
+            # Dış halka kaybolursa poligon çizilemez
+            return []
+    return result
+
+
+def simplify_polygon(polygon, tolerance, precision=None):
+    """Tek bir poligonu (halka listesi) sadeleştirir"""
+    rings = []
+    for i, ring in enumerate(polygon):
+        simplified = simplify_ring(ring, tolerance, is_outer=(i == 0))
+        if simplified is None:
+            continue
+        rings.append(simplified)
+    if precision is not None:
+        rings = quantize_rings(rings, precision)
+    return rings
+
+
+def simplify_geometry(geometry, zoom):
+    """GeoJSON geometrisini zoom seviyesine göre sadeleştirir ve nicemler"""
+    if not geometry:
+        return geometry
+
+    tolerance = zoom_tolerance(zoom)
+    precision = zoom_precision(zoom)
+    geometry_type = geometry.get('type')
+
+    if geometry_type == 'Polygon':
+        rings = simplify_polygon(geometry.get('coordinates') or [], tolerance, precision)
+        if not rings:
+            return None
+        return {'type': 'Polygon', 'coordinates': rings}
+
+    if geometry_type == 'MultiPolygon':
+        polygons = []
+        for polygon in geometry.get('coordinates') or []:
+            rings = simplify_polygon(polygon, tolerance, precision)
+            if rings:
+                polygons.append(rings)
+        if not polygons:
+            return None
+        return {'type': 'MultiPolygon', 'coordinates': polygons}
+
+    return geometry
+
+
+def quantize_geometry(geometry, zoom):
+    """Geometriyi sadeleştirmeden sadece nicemler"""
+    if not geometry:
+        return geometry
+
+    precision = zoom_precision(zoom)
+    geometry_type = geometry.get('type')
+
+    if geometry_type == 'Polygon':
+        return {'type': 'Polygon', 'coordinates': quantize_rings(geometry.get('coordinates') or [], precision)}
+    if geometry_type == 'MultiPolygon':
+        return {
+            'type': 'MultiPolygon',
+            'coordinates': [quantize_rings(polygon, precision) for polygon in geometry.get('coordinates') or []]
+        }
+    return geometry
+
+
+def build_lod_geometries(geometry):
+    """Bir geometri için tüm LOD seviyelerini hesaplar: {zoom: geometri}"""
+    return {str(level): simplify_geometry(geometry, level) for level in LOD_ZOOM_LEVELS}
@@ -0,0 +1,146 @@
+import os
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from spatial_index import feature_id
+from snapshot_store import Snapshot
+from geojson_stream import iter_features
+
+# Artımlı analiz: girdileri anlamlı değişmeyen alanlar LM analizine gönderilmez
+INCREMENTAL_ANALYSIS = os.environ.get('INCREMENTAL_ANALYSIS', '1') != '0'
+
+# Önceki analize göre kabul edilen en büyük değişim (ortam değişkeniyle ayarlanabilir)
+DEFAULT_INPUT_DELTAS = {
+    'sicaklik': 1.0,      # °C
+    'nem': 1.0,           # %
+    'ruzgar_hizi': 2.0,   # km/h
+    'yagis_7_gun': 1.0    # mm
+}
+INPUT_DELTAS = {
+    name: float(os.environ.get(f'INCREMENTAL_DELTA_{name.upper()}', default))
+    for name, default in DEFAULT_INPUT_DELTAS.items()
+}
+
+# hesapla_risk_skoru eşikleri: (eşikler, True ise ">=" karşılaştırması, False ise "<=")
+SCORING_THRESHOLDS = {
+    'sicaklik': ([10, 15, 20, 25, 30, 35], True),
+    'nem': ([25, 35, 45, 55, 65, 75], False),
+    'ruzgar_hizi': ([10, 15, 20, 30, 40], True),
+    'yagis_7_gun': ([3, 8, 15, 25], False)
+}
+
+
+def season_points(month):
+    """hesapla_risk_skoru'ndaki mevsim faktörü"""
+    if month in [6, 7, 8]:
+        return 10
+    if month in [5, 9]:
+        return 5
+    return 0
+
+
+def score_band(name, value):
+    """Değerin risk skorunda düştüğü eşik aralığı"""
+    thresholds, at_least = SCORING_THRESHOLDS[name]
+    if at_least:
+        return bisect_right(thresholds, value)
+    return bisect_left(thresholds, value)
+
+
+def analysis_inputs(weather_data, when=None):
+    """Analizin dayandığı hava durumu girdileri (sonraki çalıştırmada karşılaştırılır)"""
+    when = when or datetime.now()
+    inputs = {name: weather_data.get(name) for name in DEFAULT_INPUT_DELTAS}
+    inputs['mevsim'] = season_points(when.month)
+    return inputs
+
+
+def reanalysis_reason(previous, current, deltas=INPUT_DELTAS):
+    """
+    Alanın yeniden analiz edilmesi gerekiyorsa nedenini, önceki sonuç
+    aynen kullanılabiliyorsa None döndürür.
+    """
+    if not previous:
+        return 'no_previous'
+    if previous.get('mevsim') != current.get('mevsim'):
+        return 'season'
+
+    for name, max_delta in deltas.items():
+        old = previous.get(name)
+        new = current.get(name)
+        if old is None or new is None:
+            return f'missing:{name}'
+        if score_band(name, old) != score_band(name, new):
+            return f'threshold:{name}'
+        if abs(new - old) > max_delta:
+            return f'delta:{name}'
+    return None
+
+
+class SnapshotResults:
+    """
+    Önceki snapshot'taki sonuçlara feature id ile erişim. Bellekte sadece
+    id -> satır eşlemesi tutulur; properties istendiğinde snapshot'tan okunur.
+    """
+
+    def __init__(self, path):
+        self.snapshot = Snapshot(path)
+        self.rows = {}
+        for i in range(self.snapshot.count):
+            properties = self.snapshot.properties(i)
+            if properties.get('analysis_failed') or not properties.get('analysis_inputs'):
+                continue
+            stub = {'id': self.snapshot.feature_id(i), 'properties': properties}
+            self.rows[feature_id(stub, i)] = i
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, fid):
+        return fid in self.rows
+
+    def get(self, fid, default=None):
+        i = self.rows.get(fid)
+        if i is None:
+            return default
+        return self.snapshot.properties(i)
+
+
+def load_previous_results(path):
+    """
+    Önceki analizden feature id -> properties eşlemesi. Snapshot (.snap) verilirse
+    properties belleğe alınmaz, istendiğinde okunur; GeoJSON akış halinde okunur.
+    """
+    if not os.path.exists(path):
+        return {}
+
+    try:
+        if path.endswith('.snap'):
+            return SnapshotResults(path)
+
+        previous = {}
+        for i, feature in enumerate(iter_features(path)):
+            properties = feature.get('properties') or {}
+            if properties.get('analysis_failed') or not properties.get('analysis_inputs'):
+                continue
+            previous[feature_id(feature, i)] = properties
+        return previous
+    except Exception as e:
+        print(f"Önceki analiz okunamadı ({path}): {e}")
+        return {}
+
+
+def previous_for(previous_results, feature, index):
+    """Feature'ın önceki analiz sonucu, yoksa None"""
+    if not previous_results:
+        return None
+    return previous_results.get(feature_id(feature, index))
+
+
+def carry_forward(feature, previous_properties):
+    """Önceki analiz sonucunu değiştirmeden yeni çalıştırmaya taşır"""
+    properties = feature.setdefault('properties', {})
+    properties.update(previous_properties)
+    properties.pop('analysis_failed', None)
+    properties.pop('analysis_pending', None)
+    properties['analysis_carried_forward'] = True
+    return feature
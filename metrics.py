@@ -0,0 +1,265 @@
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from run_profile import record_stage
+
+# Gecikme histogramlarının varsayılan kova sınırları (saniye)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Dış servis çağrılarının çalıştırma profilinde karşılık geldiği aşama
+# (LM çağrısı, dummy modu da kapsaması için çağrıldığı yerde ölçülür)
+UPSTREAM_STAGES = {
+    'weatherapi': 'weather_fetch'
+}
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class _Metric:
+    """Etiket değerlerine göre alt seriler tutan metrik tabanı"""
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def labels(self, *values):
+        """Etiket değerleri için seri nesnesi (sık çağrılan yerlerde saklanıp tekrar kullanılabilir)"""
+        child = self.series.get(values)
+        if child is None:
+            with self.lock:
+                child = self.series.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        for values, child in sorted(self.series.items()):
+            lines.extend(child.render(self.name, self.labelnames, values))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ('value', 'lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self.lock:
+            self.value += amount
+
+    def render(self, name, labelnames, values):
+        return [f'{name}{_format_labels(labelnames, values)} {_format_value(self.value)}']
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount=1.0):
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ('bounds', 'counts', 'total', 'count', 'lock')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.total += value
+            self.count += 1
+
+    def render(self, name, labelnames, values):
+        with self.lock:
+            counts = list(self.counts)
+            total = self.total
+            count = self.count
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.bounds + (float('inf'),), counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{_format_labels(labelnames, values, ("le", _format_value(bound)))} {cumulative}')
+        labels = _format_labels(labelnames, values)
+        lines.append(f'{name}_sum{labels} {_format_value(total)}')
+        lines.append(f'{name}_count{labels} {count}')
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+
+class MetricsRegistry:
+    """Süreç içi metrik kaydı; /metrics için Prometheus metin formatında çıktı üretir"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    def _register(self, metric):
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self):
+        with self.lock:
+            metrics = [self.metrics[name] for name in sorted(self.metrics)]
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Global metrik kaydı ve uygulamanın ortak metrikleri
+registry = MetricsRegistry()
+
+UPSTREAM_LATENCY = registry.histogram(
+    'forest_upstream_request_seconds', 'Dış servis çağrılarının süresi', ('upstream', 'endpoint'))
+UPSTREAM_ERRORS = registry.counter(
+    'forest_upstream_errors_total', 'Hata ile sonuçlanan dış servis çağrıları', ('upstream', 'endpoint'))
+UPSTREAM_IN_FLIGHT = registry.gauge(
+    'forest_upstream_in_flight', 'Devam eden dış servis çağrıları', ('upstream',))
+UPSTREAM_CONCURRENCY_LIMIT = registry.gauge(
+    'forest_upstream_concurrency_limit', 'AIMD ile ayarlanan eşzamanlı çağrı limiti', ('upstream',))
+UPSTREAM_RETRIES = registry.counter(
+    'forest_upstream_retries_total', 'Geri çekilmeli yeniden denemeler', ('upstream',))
+UPSTREAM_CIRCUIT_OPEN = registry.gauge(
+    'forest_upstream_circuit_open', 'Devre kesici açık (1) / kapalı (0)', ('upstream',))
+UPSTREAM_SHORT_CIRCUITS = registry.counter(
+    'forest_upstream_short_circuits_total', 'Devre açıkken çağrı yapılmadan reddedilen istekler', ('upstream',))
+RATE_LIMIT_WAIT = registry.histogram(
+    'forest_rate_limit_wait_seconds', 'Rate limiter tarafından bekletilen süre', ('limiter',),
+    buckets=(0.001, 0.01, 0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0))
+CACHE_EVENTS = registry.counter(
+    'forest_cache_events_total', 'Cache isabet / ıskalama / çıkarma sayıları', ('cache', 'event'))
+RUN_DURATION = registry.histogram(
+    'forest_analysis_run_seconds', 'Analiz çalıştırmalarının süresi', ('job',),
+    buckets=(10, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200))
+RUN_FEATURES_PER_SECOND = registry.gauge(
+    'forest_analysis_features_per_second', 'Son çalıştırmada saniyede işlenen alan', ('job',))
+RUN_FEATURES = registry.counter(
+    'forest_analysis_features_total', 'Çalıştırmalarda işlenen alanlar', ('job', 'result'))
+RUNS_IN_PROGRESS = registry.gauge(
+    'forest_analysis_runs_in_progress', 'Devam eden analiz çalıştırmaları', ('job',))
+
+
+def cache_event(cache, event, amount=1):
+    """Cache olayını sayar (event: hit, miss, eviction)"""
+    CACHE_EVENTS.labels(cache, event).inc(amount)
+
+
+@contextmanager
+def track_upstream(upstream, endpoint):
+    """Dış servis çağrısının süresini, hatalarını ve eşzamanlı sayısını ölçer"""
+    in_flight = UPSTREAM_IN_FLIGHT.labels(upstream)
+    in_flight.inc()
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        UPSTREAM_ERRORS.labels(upstream, endpoint).inc()
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        UPSTREAM_LATENCY.labels(upstream, endpoint).observe(duration)
+        if upstream in UPSTREAM_STAGES:
+            record_stage(UPSTREAM_STAGES[upstream], duration)
+        in_flight.dec()
+
+
+@contextmanager
+def track_rate_limit(limiter):
+    """Rate limiter çağrısında geçen (uyku + kilit bekleme) süreyi ölçer"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        RATE_LIMIT_WAIT.labels(limiter).observe(duration)
+        record_stage('rate_limit_wait', duration)
+
+
+@contextmanager
+def track_run(job):
+    """Çalıştırma süresini ve devam eden çalıştırma sayısını ölçer"""
+    in_progress = RUNS_IN_PROGRESS.labels(job)
+    in_progress.inc()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        RUN_DURATION.labels(job).observe(time.perf_counter() - start)
+        in_progress.dec()
+
+
+def record_run_throughput(job, analyzed, failed, duration):
+    """Çalıştırma bitince işlenen alan sayılarını ve alan/saniye değerini kaydeder"""
+    RUN_FEATURES.labels(job, 'analyzed').inc(analyzed)
+    RUN_FEATURES.labels(job, 'failed').inc(failed)
+    if duration > 0:
+        RUN_FEATURES_PER_SECOND.labels(job).set((analyzed + failed) / duration)
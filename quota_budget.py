@@ -0,0 +1,196 @@
+import os
+import time
+import sqlite3
+import calendar
+import logging
+import threading
+from datetime import datetime, timedelta
+
+QUOTA_DB_PATH = os.environ.get('QUOTA_DB_PATH', 'data/quota_usage.db')
+
+# Sağlayıcı başına aylık istek kotası (0: izlenir ama bütçe uygulanmaz)
+MONTHLY_QUOTAS = {
+    'weatherapi': int(os.environ.get('WEATHERAPI_MONTHLY_QUOTA', 1000000)),
+    'groq': int(os.environ.get('GROQ_MONTHLY_QUOTA', 0)),
+}
+
+# Bütçe seviyeleri: ay sonu tahmini / kota oranına göre
+CONSERVE_THRESHOLD = float(os.environ.get('QUOTA_CONSERVE_THRESHOLD', 0.9))  # Hücre örnekleme + uzun cache
+CRITICAL_THRESHOLD = float(os.environ.get('QUOTA_CRITICAL_THRESHOLD', 1.1))  # Yenilemeler atlanır
+EXHAUSTED_THRESHOLD = 0.95  # Harcanan / kota bu orana ulaşınca tahminden bağımsız kritik
+
+PROJECTION_DAYS = 7  # Ay sonu tahmini son 7 günün ortalama hızıyla yapılır
+FLUSH_EVERY = 20  # Bu kadar çağrıda bir (veya FLUSH_SECONDS'ta bir) sayaçlar diske yazılır
+FLUSH_SECONDS = 30
+LEVEL_CACHE_SECONDS = 60  # Seviye her hava durumu çağrısında yeniden hesaplanmaz
+
+NORMAL = 'normal'
+CONSERVE = 'conserve'
+CRITICAL = 'critical'
+
+# Seviyeye göre hava durumu / analiz cache süresi çarpanı
+CACHE_TTL_MULTIPLIERS = {NORMAL: 1, CONSERVE: 6, CRITICAL: 24}
+
+
+class QuotaBudget:
+    """
+    Dış servis çağrılarını sağlayıcı ve gün bazında sayar (SQLite, yeniden başlatmada
+    korunur), ay sonu kullanımını tahmin eder ve kota risk altındaysa bütçe seviyesini
+    yükseltir. Sayaçlar bellekte biriktirilip toplu yazılır; çağrı başına disk yazımı yapılmaz.
+    """
+
+    def __init__(self, db_path=QUOTA_DB_PATH, quotas=None):
+        self.db_path = db_path
+        self.quotas = dict(MONTHLY_QUOTAS if quotas is None else quotas)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.pending = {}  # (provider, gün) -> henüz yazılmamış çağrı sayısı
+        self.pending_total = 0
+        self.last_flush = time.time()
+        self.levels = {}  # provider -> (hesaplanma zamanı, seviye)
+
+    def _connection(self):
+        """Thread başına bağlantı"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS usage (
+                                provider TEXT NOT NULL, day TEXT NOT NULL, calls INTEGER NOT NULL,
+                                PRIMARY KEY (provider, day))""")
+            self.local.conn = conn
+        return conn
+
+    def reopen(self, db_path):
+        """Bekleyen sayaçları yazıp başka bir veritabanına geçer (benchmark / test)"""
+        self.flush()
+        with self.lock:
+            self.db_path = db_path
+            self.local = threading.local()  # Tüm thread'ler yeni dosyaya bağlanır
+            self.levels = {}
+
+    def record(self, provider, count=1):
+        """Bir (veya 'count' adet) dış servis çağrısını bugüne yazar"""
+        key = (provider, datetime.now().strftime('%Y-%m-%d'))
+        with self.lock:
+            self.pending[key] = self.pending.get(key, 0) + count
+            self.pending_total += count
+            due = self.pending_total >= FLUSH_EVERY or time.time() - self.last_flush >= FLUSH_SECONDS
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Bekleyen sayaçları veritabanına ekler; hata olursa bir sonraki yazıma bırakır"""
+        with self.lock:
+            pending, self.pending, self.pending_total = self.pending, {}, 0
+            self.last_flush = time.time()
+            if not pending:
+                return
+            try:
+                self._connection().executemany(
+                    """INSERT INTO usage (provider, day, calls) VALUES (?, ?, ?)
+                       ON CONFLICT (provider, day) DO UPDATE SET calls = calls + excluded.calls""",
+                    [(provider, day, calls) for (provider, day), calls in pending.items()]
+                )
+            except sqlite3.Error as e:
+                logging.warning(f"Kota sayaçları kaydedilemedi, sonraki yazımda tekrar denenecek: {e}")
+                for key, calls in pending.items():
+                    self.pending[key] = self.pending.get(key, 0) + calls
+                    self.pending_total += calls
+
+    def daily_usage(self, provider, since_day):
+        """since_day (YYYY-MM-DD) ve sonrası için {gün: çağrı sayısı}"""
+        self.flush()
+        with self.lock:
+            usage = {}
+            try:
+                rows = self._connection().execute(
+                    "SELECT day, calls FROM usage WHERE provider = ? AND day >= ?", (provider, since_day)
+                ).fetchall()
+                usage = dict(rows)
+            except sqlite3.Error as e:
+                logging.warning(f"Kota sayaçları okunamadı: {e}")
+            # Yazılamamış sayaçlar da kullanıma dahil
+            for (pending_provider, day), calls in self.pending.items():
+                if pending_provider == provider and day >= since_day:
+                    usage[day] = usage.get(day, 0) + calls
+            return usage
+
+    def usage(self, provider, now=None):
+        """Bugünkü ve bu ayki çağrılar, günlük hız, ay sonu tahmini ve bütçe seviyesi"""
+        now = now or datetime.now()
+        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        window_start = min(month_start, now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=PROJECTION_DAYS - 1))
+        daily = self.daily_usage(provider, window_start.strftime('%Y-%m-%d'))
+
+        today = daily.get(now.strftime('%Y-%m-%d'), 0)
+        month_used = sum(calls for day, calls in daily.items() if day >= month_start.strftime('%Y-%m-%d'))
+
+        # Son PROJECTION_DAYS günün hızı; sayım daha yeni başladıysa ilk kayıtlı günden itibaren.
+        # Günlük işler patlamalı olduğundan pencere en az bir gün sayılır
+        recent_start = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=PROJECTION_DAYS - 1)
+        recent = {day: calls for day, calls in daily.items() if day >= recent_start.strftime('%Y-%m-%d')}
+        per_day = 0.0
+        if recent:
+            first_day = datetime.strptime(min(recent), '%Y-%m-%d')
+            elapsed_days = max((now - first_day).total_seconds() / 86400, 1.0)
+            per_day = sum(recent.values()) / elapsed_days
+
+        days_in_month = calendar.monthrange(now.year, now.month)[1]
+        remaining_days = days_in_month - (now - month_start).total_seconds() / 86400
+        projected = month_used + per_day * remaining_days
+
+        quota = self.quotas.get(provider, 0)
+        return {
+            'today': today,
+            'month': month_used,
+            'per_day': round(per_day, 1),
+            'projected_month_end': int(round(projected)),
+            'quota': quota,
+            'remaining': max(0, quota - month_used) if quota > 0 else None,
+            'level': self._level(quota, month_used, projected)
+        }
+
+    @staticmethod
+    def _level(quota, month_used, projected):
+        if quota <= 0:
+            return NORMAL
+        if month_used >= quota * EXHAUSTED_THRESHOLD or projected >= quota * CRITICAL_THRESHOLD:
+            return CRITICAL
+        if projected >= quota * CONSERVE_THRESHOLD:
+            return CONSERVE
+        return NORMAL
+
+    def level(self, provider):
+        """Bütçe seviyesi (LEVEL_CACHE_SECONDS boyunca önbellekli)"""
+        cached = self.levels.get(provider)
+        if cached is not None and time.time() - cached[0] < LEVEL_CACHE_SECONDS:
+            return cached[1]
+        level = NORMAL if self.quotas.get(provider, 0) <= 0 else self.usage(provider)['level']
+        if cached is None or cached[1] != level:
+            log = logging.info if level == NORMAL else logging.warning
+            log(f"{provider} kota bütçesi seviyesi: {level}")
+        self.levels[provider] = (time.time(), level)
+        return level
+
+    def conserving(self, provider):
+        """Kota risk altında: hava durumu hücre merkezinden alınır, cache süreleri uzar"""
+        return self.level(provider) != NORMAL
+
+    def allow_refresh(self, provider):
+        """Kritik seviyede zamanlanmış / bayatlık kaynaklı yenilemeler atlanır"""
+        return self.level(provider) != CRITICAL
+
+    def ttl_multiplier(self, provider):
+        return CACHE_TTL_MULTIPLIERS[self.level(provider)]
+
+    def status(self):
+        """/analysis_status için sağlayıcı başına kota durumu"""
+        return {provider: self.usage(provider) for provider in self.quotas}
+
+
+# Global kota bütçesi
+quota_budget = QuotaBudget()
@@ -0,0 +1,104 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+
+RATE_LIMIT_DB_PATH = os.environ.get('RATE_LIMIT_DB_PATH', 'data/rate_limits.db')
+
+
+class RateLimitStore:
+    """
+    Kalıcı token bucket rate limiter. Her limiter için kalan jeton ve son dolum zamanı
+    SQLite'ta tek satır olarak tutulur; aynı dosyayı kullanan tüm süreçler kotayı
+    paylaşır ve yeniden başlatma sonrası önceki dakikada harcanan istekler unutulmaz.
+    Veritabanına erişilemezse süreç içi bucket ile devam edilir.
+    """
+
+    def __init__(self, db_path=RATE_LIMIT_DB_PATH):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.memory = {}  # Yedek: name -> (tokens, updated)
+
+    def _connection(self):
+        """Thread başına bağlantı (her istekte yeniden açılmaz)"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS buckets (
+                                name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)""")
+            self.local.conn = conn
+        return conn
+
+    def reopen(self, db_path):
+        """Başka bir veritabanına geçer (benchmark / test); süreç içi yedek bucket'lar sıfırlanır"""
+        with self.lock:
+            self.db_path = db_path
+            self.local = threading.local()  # Tüm thread'ler yeni dosyaya bağlanır
+            self.memory = {}
+
+    @staticmethod
+    def _take(row, capacity, rate, now):
+        """Bucket'ı geçen süre kadar doldurup bir jeton düşer; (kalan jeton, bekleme süresi)"""
+        if row is None:
+            tokens = capacity
+        else:
+            tokens = min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+        tokens -= 1
+        # Jeton eksiye düşerse istek ayrılmış sayılır; sonraki çağrılar sırayla daha uzun bekler
+        wait = -tokens / rate if tokens < 0 else 0.0
+        return tokens, wait
+
+    def reserve(self, name, capacity, per_seconds):
+        """
+        'per_seconds' saniyede 'capacity' istek limitli bucket'tan bir jeton ayırır.
+        İstekten önce beklenmesi gereken süreyi (saniye) döndürür.
+        """
+        if capacity <= 0 or per_seconds <= 0:
+            return 0.0
+        rate = capacity / per_seconds
+        now = time.time()
+        with self.lock:
+            try:
+                conn = self._connection()
+                conn.execute("BEGIN IMMEDIATE")  # Diğer süreçlerle aynı anda okuma-yazma yapılmaz
+                try:
+                    row = conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+                    tokens, wait = self._take(row, capacity, rate, now)
+                    conn.execute("INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                                 (name, tokens, now))
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+                return wait
+            except sqlite3.Error as e:
+                logging.warning(f"Rate limit durumu kaydedilemedi ({name}), süreç içi limit kullanılıyor: {e}")
+                tokens, wait = self._take(self.memory.get(name), capacity, rate, now)
+                self.memory[name] = (tokens, now)
+                return wait
+
+    def acquire(self, name, capacity, per_seconds):
+        """Jeton ayırır ve gerekirse bekler; beklenen süreyi döndürür"""
+        wait = self.reserve(name, capacity, per_seconds)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def status(self):
+        """Limiter başına kayıtlı jeton ve son güncelleme zamanı"""
+        try:
+            with self.lock:
+                rows = self._connection().execute("SELECT name, tokens, updated FROM buckets").fetchall()
+            return {name: {'tokens': round(tokens, 2), 'updated': updated} for name, tokens, updated in rows}
+        except sqlite3.Error:
+            return {name: {'tokens': round(tokens, 2), 'updated': updated} for name, (tokens, updated) in self.memory.items()}
+
+
+# Global rate limit deposu
+rate_limit_store = RateLimitStore()
@@ -0,0 +1,273 @@
+import json
+import os
+import math
+import threading
+from datetime import datetime
+from spatial_index import feature_id, geometry_polygons, polygons_bbox
+from snapshot_store import Snapshot
+
+# Düşük zoom seviyelerinde kullanılan grid çözünürlükleri (derece)
+# (minimum zoom, hücre boyutu) - zoom arttıkça hücreler küçülür
+GRID_LEVELS = [
+    (0, 1.0),
+    (6, 0.5),
+    (7, 0.25)
+]
+GRID_ZOOM_THRESHOLD = 8  # Bu zoom'un altında harita grid kullanır
+
+# Baskın seviye eşitliğinde daha yüksek risk tercih edilir
+LEVEL_ORDER = ['Düşük', 'Düşük-Orta', 'Orta', 'Orta-Yüksek', 'Yüksek', 'Çok Yüksek']
+
+
+def grid_path_for(analyzed_path):
+    """Analiz dosyasına karşılık gelen grid dosyasının yolu"""
+    base, _ = os.path.splitext(analyzed_path)
+    return f"{base}_grid.json"
+
+
+def resolution_for_zoom(zoom):
+    """Zoom seviyesine uygun grid çözünürlüğü"""
+    resolution = GRID_LEVELS[0][1]
+    for min_zoom, level_resolution in GRID_LEVELS:
+        if zoom is not None and zoom >= min_zoom:
+            resolution = level_resolution
+    return resolution
+
+
+def level_rank(level):
+    """Risk seviyesinin sıralamadaki yeri (bilinmeyen seviyeler en düşük)"""
+    try:
+        return LEVEL_ORDER.index(level)
+    except ValueError:
+        return -1
+
+
+def feature_contribution(feature):
+    """Feature'ın grid'e katkısı: (lat, lon, skor, seviye) ya da None"""
+    properties = feature.get('properties') or {}
+    if properties.get('analysis_failed'):
+        return None
+
+    score = properties.get('combined_risk_score', properties.get('risk_skoru'))
+    level = properties.get('combined_risk_level', properties.get('risk_seviyesi'))
+    if score is None:
+        return None
+
+    lat = properties.get('centroid_lat')
+    lon = properties.get('centroid_lon')
+    if lat is None or lon is None:
+        bbox = polygons_bbox(geometry_polygons(feature.get('geometry')))
+        if bbox is None:
+            return None
+        lon = (bbox[0] + bbox[2]) / 2
+        lat = (bbox[1] + bbox[3]) / 2
+
+    return [round(lat, 6), round(lon, 6), round(float(score), 2), level]
+
+
+def cell_key(lat, lon, resolution):
+    """Koordinatın düştüğü hücrenin anahtarı"""
+    return f"{math.floor(lon / resolution)}_{math.floor(lat / resolution)}"
+
+
+class RiskGrid:
+    """
+    Düşük zoom seviyeleri için hücre bazlı risk özetleri.
+    Her hücre için maksimum skor, ortalama skor, alan sayısı ve baskın seviye tutulur.
+    Sadece değişen feature'ların hücreleri yeniden hesaplanır.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.contributions = {}  # feature_id -> [lat, lon, skor, seviye]
+        self.members = {}  # resolution -> hücre -> set(feature_id)
+        self.cells = {}  # resolution -> hücre -> özet
+        self.source_mtime = None
+        self.updated_at = None
+
+    def _reset(self):
+        self.contributions = {}
+        self.members = {str(resolution): {} for _, resolution in GRID_LEVELS}
+        self.cells = {str(resolution): {} for _, resolution in GRID_LEVELS}
+
+    def _summarize(self, resolution, key):
+        """Tek bir hücrenin özetini üyelerinden yeniden hesaplar"""
+        members = self.members[resolution].get(key)
+        if not members:
+            self.members[resolution].pop(key, None)
+            self.cells[resolution].pop(key, None)
+            return
+
+        total = 0.0
+        max_score = None
+        max_level = None
+        level_counts = {}
+        for fid in members:
+            _, _, score, level = self.contributions[fid]
+            total += score
+            if max_score is None or score > max_score:
+                max_score = score
+                max_level = level
+            level_counts[level] = level_counts.get(level, 0) + 1
+
+        dominant_level = max(level_counts, key=lambda lv: (level_counts[lv], level_rank(lv)))
+        self.cells[resolution][key] = {
+            'max_score': max_score,
+            'max_level': max_level,
+            'mean_score': round(total / len(members), 2),
+            'count': len(members),
+            'dominant_level': dominant_level
+        }
+
+    def update(self, features, source_mtime=None, indices=None):
+        """
+        Grid'i yeni analiz sonucuyla günceller.
+        Değişmeyen feature'lara dokunulmaz; sadece etkilenen hücreler yeniden hesaplanır.
+        'indices' verilirse (ara sonuç) sadece o sıra numaralarındaki feature'lar
+        uygulanır ve sonuçta olmayan feature'lar silinmez.
+        """
+        with self.lock:
+            if not self.cells:
+                self._reset()
+
+            new_contributions = {}
+            for i, feature in enumerate(features):
+                if indices is not None and i not in indices:
+                    continue
+                contribution = feature_contribution(feature)
+                if contribution is not None:
+                    new_contributions[feature_id(feature, i)] = contribution
+
+            dirty = {str(resolution): set() for _, resolution in GRID_LEVELS}
+            changed = set()
+
+            # Silinen veya değişen feature'ları eski hücrelerinden çıkar
+            if indices is None:
+                previous = list(self.contributions.items())
+            else:
+                previous = [(fid, self.contributions[fid]) for fid in new_contributions if fid in self.contributions]
+            for fid, old in previous:
+                new = new_contributions.get(fid)
+                if new == old:
+                    continue
+                for _, resolution in GRID_LEVELS:
+                    res_key = str(resolution)
+                    key = cell_key(old[0], old[1], resolution)
+                    members = self.members[res_key].get(key)
+                    if members is not None:
+                        members.discard(fid)
+                    dirty[res_key].add(key)
+                del self.contributions[fid]
+                changed.add(fid)
+
+            # Yeni veya değişen feature'ları hücrelerine ekle
+            for fid, new in new_contributions.items():
+                if fid in self.contributions:
+                    continue
+                self.contributions[fid] = new
+                for _, resolution in GRID_LEVELS:
+                    res_key = str(resolution)
+                    key = cell_key(new[0], new[1], resolution)
+                    self.members[res_key].setdefault(key, set()).add(fid)
+                    dirty[res_key].add(key)
+                changed.add(fid)
+
+            rebuilt = 0
+            for res_key, keys in dirty.items():
+                for key in keys:
+                    self._summarize(res_key, key)
+                    rebuilt += 1
+
+            self.source_mtime = source_mtime
+            self.updated_at = datetime.now().isoformat()
+
+        print(f"Risk grid güncellendi: {len(changed)} alan değişti, {rebuilt} hücre yeniden hesaplandı")
+        return rebuilt
+
+    def save(self, path):
+        """Grid durumunu kompakt JSON olarak kaydeder"""
+        with self.lock:
+            data = {
+                'levels': [[min_zoom, resolution] for min_zoom, resolution in GRID_LEVELS],
+                'updated_at': self.updated_at,
+                'source_mtime': self.source_mtime,
+                'contributions': self.contributions,
+                'cells': self.cells
+            }
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+
+    def load(self, path):
+        """Kaydedilmiş grid durumunu yükler"""
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"Grid dosyası okuma hatası: {e}")
+            return False
+
+        # Çözünürlükler değiştiyse kayıtlı grid kullanılamaz
+        if data.get('levels') != [[min_zoom, resolution] for min_zoom, resolution in GRID_LEVELS]:
+            return False
+
+        with self.lock:
+            self._reset()
+            self.contributions = data.get('contributions', {})
+            self.cells = data.get('cells', self.cells)
+            for fid, (lat, lon, _, _) in self.contributions.items():
+                for _, resolution in GRID_LEVELS:
+                    key = cell_key(lat, lon, resolution)
+                    self.members[str(resolution)].setdefault(key, set()).add(fid)
+            self.source_mtime = data.get('source_mtime')
+            self.updated_at = data.get('updated_at')
+        return True
+
+    def ensure_loaded(self, analyzed_path):
+        """Grid analiz snapshot'ıyla güncel değilse yükler veya günceller"""
+        if not os.path.exists(analyzed_path):
+            return False
+        mtime = os.path.getmtime(analyzed_path)
+        if self.source_mtime == mtime:
+            return True
+
+        grid_path = grid_path_for(analyzed_path)
+        if self.load(grid_path) and self.source_mtime == mtime:
+            return True
+
+        with Snapshot(analyzed_path) as snapshot:
+            self.update(snapshot.features(), source_mtime=mtime)
+        self.save(grid_path)
+        return True
+
+    def query(self, zoom, bbox=None):
+        """Zoom seviyesine uygun hücreleri GeoJSON feature listesi olarak döndürür"""
+        resolution = resolution_for_zoom(zoom)
+        with self.lock:
+            cells = dict(self.cells.get(str(resolution), {}))
+
+        result = []
+        for key, summary in cells.items():
+            ix, iy = (int(v) for v in key.split('_'))
+            minx = ix * resolution
+            miny = iy * resolution
+            maxx = minx + resolution
+            maxy = miny + resolution
+            if bbox is not None and (minx > bbox[2] or maxx < bbox[0] or miny > bbox[3] or maxy < bbox[1]):
+                continue
+            properties = dict(summary)
+            properties['cell'] = key
+            result.append({
+                'type': 'Feature',
+                'properties': properties,
+                'geometry': {
+                    'type': 'Polygon',
+                    'coordinates': [[[minx, miny], [maxx, miny], [maxx, maxy], [minx, maxy], [minx, miny]]]
+                }
+            })
+        return result, resolution
+
+
+# Global risk grid instance
+risk_grid = RiskGrid()
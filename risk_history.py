@@ -0,0 +1,362 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from spatial_index import feature_id
+
+# Risk geçmişi ayarları
+HISTORY_DB_PATH = os.environ.get('HISTORY_DB_PATH', 'data/risk_history.db')
+HISTORY_RETENTION_DAYS = int(os.environ.get('HISTORY_RETENTION_DAYS', 90))
+HISTORY_DOWNSAMPLE_AFTER_DAYS = int(os.environ.get('HISTORY_DOWNSAMPLE_AFTER_DAYS', 14))  # Sonrası günde tek kayıt
+HISTORY_KEYFRAME_INTERVAL = int(os.environ.get('HISTORY_KEYFRAME_INTERVAL', 16))  # Kaç değişimde bir mutlak değer
+COMPACT_INTERVAL_HOURS = 24
+
+# Saklanan sayısal alanlar ve ölçekleri (değerler tam sayı olarak tutulur)
+HISTORY_FIELDS = [
+    ('score', 10),
+    ('sicaklik', 10),
+    ('nem', 10),
+    ('ruzgar_hizi', 10),
+    ('yagis_7_gun', 10)
+]
+FIELD_NAMES = [name for name, _ in HISTORY_FIELDS]
+
+
+def extract_values(feature):
+    """Feature'dan geçmişte tutulan değerleri (ölçeklenmiş tam sayılar, seviye) çıkarır"""
+    properties = feature.get('properties') or {}
+    if properties.get('analysis_failed'):
+        return None
+
+    score = properties.get('combined_risk_score', properties.get('risk_skoru'))
+    if score is None:
+        return None
+    level = properties.get('combined_risk_level', properties.get('risk_seviyesi'))
+
+    weather = properties.get('weather_data') or properties
+    raw = {
+        'score': score,
+        'sicaklik': weather.get('sicaklik'),
+        'nem': weather.get('nem'),
+        'ruzgar_hizi': weather.get('ruzgar_hizi'),
+        'yagis_7_gun': weather.get('yagis_7_gun')
+    }
+    values = tuple(
+        int(round(float(raw[name]) * scale)) if raw[name] is not None else 0
+        for name, scale in HISTORY_FIELDS
+    )
+    return values, level
+
+
+def decode_values(values, level):
+    """Ölçeklenmiş değerleri okunabilir sözlüğe çevirir"""
+    result = {name: values[i] / scale for i, (name, scale) in enumerate(HISTORY_FIELDS)}
+    result['level'] = level
+    return result
+
+
+class RiskHistory:
+    """
+    Feature bazlı risk zaman serisi.
+    Her çalıştırmada sadece değişen değerler delta olarak eklenir; belirli
+    aralıklarla mutlak değer (keyframe) yazılarak okuma maliyeti sınırlanır.
+    Her kaynak (ör. web analizi, zamanlanmış LM analizi) kendi serisini tutar;
+    veritabanı birden çok süreç tarafından paylaşılabilir.
+    """
+
+    def __init__(self, db_path=HISTORY_DB_PATH,
+                 retention_days=HISTORY_RETENTION_DAYS,
+                 downsample_after_days=HISTORY_DOWNSAMPLE_AFTER_DAYS,
+                 keyframe_interval=HISTORY_KEYFRAME_INTERVAL):
+        self.db_path = db_path
+        self.retention_days = retention_days
+        self.downsample_after_days = downsample_after_days
+        self.keyframe_interval = keyframe_interval
+        self.lock = threading.Lock()
+        self.state = {}  # kaynak -> (damga, {feature_id: [values, level, keyframe'den beri satır]})
+
+    def _connect(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("""CREATE TABLE IF NOT EXISTS runs (
+                            run_id INTEGER PRIMARY KEY, ts TEXT NOT NULL, source TEXT)""")
+        if self._needs_migration(conn):
+            conn.execute("BEGIN IMMEDIATE")
+            # Başka bir süreç kilidi beklerken taşımış olabilir
+            if self._needs_migration(conn):
+                # Kaynak sütunu öncesi satırlar tek (karışık) seri olarak '' kaynağında korunur
+                conn.execute("ALTER TABLE points RENAME TO points_legacy")
+                self._create_points(conn)
+                conn.execute("INSERT INTO points SELECT '', * FROM points_legacy")
+                conn.execute("DROP TABLE points_legacy")
+            conn.commit()
+        self._create_points(conn)
+        conn.execute("CREATE INDEX IF NOT EXISTS runs_ts ON runs (ts)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        return conn
+
+    def _needs_migration(self, conn):
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(points)")]
+        return bool(columns) and 'source' not in columns
+
+    def _create_points(self, conn):
+        conn.execute(f"""CREATE TABLE IF NOT EXISTS points (
+                            source TEXT NOT NULL, feature_id TEXT NOT NULL, run_id INTEGER NOT NULL,
+                            keyframe INTEGER NOT NULL,
+                            {', '.join(f'd_{name} INTEGER NOT NULL' for name in FIELD_NAMES)},
+                            level TEXT,
+                            PRIMARY KEY (source, feature_id, run_id)) WITHOUT ROWID""")
+
+    def _iter_series(self, conn, where='', params=()):
+        """
+        Satırları seri (kaynak, feature) sırasıyla okuyup mutlak değerleri yeniden kurar.
+        (source, feature_id, run_id, values, level, keyframe) üretir.
+        """
+        columns = ', '.join(f'd_{name}' for name in FIELD_NAMES)
+        query = (f"SELECT points.source, feature_id, points.run_id, keyframe, {columns}, level FROM points {where} "
+                 "ORDER BY points.source, feature_id, points.run_id")
+        current = None
+        values = None
+        level = None
+        for row in conn.execute(query, params):
+            source, fid, run_id, keyframe = row[0], row[1], row[2], row[3]
+            deltas = row[4:4 + len(FIELD_NAMES)]
+            if (source, fid) != current:
+                current = (source, fid)
+                values = None
+                level = None
+            if keyframe or values is None:
+                values = tuple(deltas)
+            else:
+                values = tuple(v + d for v, d in zip(values, deltas))
+            if row[-1] is not None:
+                level = row[-1]
+            yield source, fid, run_id, values, level, keyframe
+
+    def _state_stamp(self, conn, source):
+        """Kaynağın serisi en son ne zaman değişti: (son çalıştırması, son sıkıştırma)"""
+        last_run = conn.execute("SELECT MAX(run_id) FROM runs WHERE COALESCE(source, '') = ?", (source,)).fetchone()[0]
+        compacted = conn.execute("SELECT value FROM meta WHERE name = 'last_compact'").fetchone()
+        return last_run, compacted[0] if compacted else None
+
+    def _load_state(self, conn, source):
+        """Kaynağın her feature için son değerlerini (diff tabanı) veritabanından okur"""
+        state = {}
+        for _, fid, _, values, level, keyframe in self._iter_series(conn, 'WHERE source = ?', (source,)):
+            entry = state.get(fid)
+            since = 0 if keyframe or entry is None else entry[2] + 1
+            state[fid] = [values, level, since]
+        return state
+
+    def record_run(self, features, source=None, ts=None):
+        """Bir analiz çalıştırmasının sonuçlarını kaynağın serisine ekler; değişmeyen alanlar atlanır"""
+        ts = ts or datetime.now()
+        series = source or ''
+        with self.lock:
+            conn = self._connect()
+            try:
+                # Diff tabanı yazım kilidi altında doğrulanır: aynı kaynağa başka bir süreç
+                # yazdıysa veya geçmiş sıkıştırıldıysa bellekteki taban yeniden okunur
+                conn.execute("BEGIN IMMEDIATE")
+                stamp = self._state_stamp(conn, series)
+                cached = self.state.get(series)
+                if cached is not None and cached[0] == stamp:
+                    state = cached[1]
+                else:
+                    state = self._load_state(conn, series)
+                # Yazım geri alınırsa taban bir sonraki çalıştırmada yeniden okunur
+                self.state.pop(series, None)
+
+                cursor = conn.execute("INSERT INTO runs (ts, source) VALUES (?, ?)", (ts.isoformat(), source))
+                run_id = cursor.lastrowid
+
+                rows = []
+                seen = set()
+                for i, feature in enumerate(features):
+                    extracted = extract_values(feature)
+                    if extracted is None:
+                        continue
+                    fid = feature_id(feature, i)
+                    if fid in seen:
+                        continue
+                    seen.add(fid)
+                    values, level = extracted
+
+                    entry = state.get(fid)
+                    if entry is not None and entry[0] == values and entry[1] == level:
+                        continue
+
+                    if entry is None or entry[2] + 1 >= self.keyframe_interval:
+                        rows.append((series, fid, run_id, 1) + values + (level,))
+                        state[fid] = [values, level, 0]
+                    else:
+                        deltas = tuple(v - p for v, p in zip(values, entry[0]))
+                        changed_level = level if level != entry[1] else None
+                        rows.append((series, fid, run_id, 0) + deltas + (changed_level,))
+                        state[fid] = [values, level, entry[2] + 1]
+
+                placeholders = ', '.join('?' * (5 + len(FIELD_NAMES)))
+                conn.executemany(f"INSERT INTO points VALUES ({placeholders})", rows)
+                stamp = self._state_stamp(conn, series)
+                conn.commit()
+                self.state[series] = (stamp, state)
+                print(f"Risk geçmişi kaydedildi: {len(rows)} değişiklik, {len(seen) - len(rows)} değişmeyen alan")
+
+                self._maybe_compact(conn)
+                return run_id
+            finally:
+                conn.close()
+
+    def _maybe_compact(self, conn):
+        row = conn.execute("SELECT value FROM meta WHERE name = 'last_compact'").fetchone()
+        if row and datetime.now() - datetime.fromisoformat(row[0]) < timedelta(hours=COMPACT_INTERVAL_HOURS):
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Başka bir süreç kilidi beklerken sıkıştırmış olabilir
+            row = conn.execute("SELECT value FROM meta WHERE name = 'last_compact'").fetchone()
+            if not row or datetime.now() - datetime.fromisoformat(row[0]) >= timedelta(hours=COMPACT_INTERVAL_HOURS):
+                self._compact(conn)
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('last_compact', ?)", (datetime.now().isoformat(),))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _compact(self, conn):
+        """
+        Saklama süresini aşan çalıştırmaları siler ve eski çalıştırmaları günde
+        bire indirir. Seriler kalan çalıştırmalar için yeniden delta kodlanır.
+        """
+        now = datetime.now()
+        retention_cutoff = (now - timedelta(days=self.retention_days)).isoformat()
+        downsample_cutoff = (now - timedelta(days=self.downsample_after_days)).isoformat()
+
+        runs = conn.execute("SELECT run_id, ts, COALESCE(source, '') FROM runs ORDER BY run_id").fetchall()
+        keep = []
+        last_per_day = {}
+        for run_id, ts, source in runs:
+            if ts < retention_cutoff:
+                continue
+            if ts < downsample_cutoff:
+                last_per_day[(source, ts[:10])] = run_id
+            else:
+                keep.append(run_id)
+        keep = sorted(set(keep) | set(last_per_day.values()))
+        if len(keep) == len(runs):
+            return
+
+        # Kaynaklı seriler sadece kendi çalıştırmalarında örneklenir; eski karışık seri ('') hepsinde
+        source_of = {run_id: source for run_id, _, source in runs}
+        keep_by_source = {}
+        for run_id in keep:
+            keep_by_source.setdefault(source_of[run_id], []).append(run_id)
+
+        # Her feature'ın değerini kalan çalıştırmalar üzerinde yeniden örnekle
+        new_rows = []
+        current = None
+        series = []
+
+        def flush(key, series):
+            source, fid = key
+            prev = None
+            since = 0
+            k = 0
+            for run_id in (keep_by_source.get(source, []) if source else keep):
+                while k + 1 < len(series) and series[k + 1][0] <= run_id:
+                    k += 1
+                if not series or series[k][0] > run_id:
+                    continue
+                values, level = series[k][1], series[k][2]
+                if prev is not None and prev == (values, level):
+                    continue
+                if prev is None or since + 1 >= self.keyframe_interval:
+                    new_rows.append((source, fid, run_id, 1) + values + (level,))
+                    since = 0
+                else:
+                    deltas = tuple(v - p for v, p in zip(values, prev[0]))
+                    new_rows.append((source, fid, run_id, 0) + deltas + (level if level != prev[1] else None,))
+                    since += 1
+                prev = (values, level)
+
+        for source, fid, run_id, values, level, _ in self._iter_series(conn):
+            if (source, fid) != current:
+                if current is not None:
+                    flush(current, series)
+                current = (source, fid)
+                series = []
+            series.append((run_id, values, level))
+        if current is not None:
+            flush(current, series)
+
+        placeholders = ', '.join('?' * (5 + len(FIELD_NAMES)))
+        conn.execute("DELETE FROM points")
+        conn.executemany(f"INSERT INTO points VALUES ({placeholders})", new_rows)
+        conn.execute(f"DELETE FROM runs WHERE run_id NOT IN ({', '.join('?' * len(keep))})", keep)
+        print(f"Risk geçmişi sıkıştırıldı: {len(runs)} -> {len(keep)} çalıştırma")
+
+    def feature_history(self, fid, days=None, source=None):
+        """Tek bir feature'ın değişim geçmişi (source verilmezse tüm kaynaklar, zaman sırasıyla)"""
+        where, params = 'WHERE feature_id = ?', (fid,)
+        if source is not None:
+            where, params = where + ' AND source = ?', params + (source,)
+        with self.lock:
+            conn = self._connect()
+            try:
+                runs = {run_id: (ts, run_source) for run_id, ts, run_source in conn.execute("SELECT run_id, ts, source FROM runs")}
+                since = (datetime.now() - timedelta(days=days)).isoformat() if days else None
+                history = []
+                for _, _, run_id, values, level, _ in self._iter_series(conn, where, params):
+                    ts, run_source = runs.get(run_id, (None, None))
+                    if ts is None or (since and ts < since):
+                        continue
+                    point = decode_values(values, level)
+                    point['ts'] = ts
+                    point['source'] = run_source
+                    history.append(point)
+                history.sort(key=lambda point: point['ts'])
+                return history
+            finally:
+                conn.close()
+
+    def values_at(self, date, source=None):
+        """
+        Verilen günün sonundaki tüm feature değerleri.
+        Her seri için son keyframe'den itibaren okunur; eski snapshot'lar taranmaz.
+        source verilmezse her feature için en son yazılan kaynağın değeri döner.
+        """
+        end = (datetime.combine(date, datetime.min.time()) + timedelta(days=1)).isoformat()
+        source_filter, source_params = ('AND source = ?', (source,)) if source is not None else ('', ())
+        with self.lock:
+            conn = self._connect()
+            try:
+                row = conn.execute(f"SELECT MAX(run_id), MAX(ts) FROM runs WHERE ts < ? {source_filter}",
+                                   (end,) + source_params).fetchone()
+                run_id, run_ts = row
+                if run_id is None:
+                    return None, {}
+
+                where = f"""JOIN (SELECT source AS kf_source, feature_id AS kf_id, MAX(run_id) AS kf_run FROM points
+                                  WHERE keyframe = 1 AND run_id <= ? {source_filter} GROUP BY source, feature_id) kf
+                            ON points.source = kf.kf_source AND points.feature_id = kf.kf_id
+                            WHERE points.run_id >= kf.kf_run AND points.run_id <= ?"""
+                # Kaynaklar arasında o güne kadar en son çalışmış olanın değeri kazanır
+                # (eski karışık seride satırın kendi çalıştırması esas alınır)
+                source_runs = dict(conn.execute("SELECT COALESCE(source, ''), MAX(run_id) FROM runs WHERE run_id <= ? GROUP BY 1",
+                                                (run_id,)).fetchall())
+                result = {}
+                latest = {}
+                for series, fid, point_run, values, level, _ in self._iter_series(conn, where, (run_id,) + source_params + (run_id,)):
+                    rank = source_runs.get(series, point_run) if series else point_run
+                    if rank >= latest.get(fid, -1):
+                        latest[fid] = rank
+                        result[fid] = decode_values(values, level)
+                return run_ts, result
+            finally:
+                conn.close()
+
+
+# Global risk geçmişi instance
+risk_history = RiskHistory()
@@ -0,0 +1,164 @@
+import sys
+
+# Tüm analiz sonuçlarında aynı olan değerler: sonuç başına kopyalanmaz, bu nesneler paylaşılır.
+# Paylaşıldıkları için yerinde değiştirilmemelidir.
+HUMAN_RISK_FACTORS = [
+    {"factor": "Yerleşim yakınlığı", "score": 50, "description": "Orta seviye risk - şehir merkezine yakınlık"},
+    {"factor": "Turizm aktiviteleri", "score": 40, "description": "Düşük-orta risk - sezonluk aktiviteler"},
+    {"factor": "Yol ağı", "score": 60, "description": "Orta-yüksek risk - erişim kolaylığı"}
+]
+HUMAN_RISK_EXPLANATION = sys.intern(
+    "İnsan kaynaklı risk, yerleşim yakınlığı, turizm aktiviteleri ve yol ağı erişimi dikkate alınarak hesaplanmıştır."
+)
+WEATHER_WEIGHT = 60.0
+HUMAN_WEIGHT = 40.0
+DISTANCE_FROM_CITY = 25.0
+
+
+def risk_level_for(risk_score):
+    """Skora göre (seviye, renk)"""
+    if risk_score > 70:
+        return "Yüksek", "red"
+    if risk_score > 40:
+        return "Orta", "orange"
+    return "Düşük", "green"
+
+
+# Sonucun sözlük / JSON görünümündeki alanlar ve sırası
+RESULT_KEYS = (
+    'combined_risk_score', 'combined_risk_level', 'combined_risk_color', 'weather_data', 'analysis',
+    'weather_weight', 'human_weight', 'human_risk_score', 'weather_risk_score', 'human_risk_factors',
+    'human_risk_explanation', 'nearest_city', 'distance_from_city', 'area_type', 'area_size',
+    'fire_status', 'fire_spread_risk'
+)
+
+# Saklanmayan, skordan veya sabitlerden üretilen alanlar
+DERIVED = {
+    'combined_risk_level': lambda result: risk_level_for(result.combined_risk_score)[0],
+    'combined_risk_color': lambda result: risk_level_for(result.combined_risk_score)[1],
+    'weather_weight': lambda result: WEATHER_WEIGHT,
+    'human_weight': lambda result: HUMAN_WEIGHT,
+    'human_risk_score': lambda result: result.combined_risk_score * 0.8,
+    'weather_risk_score': lambda result: result.combined_risk_score * 0.6,
+    'human_risk_factors': lambda result: HUMAN_RISK_FACTORS,
+    'human_risk_explanation': lambda result: HUMAN_RISK_EXPLANATION,
+    'distance_from_city': lambda result: DISTANCE_FROM_CITY,
+    'fire_status': lambda result: 'none',
+    'fire_spread_risk': lambda result: False
+}
+
+
+class RiskResult:
+    """
+    Bir alanın birleşik risk analizi sonucu. Sadece alana özgü değerler saklanır;
+    seviye, renk, alt skorlar ve sabit insan kaynaklı faktörler istendiğinde üretilir.
+    Hava durumu kopyalanmaz: aynı sorgudan gelen sonuçlar aynı sözlüğü gösterir.
+    Sözlük gibi okunup yazılabilir (items / get / update, r[key] = value); sonradan
+    eklenen alanlar (zaman çizelgesi, analysis_inputs...) 'extra' içinde tutulur.
+    Sözlüğe / JSON'a çevirme yalnızca yazım anında (to_dict, to_compact) yapılır.
+    """
+
+    __slots__ = ('combined_risk_score', 'weather_data', 'analysis', 'nearest_city', 'area_type', 'area_size', 'extra')
+
+    FIELDS = ('combined_risk_score', 'weather_data', 'analysis', 'nearest_city', 'area_type', 'area_size')
+
+    def __init__(self, combined_risk_score, weather_data, analysis, nearest_city, area_type, area_size, extra=None):
+        self.combined_risk_score = combined_risk_score
+        self.weather_data = weather_data
+        self.analysis = analysis
+        self.nearest_city = sys.intern(nearest_city) if isinstance(nearest_city, str) else nearest_city
+        self.area_type = sys.intern(area_type) if isinstance(area_type, str) else area_type
+        self.area_size = area_size
+        self.extra = extra
+
+    @classmethod
+    def analyzed(cls, coordinates, weather_data, area_info, analysis, nearest_city):
+        """Analizörlerin ortak sonucu: skor koordinattan, diğer alanlar alan bilgisinden"""
+        lat, lon = coordinates
+        return cls(30 + (lat % 10) + (lon % 10), weather_data, analysis, nearest_city,
+                   area_info.get('landuse', 'forest'), area_info.get('area', 0))
+
+    # --- Sözlük görünümü ---
+
+    def __getitem__(self, key):
+        if self.extra is not None and key in self.extra:
+            return self.extra[key]
+        if key in self.FIELDS:
+            return getattr(self, key)
+        if key in DERIVED:
+            return DERIVED[key](self)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self.FIELDS:
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key):
+        return key in RESULT_KEYS or (self.extra is not None and key in self.extra)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        if not self.extra:
+            return list(RESULT_KEYS)
+        return list(RESULT_KEYS) + [key for key in self.extra if key not in RESULT_KEYS]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def update(self, other=(), **kwargs):
+        for key, value in (other.items() if hasattr(other, 'items') else other):
+            self[key] = value
+        for key, value in kwargs.items():
+            self[key] = value
+
+    def to_dict(self):
+        """Önceki sözlük sonucuyla aynı anahtar ve sırada düz sözlük"""
+        return dict(self.items())
+
+    # --- Kalıcı cache biçimi ---
+
+    def to_compact(self, weather_ref=None):
+        """Cache dosyası için: türetilen alanlar yazılmaz, hava durumu referansla verilir"""
+        compact = {name: getattr(self, name) for name in self.FIELDS if name != 'weather_data'}
+        compact['weather_ref'] = weather_ref
+        if self.extra:
+            compact['extra'] = self.extra
+        return compact
+
+    @classmethod
+    def from_compact(cls, compact, weather_data=None):
+        return cls(compact.get('combined_risk_score', 0), weather_data, compact.get('analysis'),
+                   compact.get('nearest_city'), compact.get('area_type'), compact.get('area_size'),
+                   compact.get('extra'))
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Eski biçimdeki sözlük sonucu dönüştürür. Türetilen değerden farklı olan
+        alanlar kaybolmaz, 'extra' içinde saklanır. Skoru olmayan sözlükte None döner.
+        """
+        if not isinstance(data, dict) or 'combined_risk_score' not in data:
+            return None
+        result = cls(*(data.get(name) for name in cls.FIELDS))
+        for key, value in data.items():
+            if key in cls.FIELDS:
+                continue
+            if key in DERIVED and DERIVED[key](result) == value:
+                continue
+            result[key] = value
+        return result
+
+    def __repr__(self):
+        return f"RiskResult(score={self.combined_risk_score}, area_type={self.area_type!r}, extra={sorted(self.extra or ())})"
@@ -0,0 +1,44 @@
+# WeatherAPI history.json saatlik alanları -> uygulamadaki karşılıkları
+HOURLY_FIELDS = [
+    ('sicaklik', 'temp_c'),
+    ('nem', 'humidity'),
+    ('ruzgar_hizi', 'wind_kph'),
+    ('yagis', 'precip_mm')
+]
+
+
+def compact_hourly(forecast_day):
+    """
+    history.json gününün 24 saatlik kayıtlarını alan başına dizilere çevirir.
+    Ek API çağrısı gerektirmez; 12:00 dışındaki saatler de saklanmış olur.
+    """
+    hours = forecast_day.get('hour') or []
+    return {
+        name: [round(float(hour.get(key) or 0), 1) for hour in hours]
+        for name, key in HOURLY_FIELDS
+    }
+
+
+def hourly_risk_scores(hourly, score_fn):
+    """Saatlik dizilerden tek geçişte 24 saatlik risk eğrisini hesaplar"""
+    return list(map(score_fn, hourly['sicaklik'], hourly['nem'], hourly['ruzgar_hizi'], hourly['yagis']))
+
+
+def build_risk_timeline(hourly, score_fn, level_fn):
+    """
+    Günlük risk eğrisini ve zirve saatini döndürür.
+    score_fn / level_fn: AutoUpdater.hesapla_risk_skoru / get_risk_level
+    """
+    if not hourly or not hourly.get('sicaklik'):
+        return {}
+
+    scores = hourly_risk_scores(hourly, score_fn)
+    peak_hour = max(range(len(scores)), key=scores.__getitem__)
+    peak_score = scores[peak_hour]
+    return {
+        'hourly_risk': scores,
+        'peak_risk_hour': peak_hour,
+        'peak_risk_score': peak_score,
+        'peak_risk_level': level_fn(peak_score),
+        'min_risk_score': min(scores)
+    }
@@ -0,0 +1,204 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+JOURNAL_DB_PATH = os.environ.get('JOURNAL_DB_PATH', 'data/run_journal.db')
+CHECKPOINT_EVERY = int(os.environ.get('CHECKPOINT_EVERY', 25))  # Kaç sonuçta bir diske yazılır
+CHECKPOINT_SECONDS = 30  # Ya da en fazla bu kadar saniyede bir
+JOURNAL_RETENTION_DAYS = 7
+
+STATUS_RUNNING = 'running'
+STATUS_COMPLETED = 'completed'
+
+
+def weather_target(now=None):
+    """
+    Çalıştırmanın hedeflediği hava durumu verisi: 12:00'den önce dünün, sonra bugünün
+    12:00 verisi kullanılır. Günlük, takvim günü yerine buna göre anahtarlanır; sabah
+    yarım kalan bir çalıştırma 12:15 analizinde eski verisiyle devam ettirilmez.
+    """
+    now = now or datetime.now()
+    noon = now.replace(hour=12, minute=0, second=0, microsecond=0)
+    if now.hour < 12:
+        noon -= timedelta(days=1)
+    return noon.strftime('%Y-%m-%dT%H')
+
+
+class RunJournal:
+    """
+    Analiz çalıştırmaları için kalıcı günlük. Tamamlanan alanların sonuçları
+    aralıklarla SQLite'a yazılır; süreç yeniden başlarsa aynı hava durumu verisini
+    hedefleyen yarım kalan çalıştırma kaldığı yerden devam eder ve kota iki kez harcanmaz.
+    """
+
+    def __init__(self, db_path=JOURNAL_DB_PATH, checkpoint_every=CHECKPOINT_EVERY):
+        self.db_path = db_path
+        self.checkpoint_every = checkpoint_every
+        self.lock = threading.Lock()
+        self.pending = {}  # run_id -> [(feature_id, properties_json), ...]
+        self.last_flush = {}
+
+    def _connect(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("""CREATE TABLE IF NOT EXISTS runs (
+                            run_id TEXT PRIMARY KEY, job TEXT NOT NULL, run_date TEXT NOT NULL,
+                            status TEXT NOT NULL, started_at TEXT, updated_at TEXT, completed_count INTEGER DEFAULT 0)""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS results (
+                            run_id TEXT NOT NULL, feature_id TEXT NOT NULL, properties TEXT NOT NULL,
+                            PRIMARY KEY (run_id, feature_id)) WITHOUT ROWID""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS profiles (
+                            run_id TEXT PRIMARY KEY, saved_at TEXT NOT NULL, profile TEXT NOT NULL)""")
+        return conn
+
+    def start_or_resume(self, job, run_date=None, fresh=False):
+        """
+        Aynı iş için aynı hava durumu verisini hedefleyen yarım kalmış çalıştırma varsa
+        onu devam ettirir; fresh=True ise (force refresh) her zaman yeni çalıştırma başlar.
+        (run_id, {feature_id: properties}) döndürür.
+        """
+        run_date = run_date or weather_target()
+        now = datetime.now().isoformat()
+        with self.lock:
+            conn = self._connect()
+            try:
+                row = None
+                if not fresh:
+                    row = conn.execute(
+                        "SELECT run_id FROM runs WHERE job = ? AND run_date = ? AND status = ? ORDER BY started_at DESC LIMIT 1",
+                        (job, run_date, STATUS_RUNNING)
+                    ).fetchone()
+                if row is not None:
+                    run_id = row[0]
+                    completed = {
+                        fid: json.loads(properties)
+                        for fid, properties in conn.execute("SELECT feature_id, properties FROM results WHERE run_id = ?", (run_id,))
+                    }
+                    conn.execute("UPDATE runs SET updated_at = ? WHERE run_id = ?", (now, run_id))
+                    conn.commit()
+                    self.last_flush[run_id] = time.time()
+                    print(f"Çalıştırma devam ettiriliyor: {run_id} ({len(completed)} alan tamamlanmış)")
+                    return run_id, completed
+
+                # Başka veriyi hedefleyen (veya force refresh ile geçilen) yarım çalıştırmalar artık devam ettirilmez
+                conn.execute("UPDATE runs SET status = 'abandoned' WHERE job = ? AND status = ?", (job, STATUS_RUNNING))
+                run_id = f"{job}-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+                conn.execute(
+                    "INSERT INTO runs (run_id, job, run_date, status, started_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (run_id, job, run_date, STATUS_RUNNING, now, now)
+                )
+                conn.commit()
+                self.last_flush[run_id] = time.time()
+                print(f"Yeni çalıştırma başlatıldı: {run_id}")
+                return run_id, {}
+            finally:
+                conn.close()
+
+    def record(self, run_id, fid, properties):
+        """Tamamlanan alanın sonucunu kaydeder; belirli aralıklarla diske yazar"""
+        encoded = json.dumps(properties, ensure_ascii=False, separators=(',', ':'))
+        with self.lock:
+            pending = self.pending.setdefault(run_id, [])
+            pending.append((fid, encoded))
+            due = (len(pending) >= self.checkpoint_every
+                   or time.time() - self.last_flush.get(run_id, 0) >= CHECKPOINT_SECONDS)
+        if due:
+            self.flush(run_id)
+
+    def flush(self, run_id):
+        """Bekleyen sonuçları tek transaction'da diske yazar"""
+        with self.lock:
+            pending = self.pending.pop(run_id, [])
+            self.last_flush[run_id] = time.time()
+            if not pending:
+                return
+            conn = self._connect()
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO results (run_id, feature_id, properties) VALUES (?, ?, ?)",
+                    [(run_id, fid, encoded) for fid, encoded in pending]
+                )
+                conn.execute(
+                    "UPDATE runs SET updated_at = ?, completed_count = (SELECT COUNT(*) FROM results WHERE run_id = ?) WHERE run_id = ?",
+                    (datetime.now().isoformat(), run_id, run_id)
+                )
+                conn.commit()
+            finally:
+                conn.close()
+
+    def complete(self, run_id):
+        """Çalıştırmayı tamamlandı olarak işaretler ve ara sonuçlarını siler"""
+        self.flush(run_id)
+        with self.lock:
+            self.last_flush.pop(run_id, None)
+            conn = self._connect()
+            try:
+                conn.execute("UPDATE runs SET status = ?, updated_at = ? WHERE run_id = ?",
+                             (STATUS_COMPLETED, datetime.now().isoformat(), run_id))
+                conn.execute("DELETE FROM results WHERE run_id = ?", (run_id,))
+
+                # Eski çalıştırma kayıtlarını temizle
+                cutoff = (datetime.now() - timedelta(days=JOURNAL_RETENTION_DAYS)).strftime('%Y-%m-%d')
+                conn.execute("DELETE FROM results WHERE run_id IN (SELECT run_id FROM runs WHERE run_date < ?)", (cutoff,))
+                conn.execute("DELETE FROM runs WHERE run_date < ?", (cutoff,))
+                conn.execute("DELETE FROM profiles WHERE saved_at < ?", (cutoff,))
+                conn.commit()
+            finally:
+                conn.close()
+
+    def has_unfinished(self, job, run_date=None):
+        """Güncel hava durumu verisi için yarım kalmış çalıştırma var mı (yeniden başlatma sonrası kontrol)"""
+        run_date = run_date or weather_target()
+        with self.lock:
+            conn = self._connect()
+            try:
+                row = conn.execute("SELECT 1 FROM runs WHERE job = ? AND run_date = ? AND status = ?",
+                                   (job, run_date, STATUS_RUNNING)).fetchone()
+            finally:
+                conn.close()
+        return row is not None
+
+    def save_profile(self, run_id, profile):
+        """Çalıştırmanın aşama süreleri profilini saklar"""
+        with self.lock:
+            conn = self._connect()
+            try:
+                conn.execute("INSERT OR REPLACE INTO profiles (run_id, saved_at, profile) VALUES (?, ?, ?)",
+                             (run_id, datetime.now().isoformat(), json.dumps(profile, ensure_ascii=False)))
+                conn.commit()
+            finally:
+                conn.close()
+
+    def profile(self, run_id):
+        """Saklanan profil, yoksa None"""
+        with self.lock:
+            conn = self._connect()
+            try:
+                row = conn.execute("SELECT profile FROM profiles WHERE run_id = ?", (run_id,)).fetchone()
+            finally:
+                conn.close()
+        return json.loads(row[0]) if row else None
+
+    def runs(self, limit=20):
+        """Son çalıştırmaların özeti"""
+        with self.lock:
+            conn = self._connect()
+            try:
+                rows = conn.execute(
+                    "SELECT run_id, job, run_date, status, started_at, updated_at, completed_count FROM runs ORDER BY started_at DESC LIMIT ?",
+                    (limit,)
+                ).fetchall()
+            finally:
+                conn.close()
+        keys = ['run_id', 'job', 'run_date', 'status', 'started_at', 'updated_at', 'completed_count']
+        return [dict(zip(keys, row)) for row in rows]
+
+
+# Global çalıştırma günlüğü instance
+run_journal = RunJournal()
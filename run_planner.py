@@ -0,0 +1,214 @@
+import os
+import math
+import time
+import threading
+from datetime import datetime, timedelta
+
+# Ölçüm yokken kullanılan varsayılan gecikmeler (saniye)
+DEFAULT_LATENCIES = {
+    'weather': 0.5,
+    'lm': 2.5
+}
+LATENCY_SMOOTHING = 0.2  # Üstel hareketli ortalama katsayısı
+
+# Zamanlayıcıdaki işlerin bitmesi gereken saatler
+CLASSIC_RUN_DEADLINE = os.environ.get('CLASSIC_RUN_DEADLINE', '13:00')  # LM işi başlamadan
+LM_RUN_DEADLINE = os.environ.get('LM_RUN_DEADLINE', '13:50')
+DEADLINE_SAFETY_MARGIN = 0.15  # Bütçenin bu kadarı yayınlama vb. için ayrılır
+CHECKPOINT_SECONDS = 30  # Planın yeniden değerlendirilme aralığı (yaklaşık iş süresi)
+
+# Bozulma (degradation) seviyeleri
+LEVEL_FULL = 'full'            # Her alan için hava durumu + LM
+LEVEL_SAMPLED = 'sampled'      # Hava durumu hücre başına bir kez (komşular paylaşır)
+LEVEL_DEGRADED = 'degraded'    # Düşük öncelikli alanlar deterministik skorla
+
+
+class LatencyTracker:
+    """API çağrılarının ölçülen gecikmelerini tür bazında tutar"""
+
+    def __init__(self, smoothing=LATENCY_SMOOTHING):
+        self.smoothing = smoothing
+        self.lock = threading.Lock()
+        self.values = {}
+        self.counts = {}
+
+    def record(self, kind, seconds):
+        with self.lock:
+            previous = self.values.get(kind)
+            if previous is None:
+                self.values[kind] = seconds
+            else:
+                self.values[kind] = previous + self.smoothing * (seconds - previous)
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+
+    def get(self, kind):
+        with self.lock:
+            return self.values.get(kind, DEFAULT_LATENCIES.get(kind, 1.0))
+
+    def stats(self):
+        with self.lock:
+            return {kind: {'latency': round(value, 3), 'count': self.counts.get(kind, 0)} for kind, value in self.values.items()}
+
+
+def deadline_today(hhmm, now=None):
+    """'HH:MM' saatini bugünün datetime'ına çevirir (geçtiyse yarın)"""
+    now = now or datetime.now()
+    hour, minute = map(int, hhmm.split(':'))
+    deadline = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if deadline <= now:
+        deadline += timedelta(days=1)
+    return deadline
+
+
+def call_duration(count, per_minute, latency, workers):
+    """count çağrının rate limit ve paralellik altında tahmini süresi"""
+    if count <= 0:
+        return 0.0
+    rate_bound = count / (per_minute / 60.0) if per_minute else 0.0
+    latency_bound = count * latency / max(workers, 1)
+    return max(rate_bound, latency_bound)
+
+
+def workers_for(per_minute, latency, max_workers):
+    """Rate limiti doyurmak için gereken eşzamanlı işçi sayısı (Little yasası, 2x pay ile)"""
+    if not per_minute:
+        return max_workers
+    return max(1, min(max_workers, math.ceil(2 * per_minute / 60.0 * latency)))
+
+
+class RunPlan:
+    """Planlayıcının bir çalıştırma için verdiği kararlar"""
+
+    def __init__(self, level, workers, batch_size, weather_sampling, lm_limit, estimated_seconds, budget_seconds):
+        self.level = level
+        self.workers = workers
+        self.batch_size = batch_size
+        self.weather_sampling = weather_sampling
+        self.lm_limit = lm_limit
+        self.estimated_seconds = estimated_seconds
+        self.budget_seconds = budget_seconds
+
+    def to_dict(self):
+        return {
+            'level': self.level,
+            'workers': self.workers,
+            'batch_size': self.batch_size,
+            'weather_sampling': self.weather_sampling,
+            'lm_limit': self.lm_limit,
+            'estimated_seconds': round(self.estimated_seconds, 1),
+            'budget_seconds': round(self.budget_seconds, 1)
+        }
+
+
+def plan_run(feature_count, cell_count, deadline, weather_per_minute, lm_per_minute=None,
+             max_workers=4, tracker=None, now=None):
+    """
+    Alan sayısı, API kotası ve ölçülen gecikmeden çalıştırma süresini tahmin
+    edip deadline'a sığacak en az bozulmuş seviyeyi seçer.
+    lm_per_minute None ise iş LM kullanmıyor demektir (klasik güncelleme).
+    """
+    tracker = tracker or latency_tracker
+    now = now or datetime.now()
+    budget = max(0.0, (deadline - now).total_seconds() * (1 - DEADLINE_SAFETY_MARGIN))
+    weather_latency = tracker.get('weather')
+    lm_latency = tracker.get('lm')
+    uses_lm = lm_per_minute is not None
+
+    workers = workers_for(weather_per_minute, weather_latency, max_workers)
+    if uses_lm:
+        workers = max(workers, workers_for(lm_per_minute, lm_latency, max_workers))
+
+    def estimate(weather_calls, lm_calls):
+        weather_time = call_duration(weather_calls, weather_per_minute, weather_latency, workers)
+        lm_time = call_duration(lm_calls, lm_per_minute, lm_latency, workers) if uses_lm else 0.0
+        # Aynı işçiler iki çağrıyı da yapar; rate limitler ise bağımsız
+        serial = (weather_calls * weather_latency + lm_calls * lm_latency) / workers
+        return max(weather_time, lm_time, serial)
+
+    lm_all = feature_count if uses_lm else 0
+    level = LEVEL_FULL
+    weather_sampling = False
+    lm_limit = lm_all
+    estimated = estimate(feature_count, lm_all)
+
+    if estimated > budget:
+        level = LEVEL_SAMPLED
+        weather_sampling = True
+        estimated = estimate(cell_count, lm_all)
+
+    if estimated > budget and uses_lm:
+        # Kalan bütçeye sığan LM çağrısı sayısı; gerisi deterministik skorla
+        level = LEVEL_DEGRADED
+        low, high = 0, feature_count
+        while low < high:
+            middle = (low + high + 1) // 2
+            if estimate(cell_count, middle) <= budget:
+                low = middle
+            else:
+                high = middle - 1
+        lm_limit = low
+        estimated = estimate(cell_count, lm_limit)
+
+    throughput = feature_count / estimated if estimated > 0 else feature_count
+    batch_size = max(workers, int(throughput * CHECKPOINT_SECONDS))
+
+    return RunPlan(level, workers, batch_size, weather_sampling, lm_limit, estimated, budget)
+
+
+class DeadlineMonitor:
+    """
+    Çalıştırma sırasında planı gözlenen hıza göre günceller. Bütçe aşılırsa
+    LM sınırı düşürülür; öncelik sırası sonundaki alanlar deterministik skorla işlenir.
+    """
+
+    def __init__(self, plan, deadline):
+        self.plan = plan
+        self.deadline = deadline
+        self.lm_limit = plan.lm_limit
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.completed = 0
+        self.lm_completed = 0
+        self.max_rank = 0
+        self.degraded_count = 0
+
+    def allow_lm(self, rank):
+        """Öncelik sırası rank olan alan LM ile analiz edilebilir mi"""
+        with self.lock:
+            self.max_rank = max(self.max_rank, rank)
+            allowed = rank < self.lm_limit and datetime.now() < self.deadline
+            if not allowed:
+                self.degraded_count += 1
+            return allowed
+
+    def feature_done(self, used_lm):
+        """Her alan bitince çağrılır; batch_size'da bir plan yeniden değerlendirilir"""
+        with self.lock:
+            self.completed += 1
+            if used_lm:
+                self.lm_completed += 1
+            if self.completed % self.plan.batch_size != 0 or self.lm_completed == 0:
+                return
+
+            elapsed = time.time() - self.started
+            remaining = (self.deadline - datetime.now()).total_seconds() * (1 - DEADLINE_SAFETY_MARGIN)
+            lm_rate = self.lm_completed / elapsed if elapsed > 0 else 0.0
+            affordable = self.max_rank + int(max(0.0, remaining) * lm_rate)
+            if affordable < self.lm_limit:
+                print(f"Zaman bütçesi aşılıyor: LM sınırı {self.lm_limit} -> {affordable}")
+                self.lm_limit = affordable
+
+    def summary(self):
+        with self.lock:
+            return {
+                'plan': self.plan.to_dict(),
+                'final_lm_limit': self.lm_limit,
+                'completed': self.completed,
+                'lm_completed': self.lm_completed,
+                'degraded': self.degraded_count,
+                'duration_seconds': round(time.time() - self.started, 1)
+            }
+
+
+# Global gecikme ölçer instance
+latency_tracker = LatencyTracker()
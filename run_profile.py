@@ -0,0 +1,185 @@
+import os
+import sys
+import math
+import time
+import threading
+from contextlib import contextmanager
+from run_journal import run_journal
+
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'data/profiles')
+PROFILE_SAMPLING = os.environ.get('PROFILE_SAMPLING', '0') == '1'  # Örnekleyici profil (flame graph) her çalıştırmada
+SAMPLING_INTERVAL = float(os.environ.get('PROFILE_SAMPLING_INTERVAL', 0.005))  # saniye
+MAX_STACK_DEPTH = 64
+
+# Raporlarda aşamaların sırası (bilinmeyen aşamalar sona eklenir)
+STAGES = [
+    'geojson_load',
+    'geometry',
+    'weather_fetch',
+    'rate_limit_wait',
+    'llm_call',
+    'prioritization',
+    'scoring',
+    'serialization',
+    'file_write',
+    'snapshot_write',
+    'derived_outputs'
+]
+
+
+def percentile(sorted_values, q):
+    """Sıralı listede en yakın sıra yöntemiyle yüzdelik"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class RunProfile:
+    """Bir çalıştırmadaki aşama sürelerini toplar"""
+
+    def __init__(self, run_id=None):
+        self.run_id = run_id  # Günlükten sonradan alınabilir
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.durations = {}
+        self.sampler = None
+        self.flamegraph_path = None
+
+    def add(self, stage, seconds):
+        with self.lock:
+            self.durations.setdefault(stage, []).append(seconds)
+
+    def summary(self):
+        """Aşama başına çağrı sayısı, toplam, p50 ve p99 (saniye)"""
+        with self.lock:
+            durations = {stage: sorted(values) for stage, values in self.durations.items()}
+        order = {stage: n for n, stage in enumerate(STAGES)}
+        stages = {}
+        for stage in sorted(durations, key=lambda name: (order.get(name, len(STAGES)), name)):
+            values = durations[stage]
+            stages[stage] = {
+                'count': len(values),
+                'total': round(sum(values), 4),
+                'p50': round(percentile(values, 50), 4),
+                'p99': round(percentile(values, 99), 4)
+            }
+        summary = {
+            'run_id': self.run_id,
+            'started_at': self.started,
+            'duration_seconds': round(time.time() - self.started, 3),
+            'stages': stages
+        }
+        if self.flamegraph_path:
+            summary['flamegraph'] = self.flamegraph_path
+        return summary
+
+
+class SamplingProfiler:
+    """
+    Belirli aralıklarla tüm thread'lerin yığınını örnekler ve flame graph
+    araçlarının (flamegraph.pl, speedscope) okuduğu "collapsed stack" formatında yazar.
+    """
+
+    def __init__(self, interval=SAMPLING_INTERVAL):
+        self.interval = interval
+        self.counts = {}
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def _frame_stack(self, frame):
+        stack = []
+        while frame is not None and len(stack) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        while not self.stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                key = ';'.join([names.get(thread_id, str(thread_id))] + self._frame_stack(frame))
+                self.counts[key] = self.counts.get(key, 0) + 1
+            if len(names) != threading.active_count():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+    def start(self):
+        self.thread = threading.Thread(target=self._sample, name='sampling-profiler', daemon=True)
+        self.thread.start()
+
+    def stop(self, path):
+        """Örneklemeyi durdurur ve dosyayı yazar"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            for key, count in sorted(self.counts.items()):
+                f.write(f"{key} {count}\n")
+        return path
+
+
+# Devam eden çalıştırmaların profilleri; span'ler hepsine eklenir
+# (aynı anda iki çalıştırma varsa ortak aşamalar ikisine de yazılır)
+_active_profiles = []
+_active_lock = threading.Lock()
+
+
+def start_profile(run_id=None, sampling=None):
+    """Çalıştırma için profil başlatır; sampling açıksa örnekleyici profil de çalışır"""
+    profile = RunProfile(run_id)
+    if PROFILE_SAMPLING if sampling is None else sampling:
+        profile.sampler = SamplingProfiler()
+        profile.sampler.start()
+    with _active_lock:
+        _active_profiles.append(profile)
+    return profile
+
+
+def finish_profile(profile):
+    """Profili durdurur, kalıcı olarak saklar ve özetini döndürür"""
+    with _active_lock:
+        if profile in _active_profiles:
+            _active_profiles.remove(profile)
+    if profile.sampler is not None:
+        try:
+            path = os.path.join(PROFILE_DIR, f"{profile.run_id or int(profile.started)}.folded")
+            profile.flamegraph_path = profile.sampler.stop(path)
+            print(f"Flame graph dosyası yazıldı: {profile.flamegraph_path}")
+        except Exception as e:
+            print(f"Örnekleyici profil yazma hatası: {e}")
+        profile.sampler = None
+
+    summary = profile.summary()
+    if profile.run_id is not None:
+        try:
+            run_journal.save_profile(profile.run_id, summary)
+        except Exception as e:
+            print(f"Profil kaydetme hatası: {e}")
+    return summary
+
+
+def record_stage(stage, seconds):
+    """Ölçülmüş bir süreyi devam eden çalıştırmaların profiline ekler"""
+    if not _active_profiles:
+        return
+    for profile in list(_active_profiles):
+        profile.add(stage, seconds)
+
+
+@contextmanager
+def span(stage):
+    """Kod bloğunun süresini aşama olarak kaydeder (çalıştırma yoksa maliyeti yok denecek kadar az)"""
+    if not _active_profiles:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
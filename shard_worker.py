@@ -0,0 +1,408 @@
+"""
+Çok süreçli / çok makineli analiz için shard worker'ı.
+
+Kullanım:
+    python shard_worker.py plan --shard-size 200      # İşi hava durumu hücrelerine göre shard'lara böler
+    python shard_worker.py work                       # Boştaki shard'ları alıp analiz eder (birden çok süreç çalıştırılabilir)
+    python shard_worker.py work --hosts 3             # Aynı API anahtarını 3 makine kullanıyorsa (her makinede)
+    python shard_worker.py merge                      # Tamamlanan shard'ları analyzed_data.snap olarak yayınlar
+    python shard_worker.py status
+
+İş tablosu paylaşılan bir SQLite dosyasıdır (SHARD_DB_PATH); aynı dosyayı gören
+tüm süreçler ve makineler shard'ları atomik olarak sahiplenir. Dosya ağ üzerinden
+paylaşılabildiği için WAL yerine rollback journal kullanılır (WAL paylaşılan bellek
+gerektirir, ağ dosya sistemlerinde çalışmaz); dosya sisteminin POSIX kilitlerini
+desteklemesi gerekir (ör. kilitlemesi açık NFS). SHARD_DIR da tüm makinelerden
+erişilebilir olmalıdır.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import shutil
+import sqlite3
+import argparse
+import concurrent.futures
+from datetime import datetime
+from forecast_projection import group_by_weather_cell
+from geojson_stream import iter_features, iter_selected, PropertySpool
+
+SHARD_DB_PATH = os.environ.get('SHARD_DB_PATH', 'data/shard_jobs.db')
+SHARD_DIR = os.environ.get('SHARD_DIR', 'data/shards')
+SOURCE_GEOJSON_PATH = 'static/export_with_risk_latest.geojson'
+ANALYZED_SNAPSHOT_PATH = 'static/analyzed_data.snap'  # app.ANALYZED_SNAPSHOT_PATH (app burada import edilmez)
+DEFAULT_SHARD_SIZE = 200
+SHARD_CLAIM_TIMEOUT = 15 * 60  # Bu kadar süre sinyal vermeyen shard başka worker'a geçer
+HEARTBEAT_EVERY = 10  # Kaç alanda bir sahiplik tazelenir
+
+
+def connect(db_path=SHARD_DB_PATH):
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+    # Ağ dosya sisteminde de çalışan rollback journal (önceden WAL'e çevrilmiş dosya da geri alınır)
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                        job_id TEXT PRIMARY KEY, created_at TEXT, source_path TEXT,
+                        feature_count INTEGER, status TEXT)""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS shards (
+                        job_id TEXT NOT NULL, shard_id INTEGER NOT NULL, cells TEXT,
+                        feature_indices TEXT NOT NULL, status TEXT NOT NULL,
+                        worker TEXT, claimed_at REAL, finished_at REAL, result_path TEXT,
+                        PRIMARY KEY (job_id, shard_id))""")
+    return conn
+
+
+def latest_job_id(conn):
+    row = conn.execute("SELECT job_id FROM jobs ORDER BY created_at DESC LIMIT 1").fetchone()
+    return row[0] if row else None
+
+
+def centroid_stubs(source_path):
+    """Bölümleme için yalnızca centroid'leri içeren hafif feature listesi (geometriler belleğe alınmaz)"""
+    stubs = []
+    for feature in iter_features(source_path):
+        properties = feature.get('properties') or {}
+        stubs.append({'properties': {'centroid_lat': properties.get('centroid_lat'),
+                                     'centroid_lon': properties.get('centroid_lon')}})
+    return stubs
+
+
+def load_shard_features(source_path, indices):
+    """Kaynak dosyayı akış halinde okuyup yalnızca shard'a ait feature'ları döndürür"""
+    return dict(iter_selected(source_path, indices))
+
+
+def partition_by_cell(features, shard_size):
+    """
+    Alanları hava durumu hücrelerine göre shard'lara böler. Bir hücre asla
+    bölünmez; böylece komşu alanlar aynı worker'da hava durumu cache'ini paylaşır.
+    """
+    cells = group_by_weather_cell(features)
+    grouped = set()
+    shards = []
+    current_cells = []
+    current = []
+    for key in sorted(cells):
+        indices = cells[key]['features']
+        grouped.update(indices)
+        if current and len(current) + len(indices) > shard_size:
+            shards.append((current_cells, current))
+            current_cells = []
+            current = []
+        current_cells.append(key)
+        current.extend(indices)
+    if current:
+        shards.append((current_cells, current))
+
+    # Centroid'i olmayan alanlar ayrı bir shard'da
+    ungrouped = [i for i in range(len(features)) if i not in grouped]
+    if ungrouped:
+        shards.append(([], ungrouped))
+    return shards
+
+
+def plan_job(source_path=SOURCE_GEOJSON_PATH, shard_size=DEFAULT_SHARD_SIZE):
+    """Kaynak dosyanın kopyasını alır ve shard'ları iş tablosuna yazar"""
+    features = centroid_stubs(source_path)
+
+    job_id = datetime.now().strftime('job-%Y%m%d-%H%M%S')
+    job_dir = os.path.join(SHARD_DIR, job_id)
+    os.makedirs(job_dir, exist_ok=True)
+    # Shard indeksleri bu kopyaya göre; kaynak dosya sonradan değişse de birleştirme tutarlı kalır
+    job_source = os.path.join(job_dir, 'source.geojson')
+    shutil.copyfile(source_path, job_source)
+
+    shards = partition_by_cell(features, shard_size)
+    conn = connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("INSERT INTO jobs VALUES (?, ?, ?, ?, 'running')",
+                     (job_id, datetime.now().isoformat(), job_source, len(features)))
+        conn.executemany(
+            "INSERT INTO shards (job_id, shard_id, cells, feature_indices, status) VALUES (?, ?, ?, ?, 'pending')",
+            [(job_id, n, json.dumps(cells), json.dumps(indices)) for n, (cells, indices) in enumerate(shards)]
+        )
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+    print(f"İş oluşturuldu: {job_id} - {len(features)} alan, {len(shards)} shard")
+    return job_id
+
+
+def claim_shard(conn, job_id, worker):
+    """Boştaki (veya sahibi zaman aşımına uğramış) bir shard'ı atomik olarak sahiplenir"""
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            """SELECT shard_id, feature_indices FROM shards
+               WHERE job_id = ? AND (status = 'pending' OR (status = 'claimed' AND claimed_at < ?))
+               ORDER BY shard_id LIMIT 1""",
+            (job_id, now - SHARD_CLAIM_TIMEOUT)
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None, None
+        conn.execute("UPDATE shards SET status = 'claimed', worker = ?, claimed_at = ? WHERE job_id = ? AND shard_id = ?",
+                     (worker, now, job_id, row[0]))
+        conn.execute("COMMIT")
+        return row[0], json.loads(row[1])
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def heartbeat(conn, job_id, shard_id, worker):
+    """Sahipliği tazeler; shard zaman aşımıyla başka worker'a geçtiyse False döner"""
+    cursor = conn.execute("UPDATE shards SET claimed_at = ? WHERE job_id = ? AND shard_id = ? AND worker = ? AND status = 'claimed'",
+                          (time.time(), job_id, shard_id, worker))
+    return cursor.rowcount > 0
+
+
+def finish_shard(conn, job_id, shard_id, worker, result_path):
+    """Shard'ı tamamlandı işaretler; sahiplik kaybedildiyse (başka worker almışsa) False döner"""
+    cursor = conn.execute(
+        """UPDATE shards SET status = 'done', finished_at = ?, result_path = ?
+           WHERE job_id = ? AND shard_id = ? AND worker = ? AND status = 'claimed'""",
+        (time.time(), result_path, job_id, shard_id, worker)
+    )
+    return cursor.rowcount > 0
+
+
+def release_shard(conn, job_id, shard_id, worker):
+    """Hata durumunda shard'ı zaman aşımını beklemeden diğer worker'lara bırakır"""
+    conn.execute("UPDATE shards SET status = 'pending', worker = NULL, claimed_at = NULL "
+                 "WHERE job_id = ? AND shard_id = ? AND worker = ? AND status = 'claimed'",
+                 (job_id, shard_id, worker))
+
+
+def apply_quota_share(hosts):
+    """
+    Makinenin WeatherAPI ve Groq dakikalık limitlerini toplam kotanın payına indirir.
+    Aynı makinedeki worker'lar aynı RATE_LIMIT_DB_PATH bucket'ını paylaştığı için pay
+    worker başına değil makine başınadır: aynı makinedeki tüm worker'lar aynı --hosts
+    değeriyle başlatılmalıdır. Farklı kapasiteyle açılan worker'lar ortak bucket'ı en
+    düşük kapasiteye kırpar.
+    """
+    import auto_updater as auto_updater_module
+    import lm_risk_analyzer
+
+    if hosts > 1:
+        auto_updater_module.WEATHER_MAX_REQUESTS_PER_MINUTE = max(1, auto_updater_module.WEATHER_MAX_REQUESTS_PER_MINUTE // hosts)
+        lm_risk_analyzer.MAX_REQUESTS_PER_MINUTE = max(1, lm_risk_analyzer.MAX_REQUESTS_PER_MINUTE // hosts)
+    print(f"Kota payı: WeatherAPI {auto_updater_module.WEATHER_MAX_REQUESTS_PER_MINUTE}/dk, "
+          f"Groq {lm_risk_analyzer.MAX_REQUESTS_PER_MINUTE}/dk")
+
+
+def work(job_id=None, hosts=1, threads=2, sample_weather=True, once=False):
+    """Shard'ları sırayla sahiplenip LM analizi ile işler ve ara sonuç dosyası yazar"""
+    apply_quota_share(hosts)
+    from auto_updater import auto_updater, configure_logging
+    from analysis_priority import load_active_fires
+    from incremental_analysis import INCREMENTAL_ANALYSIS, load_previous_results
+
+    configure_logging()
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    auto_updater.weather_sampling = sample_weather
+
+    conn = connect()
+    try:
+        job_id = job_id or latest_job_id(conn)
+        if job_id is None:
+            print("Bekleyen iş yok")
+            return 0
+        source_path = conn.execute("SELECT source_path FROM jobs WHERE job_id = ?", (job_id,)).fetchone()[0]
+
+        fire_points = load_active_fires()
+        previous_results = load_previous_results(ANALYZED_SNAPSHOT_PATH) if INCREMENTAL_ANALYSIS else {}
+
+        processed_shards = 0
+        while True:
+            shard_id, indices = claim_shard(conn, job_id, worker)
+            if shard_id is None:
+                break
+            print(f"[{worker}] Shard {shard_id} alındı ({len(indices)} alan)")
+            try:
+                # Tüm kaynak yerine yalnızca bu shard'ın feature'ları bellekte tutulur
+                features = load_shard_features(source_path, indices)
+
+                results = {}
+                lost = False
+                with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+                    future_to_index = {
+                        executor.submit(auto_updater.process_lm_single_feature, (i, features[i]), fire_points, previous_results): i
+                        for i in indices
+                    }
+                    for n, future in enumerate(concurrent.futures.as_completed(future_to_index), 1):
+                        result = future.result()
+                        if result:
+                            results[future_to_index[future]] = result['properties']
+                        if n % HEARTBEAT_EVERY == 0 and not heartbeat(conn, job_id, shard_id, worker):
+                            lost = True
+                            break
+                    if lost:
+                        # Shard başka worker'a geçti: kalan alanlar için API kotası harcanmaz
+                        for pending in future_to_index:
+                            pending.cancel()
+
+                if lost:
+                    print(f"[{worker}] Shard {shard_id} sahipliği zaman aşımıyla kaybedildi, sonuç atılıyor")
+                    continue
+
+                # Ara sonuç atomik olarak worker'a özel dosyaya yazılır; aynı shard'ı zaman aşımıyla
+                # devralan başka bir worker'ın dosyası ezilmez
+                worker_tag = worker.replace(':', '_')
+                result_path = os.path.join(SHARD_DIR, job_id, f"shard_{shard_id:05d}_{worker_tag}.json")
+                tmp_path = f"{result_path}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({str(i): properties for i, properties in results.items()}, f, ensure_ascii=False, separators=(',', ':'))
+                os.replace(tmp_path, result_path)
+            except BaseException:
+                release_shard(conn, job_id, shard_id, worker)
+                print(f"[{worker}] Shard {shard_id} hata nedeniyle bırakıldı")
+                raise
+
+            # Sadece shard hâlâ bu worker'daysa tamamlandı işaretlenir
+            if not finish_shard(conn, job_id, shard_id, worker, result_path):
+                os.remove(result_path)
+                print(f"[{worker}] Shard {shard_id} sahipliği zaman aşımıyla kaybedildi, sonuç atılıyor")
+                continue
+            processed_shards += 1
+            print(f"[{worker}] Shard {shard_id} tamamlandı: {len(results)}/{len(indices)} alan")
+            if once:
+                break
+
+        print(f"[{worker}] Çıkılıyor, {processed_shards} shard işlendi")
+        return processed_shards
+    finally:
+        conn.close()
+
+
+def merge(job_id=None, allow_partial=False):
+    """Tamamlanan shard sonuçlarını birleştirip analyzed_data.snap olarak yayınlar"""
+    conn = connect()
+    try:
+        job_id = job_id or latest_job_id(conn)
+        if job_id is None:
+            print("Birleştirilecek iş yok")
+            return False
+        source_path = conn.execute("SELECT source_path FROM jobs WHERE job_id = ?", (job_id,)).fetchone()[0]
+        rows = conn.execute("SELECT shard_id, status, result_path FROM shards WHERE job_id = ?", (job_id,)).fetchall()
+    finally:
+        conn.close()
+
+    unfinished = [shard_id for shard_id, status, _ in rows if status != 'done']
+    if unfinished and not allow_partial:
+        print(f"{len(unfinished)} shard henüz tamamlanmadı (--partial ile yine de birleştirilebilir)")
+        return False
+
+    # Shard sonuçları diskte birikir; kaynak yayın sırasında akış halinde birleştirilir
+    results = PropertySpool()
+    counts = {'total': 0, 'failed': 0}
+
+    def mark_failed(feature, i):
+        feature.setdefault('properties', {})['analysis_failed'] = True
+        counts['failed'] += 1
+        return feature
+
+    def counted(features):
+        for feature in features:
+            counts['total'] += 1
+            yield feature
+
+    try:
+        for _, status, result_path in rows:
+            if status != 'done':
+                continue
+            with open(result_path, 'r', encoding='utf-8') as f:
+                for index, properties in json.load(f).items():
+                    results.put(int(index), properties)
+        analyzed_count = len(results)
+
+        analyzed_data = {
+            'type': 'FeatureCollection',
+            'features': counted(results.merge(iter_features(source_path), mark_failed)),
+            # Sayılar akış bitince belli olur; snapshot başlığı sonda yazılır
+            'metadata': lambda: {
+                'total_areas': counts['total'],
+                'analyzed_areas': analyzed_count,
+                'failed_analyses': counts['failed'],
+                'analysis_date': datetime.now().isoformat(),
+                'shard_job': job_id,
+                'shards': len(rows),
+                'unfinished_shards': len(unfinished)
+            }
+        }
+
+        # Yayınlama (snapshot ve türetilmiş veriler) web uygulamasıyla aynı yoldan
+        from app import publish_analysis
+        publish_analysis(analyzed_data)
+    finally:
+        results.close()
+
+    conn = connect()
+    try:
+        conn.execute("UPDATE jobs SET status = ? WHERE job_id = ?", ('partial' if unfinished else 'merged', job_id))
+    finally:
+        conn.close()
+    print(f"İş birleştirildi: {job_id} - {analyzed_count} alan analiz edildi, {counts['failed']} eksik")
+    return True
+
+
+def status(job_id=None):
+    conn = connect()
+    try:
+        job_id = job_id or latest_job_id(conn)
+        if job_id is None:
+            print("İş yok")
+            return
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM shards WHERE job_id = ? GROUP BY status", (job_id,)).fetchall())
+        workers = [row[0] for row in conn.execute("SELECT DISTINCT worker FROM shards WHERE job_id = ? AND worker IS NOT NULL", (job_id,))]
+    finally:
+        conn.close()
+    print(f"{job_id}: {counts} - worker'lar: {', '.join(workers) or '-'}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Shard tabanlı paralel orman riski analizi')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    plan_parser = subparsers.add_parser('plan', help='İşi hava durumu hücrelerine göre shard\'lara böl')
+    plan_parser.add_argument('--source', default=SOURCE_GEOJSON_PATH)
+    plan_parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE)
+
+    work_parser = subparsers.add_parser('work', help='Boştaki shard\'ları analiz et')
+    work_parser.add_argument('--job')
+    work_parser.add_argument('--hosts', type=int, default=1,
+                             help='API anahtarını paylaşan makine sayısı (aynı makinedeki worker\'lar rate limit bucket\'ını zaten paylaşır)')
+    work_parser.add_argument('--threads', type=int, default=2)
+    work_parser.add_argument('--no-sample-weather', action='store_true', help='Hava durumunu hücre merkezi yerine alan merkezinden al')
+    work_parser.add_argument('--once', action='store_true', help='Tek shard işleyip çık')
+
+    merge_parser = subparsers.add_parser('merge', help='Tamamlanan shard\'ları yayınla')
+    merge_parser.add_argument('--job')
+    merge_parser.add_argument('--partial', action='store_true')
+
+    status_parser = subparsers.add_parser('status', help='İş durumunu göster')
+    status_parser.add_argument('--job')
+
+    args = parser.parse_args(argv)
+    os.makedirs(SHARD_DIR, exist_ok=True)
+
+    if args.command == 'plan':
+        plan_job(args.source, args.shard_size)
+    elif args.command == 'work':
+        work(args.job, args.hosts, args.threads, not args.no_sample_weather, args.once)
+    elif args.command == 'merge':
+        return 0 if merge(args.job, args.partial) else 1
+    elif args.command == 'status':
+        status(args.job)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,485 @@
+import os
+import sys
+import glob
+import json
+import mmap
+import math
+import struct
+from array import array
+from datetime import datetime
+
+# Kompakt ikili analiz snapshot formatı
+#
+# [8 bayt magic][4 bayt dizin uzunluğu][4 bayt veri başlangıcı][JSON dizin][hizalı bölümler...]
+#
+# Dizin her bölümün (veri başlangıcına göre offset, uzunluk, tip kodu) bilgisini
+# ve metadata'yı içerir.
+# Risk skorları float32, diğer sayısal alanlar float64, metin sütunları string
+# tablosuna indeks (uint32), koordinatlar 1e-6 dereceye nicemlenmiş int32 olarak
+# tutulur. Tam sayılar tiplerini korumak için ekstra alanlarda JSON olarak saklanır;
+# feature kimlikleri string tablosunda, sayı kimliklerin tipi ayrı bir bayt sütununda tutulur.
+# Dosya mmap ile açılır; bölümler ayrıştırılmadan memoryview üzerinden okunur.
+# Web uygulamasında analiz sonucunun asıl kaydıdır: sorgular, indeksler ve detay
+# deposu snapshot'tan beslenir, GeoJSON yalnızca dışa aktarımda (/export) üretilir.
+
+# Zamanlayıcının zaman damgalı sonuçları: servis edilen static/ dışında, son SNAPSHOT_KEEP tanesi saklanır
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', 'data/snapshots')
+SNAPSHOT_KEEP = int(os.environ.get('SNAPSHOT_KEEP', 7))
+
+SNAPSHOT_MAGIC = b'ORSNAP1\x00'
+SNAPSHOT_VERSION = 3
+COORD_SCALE = 1_000_000  # 1e-6 derece (~10 cm)
+MISSING = 0xFFFFFFFF
+HEADER_FORMAT = '<II'  # Dizin uzunluğu, veri başlangıcı (dosyadaki her şey little-endian)
+
+# Skorlar 7 anlamlı basamakla yeterli; alan, mesafe ve hava değerleri tam hassasiyetle saklanır
+FLOAT_COLUMNS = ['combined_risk_score', 'weather_risk_score', 'human_risk_score', 'risk_skoru']
+DOUBLE_COLUMNS = [
+    'centroid_lat', 'centroid_lon', 'weather_weight', 'human_weight', 'distance_from_city',
+    'area', 'area_size', 'sicaklik', 'nem', 'ruzgar_hizi', 'yagis_7_gun'
+]
+STRING_COLUMNS = [
+    'name', 'landuse', 'combined_risk_level', 'combined_risk_color', 'risk_seviyesi',
+    'nearest_city', 'area_type', 'fire_status', 'analyzed_at', 'son_guncelleme'
+]
+BOOL_COLUMNS = ['analysis_failed', 'fire_spread_risk']
+
+GEOMETRY_NONE = 0
+GEOMETRY_POLYGON = 1
+GEOMETRY_MULTIPOLYGON = 2
+GEOMETRY_OTHER = 3  # Ekstra alanlarda JSON olarak saklanır
+
+# Kimlik tipleri (GeoJSON'da id string veya sayı olabilir)
+ID_STRING = 0
+ID_INT = 1
+ID_FLOAT = 2
+
+
+def snapshot_path_for(geojson_path):
+    """GeoJSON dosyasına karşılık gelen snapshot dosyasının yolu"""
+    base, _ = os.path.splitext(geojson_path)
+    return f"{base}.snap"
+
+
+def archive_path(prefix, timestamp, directory=SNAPSHOT_DIR):
+    """Zaman damgalı snapshot'ın yolu (dizin yoksa oluşturulur)"""
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{prefix}_{timestamp}.snap")
+
+
+def archived_snapshots(prefix, directory=SNAPSHOT_DIR):
+    """Önekle yazılmış zaman damgalı snapshot'lar, eskiden yeniye"""
+    return sorted(glob.glob(os.path.join(directory, f"{prefix}_[0-9]*.snap")))
+
+
+def latest_snapshot(prefix, newer_than=None, directory=SNAPSHOT_DIR):
+    """En yeni zaman damgalı snapshot; yoksa veya newer_than dosyasından eskiyse None"""
+    paths = archived_snapshots(prefix, directory)
+    if not paths:
+        return None
+    if newer_than and os.path.exists(newer_than) and os.path.getmtime(paths[-1]) < os.path.getmtime(newer_than):
+        return None
+    return paths[-1]
+
+
+def prune_snapshots(prefix, keep=SNAPSHOT_KEEP, directory=SNAPSHOT_DIR):
+    """En yeni 'keep' tanesi dışındaki zaman damgalı snapshot'ları siler; silinen sayısını döndürür"""
+    paths = archived_snapshots(prefix, directory)
+    stale = paths[:-keep] if keep > 0 else paths
+    for path in stale:
+        os.remove(path)
+    return len(stale)
+
+
+def _little_endian(arr):
+    if sys.byteorder != 'little':
+        arr.byteswap()
+    return arr.tobytes()
+
+
+class _StringTable:
+    """Tekrarlanan metinleri bir kez saklayan string tablosu"""
+
+    def __init__(self):
+        self.index = {}
+        self.values = []
+
+    def add(self, value):
+        if value is None:
+            return MISSING
+        idx = self.index.get(value)
+        if idx is None:
+            idx = len(self.values)
+            self.index[value] = idx
+            self.values.append(value)
+        return idx
+
+
+def _is_float(value):
+    # int değerler sütuna yazılırsa okurken float'a döner; NaN sütunda 'eksik' anlamındadır
+    return isinstance(value, float) and not math.isnan(value)
+
+
+def write_snapshot(path, features, metadata=None):
+    """
+    Feature'ları ikili snapshot olarak yazar (geçici dosya + atomik değiştirme).
+    'features' liste olmak zorunda değildir; akış halinde üretilen feature'lar tek tek
+    sütunlara eklenir. 'metadata' bir fonksiyonsa tüm feature'lar tüketildikten sonra çağrılır.
+    """
+    strings = _StringTable()
+    count = 0
+
+    floats = {name: array('f') for name in FLOAT_COLUMNS}
+    doubles = {name: array('d') for name in DOUBLE_COLUMNS}
+    string_cols = {name: array('I') for name in STRING_COLUMNS}
+    bools = {name: array('B') for name in BOOL_COLUMNS}
+    ids = array('I')
+    id_types = array('B')
+
+    extra_offsets = array('I', [0])
+    extra_pairs = array('I')
+    geometry_types = array('B')
+    polygon_offsets = array('I', [0])
+    ring_offsets = array('I', [0])
+    point_offsets = array('I', [0])
+    points = array('i')
+
+    for i, feature in enumerate(features):
+        count += 1
+        for col in floats.values():
+            col.append(math.nan)
+        for col in doubles.values():
+            col.append(math.nan)
+        for col in string_cols.values():
+            col.append(MISSING)
+        for col in bools.values():
+            col.append(255)
+        ids.append(MISSING)
+        id_types.append(ID_STRING)
+        geometry_types.append(GEOMETRY_NONE)
+
+        fid = feature.get('id')
+        if fid is not None:
+            ids[i] = strings.add(str(fid))
+            if isinstance(fid, int) and not isinstance(fid, bool):
+                id_types[i] = ID_INT
+            elif isinstance(fid, float):
+                id_types[i] = ID_FLOAT
+
+        properties = feature.get('properties') or {}
+        for key, value in properties.items():
+            # Sütun tipine uymayan değerler ekstra alanlara düşer
+            if key in floats and _is_float(value):
+                floats[key][i] = value
+            elif key in doubles and _is_float(value):
+                doubles[key][i] = value
+            elif key in string_cols and isinstance(value, str):
+                string_cols[key][i] = strings.add(value)
+            elif key in bools and isinstance(value, bool):
+                bools[key][i] = 1 if value else 0
+            else:
+                extra_pairs.append(strings.add(key))
+                extra_pairs.append(strings.add(json.dumps(value, ensure_ascii=False, separators=(',', ':'))))
+
+        geometry = feature.get('geometry')
+        polygons = []
+        if geometry and geometry.get('type') == 'Polygon':
+            geometry_types[i] = GEOMETRY_POLYGON
+            polygons = [geometry.get('coordinates') or []]
+        elif geometry and geometry.get('type') == 'MultiPolygon':
+            geometry_types[i] = GEOMETRY_MULTIPOLYGON
+            polygons = geometry.get('coordinates') or []
+        elif geometry:
+            geometry_types[i] = GEOMETRY_OTHER
+            extra_pairs.append(strings.add('__geometry'))
+            extra_pairs.append(strings.add(json.dumps(geometry, separators=(',', ':'))))
+
+        for polygon in polygons:
+            for ring in polygon:
+                for point in ring:
+                    points.append(int(round(point[0] * COORD_SCALE)))
+                    points.append(int(round(point[1] * COORD_SCALE)))
+                point_offsets.append(len(points) // 2)
+            ring_offsets.append(len(point_offsets) - 1)
+        polygon_offsets.append(len(ring_offsets) - 1)
+        extra_offsets.append(len(extra_pairs) // 2)
+
+    # String tablosu: uint32 offset listesi + UTF-8 blob
+    encoded = [value.encode('utf-8') for value in strings.values]
+    string_offsets = array('I', [0])
+    total = 0
+    for value in encoded:
+        total += len(value)
+        string_offsets.append(total)
+
+    sections = [('ids', 'I', _little_endian(ids)), ('id_types', 'B', id_types.tobytes())]
+    sections += [(f"f:{name}", 'f', _little_endian(col)) for name, col in floats.items()]
+    sections += [(f"d:{name}", 'd', _little_endian(col)) for name, col in doubles.items()]
+    sections += [(f"s:{name}", 'I', _little_endian(col)) for name, col in string_cols.items()]
+    sections += [(f"b:{name}", 'B', col.tobytes()) for name, col in bools.items()]
+    sections += [
+        ('extra_offsets', 'I', _little_endian(extra_offsets)),
+        ('extra_pairs', 'I', _little_endian(extra_pairs)),
+        ('geometry_types', 'B', geometry_types.tobytes()),
+        ('polygon_offsets', 'I', _little_endian(polygon_offsets)),
+        ('ring_offsets', 'I', _little_endian(ring_offsets)),
+        ('point_offsets', 'I', _little_endian(point_offsets)),
+        ('points', 'i', _little_endian(points)),
+        ('string_offsets', 'I', _little_endian(string_offsets)),
+        ('string_blob', 'B', b''.join(encoded))
+    ]
+
+    directory = {
+        'version': SNAPSHOT_VERSION,
+        'count': count,
+        'coord_scale': COORD_SCALE,
+        'created_at': datetime.now().isoformat(),
+        'metadata': (metadata() if callable(metadata) else metadata) or {},
+        'sections': {}
+    }
+
+    # Bölüm offsetleri veri alanının başına göre tutulur (dizin uzunluğundan bağımsız)
+    offset = 0
+    for name, typecode, data in sections:
+        directory['sections'][name] = [offset, len(data), typecode]
+        offset += len(data)
+        offset += (-offset) % 8
+    directory_bytes = json.dumps(directory, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    data_start = 16 + len(directory_bytes)
+    data_start += (-data_start) % 8
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(struct.pack(HEADER_FORMAT, len(directory_bytes), data_start))
+        f.write(directory_bytes)
+        for name, typecode, data in sections:
+            section_offset = data_start + directory['sections'][name][0]
+            f.write(b'\x00' * (section_offset - f.tell()))
+            f.write(data)
+    os.replace(tmp_path, path)
+    return path
+
+
+class Snapshot:
+    """
+    mmap ile açılan salt-okunur snapshot.
+    Sütunlar ayrıştırılmaz; değerler ihtiyaç oldukça memoryview'den okunur.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._sections = {}
+        self._view = memoryview(self._mmap)
+        view = self._view
+
+        if bytes(view[:8]) != SNAPSHOT_MAGIC:
+            self.close()
+            raise ValueError(f"Geçersiz snapshot dosyası: {path}")
+        directory_len, data_start = struct.unpack(HEADER_FORMAT, view[8:16])
+        self.directory = json.loads(bytes(view[16:16 + directory_len]).decode('utf-8'))
+        self.metadata = self.directory.get('metadata', {})
+        self.count = self.directory['count']
+        self.coord_scale = self.directory.get('coord_scale', COORD_SCALE)
+
+        for name, (offset, length, typecode) in self.directory['sections'].items():
+            section = view[data_start + offset:data_start + offset + length]
+            if typecode == 'B':
+                self._sections[name] = section
+            elif sys.byteorder == 'little':
+                self._sections[name] = section.cast(typecode)
+            else:
+                # Big-endian makinede bölüm kopyalanıp bayt sırası çevrilir
+                values = array(typecode, bytes(section))
+                values.byteswap()
+                section.release()
+                self._sections[name] = memoryview(values)
+
+        # Sütunlar dosyadaki dizinden okunur; eski sürümde float32 olan sütunlar da okunabilir
+        self._columns = {prefix: [] for prefix in 'fdsb'}
+        for name, section in self._sections.items():
+            if name[1:2] == ':' and name[0] in self._columns:
+                self._columns[name[0]].append((name[2:], section))
+
+    def close(self):
+        """mmap'i ve dosyayı kapatır (önce tüm memoryview'ler serbest bırakılır)"""
+        for section in self._sections.values():
+            section.release()
+        self._sections = {}
+        self._columns = {}
+        self._view.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def string(self, idx):
+        """String tablosundan değer okur"""
+        if idx == MISSING:
+            return None
+        offsets = self._sections['string_offsets']
+        return bytes(self._sections['string_blob'][offsets[idx]:offsets[idx + 1]]).decode('utf-8')
+
+    def column(self, name):
+        """Sayısal bir sütunun memoryview'i (kopyalamadan)"""
+        for prefix in ('f:', 'd:'):
+            if prefix + name in self._sections:
+                return self._sections[prefix + name]
+        raise KeyError(name)
+
+    def feature_id(self, i):
+        """i. feature'ın kimliği string olarak (spatial_index.feature_id ile aynı biçim)"""
+        return self.string(self._sections['ids'][i])
+
+    def typed_id(self, i):
+        """i. feature'ın kimliği kaynaktaki tipiyle (sayı kimlikler sayı olarak döner)"""
+        fid = self.feature_id(i)
+        id_types = self._sections.get('id_types')  # Eski sürüm snapshot'larda yok
+        if fid is None or id_types is None:
+            return fid
+        if id_types[i] == ID_INT:
+            return int(fid)
+        if id_types[i] == ID_FLOAT:
+            return float(fid)
+        return fid
+
+    def properties(self, i):
+        """i. feature'ın properties sözlüğünü oluşturur"""
+        properties = {}
+        for name, section in self._columns['f']:
+            value = section[i]
+            if not math.isnan(value):
+                # float32 değerini 7 anlamlı basamağa geri çevir
+                properties[name] = float(f"{value:.7g}")
+        for name, section in self._columns['d']:
+            value = section[i]
+            if not math.isnan(value):
+                properties[name] = value
+        for name, section in self._columns['s']:
+            idx = section[i]
+            if idx != MISSING:
+                properties[name] = self.string(idx)
+        for name, section in self._columns['b']:
+            value = section[i]
+            if value != 255:
+                properties[name] = bool(value)
+
+        offsets = self._sections['extra_offsets']
+        pairs = self._sections['extra_pairs']
+        for k in range(offsets[i], offsets[i + 1]):
+            key = self.string(pairs[2 * k])
+            if key == '__geometry':
+                continue
+            properties[key] = json.loads(self.string(pairs[2 * k + 1]))
+        return properties
+
+    def geometry(self, i):
+        """i. feature'ın GeoJSON geometrisini oluşturur"""
+        geometry_type = self._sections['geometry_types'][i]
+        if geometry_type == GEOMETRY_NONE:
+            return None
+        if geometry_type == GEOMETRY_OTHER:
+            offsets = self._sections['extra_offsets']
+            pairs = self._sections['extra_pairs']
+            for k in range(offsets[i], offsets[i + 1]):
+                if self.string(pairs[2 * k]) == '__geometry':
+                    return json.loads(self.string(pairs[2 * k + 1]))
+            return None
+
+        polygon_offsets = self._sections['polygon_offsets']
+        ring_offsets = self._sections['ring_offsets']
+        point_offsets = self._sections['point_offsets']
+        points = self._sections['points']
+        scale = self.coord_scale
+
+        polygons = []
+        for p in range(polygon_offsets[i], polygon_offsets[i + 1]):
+            rings = []
+            for r in range(ring_offsets[p], ring_offsets[p + 1]):
+                start, end = point_offsets[r], point_offsets[r + 1]
+                rings.append([[points[2 * j] / scale, points[2 * j + 1] / scale] for j in range(start, end)])
+            polygons.append(rings)
+
+        if geometry_type == GEOMETRY_POLYGON:
+            return {'type': 'Polygon', 'coordinates': polygons[0] if polygons else []}
+        return {'type': 'MultiPolygon', 'coordinates': polygons}
+
+    def feature(self, i, geometry=True):
+        """i. feature'ı GeoJSON sözlüğü olarak döndürür (geometry=False ise geometri okunmaz)"""
+        feature = {'type': 'Feature', 'properties': self.properties(i), 'geometry': self.geometry(i) if geometry else None}
+        fid = self.typed_id(i)
+        if fid is not None:
+            feature['id'] = fid
+        return feature
+
+    def iter_features(self):
+        for i in range(self.count):
+            yield self.feature(i)
+
+    def features(self, geometry=True):
+        """Feature'lara liste gibi erişim; hiçbiri önceden oluşturulmaz"""
+        return SnapshotFeatures(self, geometry)
+
+    def iter_geojson_chunks(self):
+        """GeoJSON çıktısını parça parça üretir (tüm dosyayı bellekte tutmadan)"""
+        yield '{"type":"FeatureCollection","metadata":'
+        yield json.dumps(self.metadata, ensure_ascii=False, separators=(',', ':'))
+        yield ',"features":['
+        for i in range(self.count):
+            if i:
+                yield ','
+            yield json.dumps(self.feature(i), ensure_ascii=False, separators=(',', ':'))
+        yield ']}'
+
+    def export_geojson(self, path):
+        """Snapshot'tan GeoJSON dosyası türetir"""
+        with open(path, 'w', encoding='utf-8') as f:
+            for chunk in self.iter_geojson_chunks():
+                f.write(chunk)
+        return path
+
+
+class SnapshotFeatures:
+    """
+    Snapshot'taki feature'ların salt-okunur dizi görünümü (len, indeks, döngü).
+    İndeksler feature listesi yerine bunu tutar; her feature istendiğinde mmap'ten
+    oluşturulur. Görünüm snapshot'ı açık tutar: dosya yenilense de eski sürüm,
+    görünüm bırakılana kadar okunabilir kalır.
+    """
+
+    def __init__(self, snapshot, geometry=True):
+        self.snapshot = snapshot
+        self.geometry = geometry
+
+    def __len__(self):
+        return self.snapshot.count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.snapshot.count
+        if not 0 <= i < self.snapshot.count:
+            raise IndexError(i)
+        return self.snapshot.feature(i, self.geometry)
+
+    def __iter__(self):
+        for i in range(self.snapshot.count):
+            yield self.snapshot.feature(i, self.geometry)
+
+
+def read_snapshot_metadata(path):
+    """Sadece dizini okuyarak snapshot metadata'sını döndürür"""
+    with open(path, 'rb') as f:
+        if f.read(8) != SNAPSHOT_MAGIC:
+            raise ValueError(f"Geçersiz snapshot dosyası: {path}")
+        directory_len, _ = struct.unpack(HEADER_FORMAT, f.read(8))
+        directory = json.loads(f.read(directory_len).decode('utf-8'))
+    return directory.get('metadata', {})
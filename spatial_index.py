@@ -0,0 +1,249 @@
+import os
+import math
+import hashlib
+import threading
+from snapshot_store import Snapshot
+
+# /risk_at yanıtında döndürülen risk alanları
+RISK_PROPERTY_KEYS = [
+    'name',
+    'landuse',
+    'area',
+    'combined_risk_score',
+    'combined_risk_level',
+    'combined_risk_color',
+    'weather_risk_score',
+    'human_risk_score',
+    'risk_skoru',
+    'risk_seviyesi',
+    'fire_status',
+    'fire_spread_risk',
+    'analyzed_at',
+    'analysis_failed'
+]
+
+NODE_CAPACITY = 16  # R-tree düğüm kapasitesi
+
+
+def feature_id(feature, index=None):
+    """
+    Feature için kararlı bir kimlik üretir.
+    Öncelik: feature.id > properties.id/osm_id > centroid+isim hash'i > sıra numarası
+    """
+    if feature.get('id') is not None:
+        return str(feature['id'])
+
+    properties = feature.get('properties') or {}
+    for key in ('feature_id', 'id', '@id', 'osm_id'):
+        if properties.get(key) is not None:
+            return str(properties[key])
+
+    lat = properties.get('centroid_lat')
+    lon = properties.get('centroid_lon')
+    if lat is not None and lon is not None:
+        raw = f"{lat:.6f}_{lon:.6f}_{properties.get('name', '')}"
+        return hashlib.md5(raw.encode('utf-8')).hexdigest()[:12]
+
+    return str(index) if index is not None else None
+
+
+def risk_properties(feature, index=None):
+    """Feature'ın risk ile ilgili alanlarını döndürür"""
+    properties = feature.get('properties') or {}
+    result = {'id': feature_id(feature, index)}
+    for key in RISK_PROPERTY_KEYS:
+        if key in properties:
+            result[key] = properties[key]
+    return result
+
+
+def geometry_polygons(geometry):
+    """Polygon/MultiPolygon geometrisini halka listelerinden oluşan poligonlara çevirir"""
+    if not geometry:
+        return []
+    if geometry.get('type') == 'Polygon':
+        return [geometry.get('coordinates') or []]
+    if geometry.get('type') == 'MultiPolygon':
+        return geometry.get('coordinates') or []
+    return []
+
+
+def polygons_bbox(polygons):
+    """Poligonların (minx, miny, maxx, maxy) sınır kutusunu hesaplar"""
+    minx = miny = math.inf
+    maxx = maxy = -math.inf
+    for polygon in polygons:
+        if not polygon:
+            continue
+        # Sınır kutusu için dış halka yeterli
+        for point in polygon[0]:
+            x, y = point[0], point[1]
+            if x < minx:
+                minx = x
+            if x > maxx:
+                maxx = x
+            if y < miny:
+                miny = y
+            if y > maxy:
+                maxy = y
+    if minx == math.inf:
+        return None
+    return (minx, miny, maxx, maxy)
+
+
+def point_in_ring(x, y, ring):
+    """Ray casting ile noktanın halka içinde olup olmadığını kontrol eder"""
+    inside = False
+    n = len(ring)
+    if n < 3:
+        return False
+    x1, y1 = ring[-1][0], ring[-1][1]
+    for point in ring:
+        x2, y2 = point[0], point[1]
+        if (y2 > y) != (y1 > y):
+            if x < (x1 - x2) * (y - y2) / (y1 - y2) + x2:
+                inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+def point_in_polygons(x, y, polygons):
+    """Nokta poligonlardan birinin içinde mi (delikler hariç)"""
+    for polygon in polygons:
+        if not polygon or not point_in_ring(x, y, polygon[0]):
+            continue
+        if not any(point_in_ring(x, y, hole) for hole in polygon[1:]):
+            return True
+    return False
+
+
+class STRTree:
+    """
+    Sort-Tile-Recursive yöntemiyle paketlenmiş, salt-okunur R-tree.
+    Her giriş (minx, miny, maxx, maxy, child) demetidir; child yaprakta
+    öğe indeksi (int), iç düğümlerde alt giriş demetidir.
+    """
+
+    def __init__(self, boxes, node_capacity=NODE_CAPACITY):
+        self.node_capacity = max(2, node_capacity)
+        self.size = 0
+        entries = []
+        for item, box in enumerate(boxes):
+            if box is None:
+                continue
+            entries.append((box[0], box[1], box[2], box[3], item))
+        self.size = len(entries)
+        self._root = self._build(entries) if entries else ()
+
+    def _pack(self, entries):
+        """Bir seviyeyi STR ile düğümlere paketler"""
+        capacity = self.node_capacity
+        node_count = math.ceil(len(entries) / capacity)
+        slice_count = math.ceil(math.sqrt(node_count))
+        slice_size = slice_count * capacity
+
+        entries = sorted(entries, key=lambda e: e[0] + e[2])
+        nodes = []
+        for start in range(0, len(entries), slice_size):
+            slab = sorted(entries[start:start + slice_size], key=lambda e: e[1] + e[3])
+            for offset in range(0, len(slab), capacity):
+                children = tuple(slab[offset:offset + capacity])
+                nodes.append((
+                    min(c[0] for c in children),
+                    min(c[1] for c in children),
+                    max(c[2] for c in children),
+                    max(c[3] for c in children),
+                    children
+                ))
+        return nodes
+
+    def _build(self, entries):
+        level = entries
+        while len(level) > self.node_capacity:
+            level = self._pack(level)
+        return tuple(level)
+
+    def query_point(self, x, y):
+        """Sınır kutusu noktayı içeren öğe indekslerini döndürür"""
+        result = []
+        stack = [self._root]
+        while stack:
+            for entry in stack.pop():
+                if entry[0] <= x <= entry[2] and entry[1] <= y <= entry[3]:
+                    child = entry[4]
+                    if type(child) is int:
+                        result.append(child)
+                    else:
+                        stack.append(child)
+        return result
+
+    def query_bbox(self, minx, miny, maxx, maxy):
+        """Sınır kutusu verilen kutu ile kesişen öğe indekslerini döndürür"""
+        result = []
+        stack = [self._root]
+        while stack:
+            for entry in stack.pop():
+                if entry[0] <= maxx and entry[2] >= minx and entry[1] <= maxy and entry[3] >= miny:
+                    child = entry[4]
+                    if type(child) is int:
+                        result.append(child)
+                    else:
+                        stack.append(child)
+        return result
+
+
+class SpatialRiskIndex:
+    """
+    Analiz edilmiş alanlar üzerinde nokta sorgusu yapan indeks.
+    R-tree ile aday poligonlar bulunur, ardından kesin nokta-poligon testi yapılır.
+    Bellekte sadece sınır kutuları tutulur; aday feature'lar sorgu anında
+    kaynak diziden (ör. snapshot görünümü) okunur.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.source_path = None
+        self.source_mtime = None
+        self.tree = STRTree([])
+        self.features = []
+
+    def build(self, features, source_path=None, source_mtime=None):
+        """Feature dizisinden indeksi yeniden oluşturur (dizi indeksle erişilebilir olmalı)"""
+        boxes = [polygons_bbox(geometry_polygons(feature.get('geometry'))) for feature in features]
+        tree = STRTree(boxes)
+
+        # İndeksi tek seferde değiştir (sorgular eski indeksle devam edebilir)
+        with self.lock:
+            self.tree = tree
+            self.features = features
+            self.source_path = source_path
+            self.source_mtime = source_mtime
+        print(f"Mekansal indeks oluşturuldu: {tree.size} alan")
+
+    def ensure_loaded(self, path):
+        """Snapshot dosyası değiştiyse indeksi ondan yeniden oluşturur"""
+        if not os.path.exists(path):
+            return False
+        mtime = os.path.getmtime(path)
+        if self.source_path == path and self.source_mtime == mtime:
+            return True
+
+        # Eski snapshot, onu kullanan sorgular bitince serbest kalır
+        self.build(Snapshot(path).features(), source_path=path, source_mtime=mtime)
+        return True
+
+    def risk_at(self, lat, lon):
+        """Noktayı kapsayan alanın risk bilgilerini döndürür, yoksa None"""
+        with self.lock:
+            tree = self.tree
+            features = self.features
+
+        for item in tree.query_point(lon, lat):
+            feature = features[item]
+            if point_in_polygons(lon, lat, geometry_polygons(feature.get('geometry'))):
+                return risk_properties(feature, item)
+        return None
+
+
+# Global mekansal indeks instance
+risk_index = SpatialRiskIndex()
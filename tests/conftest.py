@@ -0,0 +1,77 @@
+import os
+import sys
+import json
+import copy
+
+import pytest
+
+# Testler depo kökündeki modülleri doğrudan içe aktarır
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+TEST_FOREST_PATH = os.path.join(ROOT, 'static', 'test_forest.geojson')
+
+
+def _ring(lon, lat, size):
+    return [[lon, lat], [lon + size, lat], [lon + size, lat + size], [lon, lat + size], [lon, lat]]
+
+
+@pytest.fixture
+def sample_collection():
+    """
+    Round-trip testleri için FeatureCollection: test_forest.geojson'daki alanlar ve
+    snapshot sütunlarının, ekstra alanların ve geometri tiplerinin uç durumları
+    """
+    with open(TEST_FOREST_PATH, 'r', encoding='utf-8') as f:
+        features = json.load(f)['features']
+
+    features.append({
+        'type': 'Feature',
+        'id': 7,
+        'properties': {
+            'name': 'Çamlık Orman Alanı – Güney',
+            'combined_risk_score': 72.35,
+            'combined_risk_level': 'Yüksek',
+            'risk_skoru': 40,  # Tam sayı: tipi korunmalı
+            'area': 12.345678901234,
+            'centroid_lat': 36.912345678,
+            'centroid_lon': 30.687654321,
+            'analysis_failed': False,
+            'fire_spread_risk': True,
+            'landuse': 123,  # Metin sütununa uymayan değer
+            'nearest_city': None,
+            'weather_data': {'sicaklik': 31.2, 'nem': 18, 'ruzgar': {'hiz': 22.5, 'yon': 'KB'}},
+            'analysis_inputs': [31.2, 18, None, True]
+        },
+        'geometry': {
+            'type': 'Polygon',
+            'coordinates': [_ring(30.68, 36.90, 0.02), _ring(30.685, 36.905, 0.005)[::-1]]
+        }
+    })
+    features.append({
+        'type': 'Feature',
+        'id': 'way/123',
+        'properties': {'combined_risk_score': 15.0, 'sicaklik': 24.75, 'son_guncelleme': '2024-07-01T12:00:00'},
+        'geometry': {
+            'type': 'MultiPolygon',
+            'coordinates': [[_ring(30.70, 36.80, 0.01)], [_ring(30.75, 36.85, 0.003)]]
+        }
+    })
+    features.append({'type': 'Feature', 'properties': {'name': 'Geometrisiz'}, 'geometry': None})
+    features.append({'type': 'Feature', 'properties': {}, 'geometry': {'type': 'Point', 'coordinates': [30.71, 36.89]}})
+
+    return {
+        'type': 'FeatureCollection',
+        'features': copy.deepcopy(features),
+        'metadata': {'total_areas': len(features), 'analysis_date': '2024-07-01T12:00:00', 'partial': False}
+    }
+
+
+@pytest.fixture
+def sample_path(tmp_path, sample_collection):
+    """sample_collection'ın json.dump ile yazılmış dosyası"""
+    path = tmp_path / 'sample.geojson'
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(sample_collection, f, ensure_ascii=False, indent=2)
+    return str(path)
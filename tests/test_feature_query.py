@@ -0,0 +1,33 @@
+from feature_query import FeatureQueryIndex
+from geometry_simplifier import LOD_ZOOM_LEVELS, quantize_geometry
+from snapshot_store import Snapshot, write_snapshot
+
+
+def test_query_reads_full_geometry_only_at_full_resolution(tmp_path, sample_collection, monkeypatch):
+    path = str(tmp_path / 'sample.snap')
+    write_snapshot(path, sample_collection['features'])
+    reads = []
+    geometry = Snapshot.geometry
+
+    def counting_geometry(snapshot, i):
+        reads.append(i)
+        return geometry(snapshot, i)
+
+    monkeypatch.setattr(Snapshot, 'geometry', counting_geometry)
+    index = FeatureQueryIndex()
+    assert index.ensure_loaded(path)  # LOD dosyası yok: geometriler bir kez okunup LOD hesaplanır
+    reads.clear()
+
+    # LOD seviyesindeki sorgu snapshot geometrisini hiç çözmez
+    result, level, _ = index.query(None, LOD_ZOOM_LEVELS[0])
+    assert level == LOD_ZOOM_LEVELS[0] and result
+    assert reads == []
+
+    # Tam çözünürlükte sadece döndürülen alanların geometrisi okunur
+    zoom = LOD_ZOOM_LEVELS[-1] + 1
+    result, level, _ = index.query(None, zoom)
+    assert level is None
+    assert len(reads) == len(sample_collection['features'])
+    with Snapshot(path) as snapshot:
+        expected = [quantize_geometry(geometry(snapshot, i), zoom) for i in range(len(snapshot))]
+    assert [feature['geometry'] for feature in result] == [g for g in expected if g]
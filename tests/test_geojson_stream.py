@@ -0,0 +1,150 @@
+import json
+
+import pytest
+
+import geojson_stream
+from geojson_stream import iter_features, iter_selected, iter_selected_in_order, load_geojson, write_geojson, GeoJSONWriter, PropertySpool
+
+
+def load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def dump_json(path, data, **kwargs):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, **kwargs)
+    return str(path)
+
+
+@pytest.fixture(params=[1, 7, 4096, geojson_stream.CHUNK_SIZE])
+def chunk_size(request, monkeypatch):
+    """Değerlerin parça sınırlarında bölündüğü durumlar için okuma boyutu"""
+    monkeypatch.setattr(geojson_stream._StreamReader.__init__, '__defaults__', (request.param,))
+    return request.param
+
+
+def test_iter_features_matches_json_load(sample_path, chunk_size):
+    expected = load_json(sample_path)
+    members = {}
+    assert list(iter_features(sample_path, members)) == expected['features']
+    assert members == {key: value for key, value in expected.items() if key != 'features'}
+
+
+def test_iter_features_member_order_and_compact_output(tmp_path, sample_collection, chunk_size):
+    # features önce, diğer alanlar sonra; boşluksuz yazım
+    data = {'features': sample_collection['features'], 'type': 'FeatureCollection', 'metadata': sample_collection['metadata']}
+    path = dump_json(tmp_path / 'compact.geojson', data, separators=(',', ':'))
+    members = {}
+    assert list(iter_features(path, members)) == data['features']
+    assert members == {'type': 'FeatureCollection', 'metadata': data['metadata']}
+
+
+def test_iter_features_large_feature(tmp_path, chunk_size):
+    # Tek feature okuma parçasından çok daha büyük: tampon büyütülerek çözülür
+    ring = [[30.0 + i * 1e-6, 36.0 + (i % 97) * 1e-5] for i in range(20000)]
+    data = {'type': 'FeatureCollection', 'features': [
+        {'type': 'Feature', 'properties': {'name': 'büyük'}, 'geometry': {'type': 'Polygon', 'coordinates': [ring]}},
+        {'type': 'Feature', 'properties': {'n': 1}, 'geometry': None}
+    ]}
+    path = dump_json(tmp_path / 'large.geojson', data)
+    assert list(iter_features(path)) == data['features']
+
+
+@pytest.mark.parametrize('text', [
+    '{"type":"FeatureCollection","features":[]}',
+    ' { "features" : [ ] , "type" : "FeatureCollection" } ',
+    '{}'
+])
+def test_iter_features_empty(tmp_path, text):
+    path = tmp_path / 'empty.geojson'
+    path.write_text(text, encoding='utf-8')
+    assert list(iter_features(str(path))) == []
+    assert load_geojson(str(path))['features'] == []
+
+
+def test_iter_features_rejects_invalid(tmp_path):
+    path = tmp_path / 'invalid.geojson'
+    path.write_text('{"type":"FeatureCollection","features":[{"type":"Feature"} {"type":"Feature"}]}', encoding='utf-8')
+    with pytest.raises(ValueError):
+        list(iter_features(str(path)))
+
+
+def test_load_geojson_matches_json_load(sample_path):
+    assert load_geojson(sample_path) == load_json(sample_path)
+
+
+def test_write_geojson_round_trip(tmp_path, sample_collection):
+    path = str(tmp_path / 'out.geojson')
+    write_geojson(path, sample_collection)
+    assert load_json(path) == sample_collection
+    assert list(iter_features(path)) == sample_collection['features']
+
+
+def test_writer_trailing_members_and_abort(tmp_path, sample_collection):
+    path = str(tmp_path / 'out.geojson')
+    with GeoJSONWriter(path, {'name': 'risk'}) as writer:
+        for feature in sample_collection['features']:
+            writer.write(feature)
+        writer.close({'metadata': sample_collection['metadata']})
+    expected = {'type': 'FeatureCollection', 'name': 'risk', 'features': sample_collection['features'],
+                'metadata': sample_collection['metadata']}
+    assert load_json(path) == expected
+
+    # Yarıda kalan yazım hedef dosyayı değiştirmez
+    with pytest.raises(RuntimeError):
+        with GeoJSONWriter(path) as writer:
+            writer.write(sample_collection['features'][0])
+            raise RuntimeError('yarıda kaldı')
+    assert load_json(path) == expected
+    assert not (tmp_path / 'out.geojson.tmp').exists()
+
+
+def test_writer_ndjson(tmp_path, sample_collection):
+    path = str(tmp_path / 'out.ndjson')
+    with GeoJSONWriter(path, ndjson=True) as writer:
+        for feature in sample_collection['features']:
+            writer.write(feature)
+    with open(path, 'r', encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == sample_collection['features']
+
+
+def test_iter_selected(sample_path):
+    features = load_json(sample_path)['features']
+    wanted = [4, 0, 2]
+    assert list(iter_selected(sample_path, wanted)) == [(i, features[i]) for i in sorted(wanted)]
+    assert list(iter_selected(sample_path, [])) == []
+
+
+def test_property_spool_merge(sample_path):
+    features = load_json(sample_path)['features']
+    spool = PropertySpool()
+    try:
+        spool.put(1, {'combined_risk_score': 50.5})
+        spool.put(3, {'eski': True})
+        spool.put(3, {'combined_risk_score': 80.0, 'weather_data': {'nem': 12}})
+        assert len(spool) == 2
+        assert 3 in spool and 2 not in spool
+        assert spool.get(3) == {'combined_risk_score': 80.0, 'weather_data': {'nem': 12}}
+
+        def pending(feature, i):
+            feature['properties'] = dict(feature.get('properties') or {}, analysis_pending=True)
+            return feature
+
+        merged = list(spool.merge(iter_features(sample_path), pending))
+        assert len(merged) == len(features)
+        for i, feature in enumerate(merged):
+            assert feature['geometry'] == features[i]['geometry']
+            if i in (1, 3):
+                assert feature['properties'] == spool.get(i)
+            else:
+                assert feature['properties'] == dict(features[i]['properties'] or {}, analysis_pending=True)
+    finally:
+        spool.close()
+
+
+def test_iter_selected_in_order(sample_path):
+    features = load_json(sample_path)['features']
+    wanted = [4, 0, 2]
+    assert list(iter_selected_in_order(sample_path, wanted)) == [(i, features[i]) for i in wanted]
+    assert list(iter_selected_in_order(sample_path, [])) == []
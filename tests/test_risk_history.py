@@ -0,0 +1,66 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+from risk_history import RiskHistory, FIELD_NAMES
+
+
+def area(fid, score, level='Orta'):
+    return {'id': fid, 'properties': {'combined_risk_score': score, 'combined_risk_level': level,
+                                      'weather_data': {'sicaklik': 30.0, 'nem': 20.0}}}
+
+
+def scores(history, fid, **kwargs):
+    return [(point['score'], point['source']) for point in history.feature_history(fid, **kwargs)]
+
+
+def test_delta_base_is_reloaded_when_another_process_wrote(tmp_path):
+    path = str(tmp_path / 'history.db')
+    first = RiskHistory(path)
+    second = RiskHistory(path)  # Aynı dosyayı kullanan ikinci süreç
+    start = datetime.now() - timedelta(hours=3)
+
+    first.record_run([area('a', 40.0)], source='lm', ts=start)
+    second.record_run([area('a', 55.0)], source='lm', ts=start + timedelta(hours=1))
+    # first'ün bellekteki tabanı (40) eskidi; delta yeniden okunan tabana (55) göre yazılmalı
+    first.record_run([area('a', 60.0)], source='lm', ts=start + timedelta(hours=2))
+
+    assert scores(RiskHistory(path), 'a') == [(40.0, 'lm'), (55.0, 'lm'), (60.0, 'lm')]
+
+
+def test_sources_keep_separate_series(tmp_path):
+    history = RiskHistory(str(tmp_path / 'history.db'))
+    start = datetime.now() - timedelta(hours=3)
+
+    history.record_run([area('a', 40.0)], source='web', ts=start)
+    history.record_run([area('a', 70.0)], source='lm', ts=start + timedelta(hours=1))
+    # web serisinde değer değişmedi: lm'in 70'i taban alınmaz, yeni satır yazılmaz
+    history.record_run([area('a', 40.0)], source='web', ts=start + timedelta(hours=2))
+
+    assert scores(history, 'a') == [(40.0, 'web'), (70.0, 'lm')]
+    assert scores(history, 'a', source='web') == [(40.0, 'web')]
+
+    # Günün değeri en son çalışan kaynaktan (web) gelir
+    _, values = history.values_at(datetime.now().date())
+    assert values['a']['score'] == 40.0
+    _, values = history.values_at(datetime.now().date(), source='lm')
+    assert values['a']['score'] == 70.0
+
+
+def test_legacy_database_is_migrated(tmp_path):
+    path = str(tmp_path / 'history.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE runs (run_id INTEGER PRIMARY KEY, ts TEXT NOT NULL, source TEXT)")
+    conn.execute(f"""CREATE TABLE points (feature_id TEXT NOT NULL, run_id INTEGER NOT NULL, keyframe INTEGER NOT NULL,
+                     {', '.join(f'd_{name} INTEGER NOT NULL' for name in FIELD_NAMES)}, level TEXT,
+                     PRIMARY KEY (feature_id, run_id)) WITHOUT ROWID""")
+    ts = (datetime.now() - timedelta(hours=1)).isoformat()
+    conn.execute("INSERT INTO runs VALUES (1, ?, 'web')", (ts,))
+    conn.execute("INSERT INTO points VALUES ('a', 1, 1, 400, 300, 200, 0, 0, 'Orta')")
+    conn.commit()
+    conn.close()
+
+    history = RiskHistory(path)
+    assert scores(history, 'a') == [(40.0, 'web')]
+    history.record_run([area('a', 40.0)], source='web')
+    # Yeni kaynak serisi eski karışık seriden bağımsız olarak keyframe ile başlar
+    assert scores(history, 'a') == [(40.0, 'web'), (40.0, 'web')]
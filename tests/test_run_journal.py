@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from run_journal import RunJournal, weather_target
+
+
+def test_weather_target_follows_noon_data():
+    assert weather_target(datetime(2024, 7, 2, 9, 0)) == '2024-07-01T12'
+    assert weather_target(datetime(2024, 7, 2, 12, 15)) == '2024-07-02T12'
+
+
+def test_resume_only_for_same_weather_target(tmp_path):
+    journal = RunJournal(str(tmp_path / 'journal.db'), checkpoint_every=1)
+
+    # Sabah (dünün 12:00 verisi) yarım kalan çalıştırma
+    morning_id, _ = journal.start_or_resume('analyze_all_areas', run_date=weather_target(datetime(2024, 7, 2, 9, 0)))
+    journal.record(morning_id, 'a', {'combined_risk_score': 40.0})
+
+    resumed_id, resumed = journal.start_or_resume('analyze_all_areas', run_date='2024-07-01T12')
+    assert resumed_id == morning_id and resumed == {'a': {'combined_risk_score': 40.0}}
+
+    # 12:15 analizi bugünün verisini hedefler: sabahki sonuçlar devam ettirilmez
+    noon_id, resumed = journal.start_or_resume('analyze_all_areas', run_date=weather_target(datetime(2024, 7, 2, 12, 15)))
+    assert noon_id != morning_id and resumed == {}
+    assert not journal.has_unfinished('analyze_all_areas', '2024-07-01T12')
+
+
+def test_fresh_run_does_not_resume(tmp_path):
+    journal = RunJournal(str(tmp_path / 'journal.db'), checkpoint_every=1)
+    run_id, _ = journal.start_or_resume('analyze_all_areas', run_date='2024-07-02T12')
+    journal.record(run_id, 'a', {'combined_risk_score': 40.0})
+
+    fresh_id, resumed = journal.start_or_resume('analyze_all_areas', run_date='2024-07-02T12', fresh=True)
+    assert fresh_id != run_id and resumed == {}
+    assert journal.start_or_resume('analyze_all_areas', run_date='2024-07-02T12') == (fresh_id, {})
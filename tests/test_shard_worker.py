@@ -0,0 +1,42 @@
+import json
+
+import shard_worker
+from shard_worker import connect, claim_shard, heartbeat, finish_shard, release_shard
+
+
+def plan(conn, job_id, shards):
+    conn.execute("INSERT INTO jobs VALUES (?, '', '', 0, 'running')", (job_id,))
+    conn.executemany("INSERT INTO shards (job_id, shard_id, feature_indices, status) VALUES (?, ?, ?, 'pending')",
+                     [(job_id, n, json.dumps(indices)) for n, indices in enumerate(shards)])
+
+
+def test_only_current_owner_finishes_shard(tmp_path, monkeypatch):
+    conn = connect(str(tmp_path / 'jobs.db'))
+    try:
+        plan(conn, 'job', [[0, 1]])
+        assert claim_shard(conn, 'job', 'a') == (0, [0, 1])
+        assert claim_shard(conn, 'job', 'b') == (None, None)
+
+        # a sinyal veremeden zaman aşımına uğrar, shard b'ye geçer
+        monkeypatch.setattr(shard_worker, 'SHARD_CLAIM_TIMEOUT', -1)
+        assert claim_shard(conn, 'job', 'b') == (0, [0, 1])
+        assert not heartbeat(conn, 'job', 0, 'a')
+        assert not finish_shard(conn, 'job', 0, 'a', 'a.json')
+        assert finish_shard(conn, 'job', 0, 'b', 'b.json')
+        assert conn.execute("SELECT status, worker, result_path FROM shards").fetchone() == ('done', 'b', 'b.json')
+    finally:
+        conn.close()
+
+
+def test_release_returns_shard_to_pending(tmp_path):
+    conn = connect(str(tmp_path / 'jobs.db'))
+    try:
+        plan(conn, 'job', [[0], [1]])
+        assert claim_shard(conn, 'job', 'a') == (0, [0])
+        release_shard(conn, 'job', 0, 'b')  # Sahibi olmayan worker bırakamaz
+        assert claim_shard(conn, 'job', 'b') == (1, [1])
+
+        release_shard(conn, 'job', 0, 'a')
+        assert claim_shard(conn, 'job', 'c') == (0, [0])
+    finally:
+        conn.close()
@@ -0,0 +1,130 @@
+import os
+import json
+import math
+
+from snapshot_store import (Snapshot, write_snapshot, read_snapshot_metadata, archive_path, latest_snapshot,
+                            prune_snapshots, FLOAT_COLUMNS, COORD_SCALE)
+
+
+def assert_same_coordinates(expected, actual):
+    if isinstance(expected, (int, float)):
+        # Koordinatlar 1e-6 dereceye nicemlenir
+        assert abs(expected - actual) <= 0.5 / COORD_SCALE + 1e-12
+        return
+    assert len(expected) == len(actual)
+    for e, a in zip(expected, actual):
+        assert_same_coordinates(e, a)
+
+
+def assert_same_feature(expected, actual):
+    """Snapshot'tan okunan feature json.load sonucuyla aynı mı (float32 skorlar ve nicemlenmiş koordinatlar hariç birebir)"""
+    if expected.get('id') is None:
+        assert 'id' not in actual
+    else:
+        assert actual['id'] == expected['id']
+        assert type(actual['id']) is type(expected['id'])
+
+    expected_properties = expected.get('properties') or {}
+    actual_properties = actual['properties']
+    assert set(actual_properties) == set(expected_properties)
+    for key, value in expected_properties.items():
+        if key in FLOAT_COLUMNS and isinstance(value, float):
+            assert math.isclose(actual_properties[key], value, rel_tol=1e-6), key
+        else:
+            assert actual_properties[key] == value, key
+            assert type(actual_properties[key]) is type(value), key
+
+    geometry = expected.get('geometry')
+    if geometry and geometry['type'] in ('Polygon', 'MultiPolygon'):
+        assert actual['geometry']['type'] == geometry['type']
+        assert_same_coordinates(geometry['coordinates'], actual['geometry']['coordinates'])
+    else:
+        assert actual['geometry'] == geometry
+
+
+def load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_snapshot_matches_json_load(tmp_path, sample_path):
+    expected = load_json(sample_path)
+    path = str(tmp_path / 'sample.snap')
+    write_snapshot(path, expected['features'], expected['metadata'])
+
+    with Snapshot(path) as snapshot:
+        assert len(snapshot) == len(expected['features'])
+        assert snapshot.metadata == expected['metadata']
+        for expected_feature, actual in zip(expected['features'], snapshot.features()):
+            assert_same_feature(expected_feature, actual)
+    assert read_snapshot_metadata(path) == expected['metadata']
+
+
+def test_snapshot_export_matches_json_load(tmp_path, sample_path):
+    expected = load_json(sample_path)
+    snapshot_path = str(tmp_path / 'sample.snap')
+    export_path = str(tmp_path / 'export.geojson')
+    write_snapshot(snapshot_path, expected['features'], expected['metadata'])
+
+    with Snapshot(snapshot_path) as snapshot:
+        snapshot.export_geojson(export_path)
+        streamed = json.loads(''.join(snapshot.iter_geojson_chunks()))
+
+    exported = load_json(export_path)
+    assert exported == streamed
+    assert exported['type'] == 'FeatureCollection'
+    assert exported['metadata'] == expected['metadata']
+    assert len(exported['features']) == len(expected['features'])
+    for expected_feature, actual in zip(expected['features'], exported['features']):
+        assert_same_feature(expected_feature, actual)
+
+
+def test_snapshot_view_without_geometry(tmp_path, sample_path):
+    expected = load_json(sample_path)
+    path = str(tmp_path / 'sample.snap')
+    write_snapshot(path, expected['features'])
+
+    with Snapshot(path) as snapshot:
+        features = snapshot.features(geometry=False)
+        assert len(features) == len(expected['features'])
+        assert features[-1]['properties'] == {}
+        for expected_feature, actual in zip(expected['features'], features):
+            assert actual['geometry'] is None
+            assert_same_feature(dict(expected_feature, geometry=None), actual)
+
+
+def test_snapshot_streams_features_and_late_metadata(tmp_path, sample_path):
+    expected = load_json(sample_path)
+    path = str(tmp_path / 'sample.snap')
+    seen = []
+
+    def features():
+        for feature in expected['features']:
+            seen.append(feature)
+            yield feature
+
+    # Metadata fonksiyonu tüm feature'lar tüketildikten sonra çağrılır
+    write_snapshot(path, features(), lambda: {'total_areas': len(seen)})
+
+    assert read_snapshot_metadata(path) == {'total_areas': len(expected['features'])}
+    with Snapshot(path) as snapshot:
+        for expected_feature, actual in zip(expected['features'], snapshot.features()):
+            assert_same_feature(expected_feature, actual)
+
+
+def test_archive_keeps_latest_snapshots(tmp_path, sample_path):
+    directory = str(tmp_path / 'snapshots')
+    expected = load_json(sample_path)
+    for timestamp in ('20240701_120000', '20240702_120000', '20240703_120000'):
+        write_snapshot(archive_path('export_with_risk_auto', timestamp, directory), expected['features'])
+    write_snapshot(archive_path('export_with_lm_risk', '20240701_130000', directory), expected['features'])
+
+    assert prune_snapshots('export_with_risk_auto', keep=2, directory=directory) == 1
+    assert sorted(os.listdir(directory)) == [
+        'export_with_lm_risk_20240701_130000.snap',
+        'export_with_risk_auto_20240702_120000.snap',
+        'export_with_risk_auto_20240703_120000.snap'
+    ]
+    assert latest_snapshot('export_with_risk_auto', directory=directory).endswith('20240703_120000.snap')
+    assert latest_snapshot('export_with_risk_auto', newer_than=sample_path, directory=directory) is not None
+    assert latest_snapshot('missing', directory=directory) is None
@@ -0,0 +1,249 @@
+import gzip
+import math
+import struct
+
+from vector_tiles import TileStore, encode_tile
+
+# --- Test içi referans MVT çözücü (vector_tile.proto 2.1, modüldeki kodlayıcıdan bağımsız) ---
+
+VARINT, FIXED64, LENGTH_DELIMITED, FIXED32 = 0, 1, 2, 5
+MOVE_TO, LINE_TO, CLOSE_PATH = 1, 2, 7
+POLYGON = 3
+
+
+def read_varint(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def decode_message(data):
+    """Protobuf mesajını [(alan, tel tipi, değer)] listesine çözer"""
+    fields = []
+    pos = 0
+    while pos < len(data):
+        key, pos = read_varint(data, pos)
+        field, wire_type = key >> 3, key & 0x7
+        if wire_type == VARINT:
+            value, pos = read_varint(data, pos)
+        elif wire_type == FIXED64:
+            value, pos = data[pos:pos + 8], pos + 8
+        elif wire_type == LENGTH_DELIMITED:
+            length, pos = read_varint(data, pos)
+            value, pos = data[pos:pos + length], pos + length
+        elif wire_type == FIXED32:
+            value, pos = data[pos:pos + 4], pos + 4
+        else:
+            raise ValueError(f"Desteklenmeyen tel tipi: {wire_type}")
+        fields.append((field, wire_type, value))
+    assert pos == len(data)
+    return fields
+
+
+def decode_packed(data):
+    values = []
+    pos = 0
+    while pos < len(data):
+        value, pos = read_varint(data, pos)
+        values.append(value)
+    return values
+
+
+def unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def decode_value(data):
+    (field, wire_type, value), = decode_message(data)
+    if field == 1:
+        return value.decode('utf-8')
+    if field == 2:
+        return struct.unpack('<f', value)[0]
+    if field == 3:
+        return struct.unpack('<d', value)[0]
+    if field == 4:
+        return value - (1 << 64) if value >= 1 << 63 else value
+    if field == 5:
+        return value
+    if field == 6:
+        return unzigzag(value)
+    if field == 7:
+        return bool(value)
+    raise ValueError(f"Bilinmeyen değer alanı: {field}")
+
+
+def decode_geometry(commands):
+    """Geometri komutlarını tile koordinatlarındaki halkalara çevirir (kapanış noktası tekrarlanmaz)"""
+    rings = []
+    x = y = 0
+    i = 0
+    while i < len(commands):
+        command, count = commands[i] & 0x7, commands[i] >> 3
+        i += 1
+        if command == CLOSE_PATH:
+            assert count == 1
+            continue
+        assert command in (MOVE_TO, LINE_TO)
+        for _ in range(count):
+            x += unzigzag(commands[i])
+            y += unzigzag(commands[i + 1])
+            i += 2
+            if command == MOVE_TO:
+                rings.append([])
+            rings[-1].append((x, y))
+    return rings
+
+
+def decode_tile(data):
+    """Tile'ı {katman adı: katman} sözlüğüne çözer"""
+    layers = {}
+    for field, wire_type, layer_bytes in decode_message(data):
+        assert (field, wire_type) == (3, LENGTH_DELIMITED)
+        layer = {'version': 1, 'extent': 4096, 'features': [], 'keys': [], 'values': []}
+        raw_features = []
+        for field, _, value in decode_message(layer_bytes):
+            if field == 15:
+                layer['version'] = value
+            elif field == 1:
+                layer['name'] = value.decode('utf-8')
+            elif field == 2:
+                raw_features.append(value)
+            elif field == 3:
+                layer['keys'].append(value.decode('utf-8'))
+            elif field == 4:
+                layer['values'].append(decode_value(value))
+            elif field == 5:
+                layer['extent'] = value
+        for raw in raw_features:
+            feature = {'tags': [], 'geometry': []}
+            for field, _, value in decode_message(raw):
+                if field == 1:
+                    feature['id'] = value
+                elif field == 2:
+                    feature['tags'] = decode_packed(value)
+                elif field == 3:
+                    feature['type'] = value
+                elif field == 4:
+                    feature['geometry'] = decode_geometry(decode_packed(value))
+            tags = feature.pop('tags')
+            feature['attributes'] = {layer['keys'][tags[k]]: layer['values'][tags[k + 1]] for k in range(0, len(tags), 2)}
+            layer['features'].append(feature)
+        layers[layer['name']] = layer
+    return layers
+
+
+def ring_area(ring):
+    """Ekran koordinatlarında (y aşağı) alan: MVT'de dış halka pozitif, iç halka negatif"""
+    return sum(ring[k - 1][0] * ring[k][1] - ring[k][0] * ring[k - 1][1] for k in range(len(ring))) / 2
+
+
+def same_cycle(expected, actual):
+    """Halkalar aynı noktaları aynı sırayla mı içeriyor (başlangıç noktasından bağımsız)"""
+    if len(expected) != len(actual) or not expected:
+        return False
+    start = actual.index(expected[0]) if expected[0] in actual else -1
+    return start >= 0 and actual[start:] + actual[:start] == expected
+
+
+def tile_pixel(lon, lat, zoom):
+    """Web Mercator: koordinatın (tile x, tile y, tile içi x, tile içi y) karşılığı"""
+    scale = 2 ** zoom
+    x = (lon + 180.0) / 360.0 * scale
+    lat_rad = math.radians(lat)
+    y = (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * scale
+    return int(x), int(y), (x - int(x)) * 4096, (y - int(y)) * 4096
+
+
+# --- Testler ---
+
+def test_encode_tile_matches_reference_decode():
+    square = [(0, 0), (100, 0), (100, 100), (0, 100)]
+    hole = [(20, 20), (20, 40), (40, 40), (40, 20)]
+    second = [(200, 200), (200, 300), (300, 300), (300, 200)]  # Ters yönde: kodlayıcı çevirmeli
+    attributes_a = {'id': 'a', 'combined_risk_score': 72.5, 'combined_risk_level': 'Yüksek',
+                    'count': 1, 'delta': -4, 'fire_spread_risk': True, 'analysis_failed': False}
+    attributes_b = {'id': 'b', 'combined_risk_score': 72.5, 'combined_risk_level': 'Orta', 'count': 0}
+
+    layers = decode_tile(encode_tile([(1, attributes_a, [[square, hole]]), (2, attributes_b, [[second]])]))
+
+    layer = layers['risk']
+    assert layer['version'] == 2
+    assert layer['extent'] == 4096
+    assert len(layer['keys']) == len(set(layer['keys']))
+    # Değer tablosu tekrarsız; True/1 ve False/0 ayrı tutulur
+    assert len(layer['values']) == len({(type(v), v) for v in layer['values']})
+
+    first, other = layer['features']
+    assert (first['id'], first['type']) == (1, POLYGON)
+    assert (other['id'], other['type']) == (2, POLYGON)
+    assert first['attributes'] == attributes_a
+    assert {key: type(value) for key, value in first['attributes'].items()} == {key: type(value) for key, value in attributes_a.items()}
+    assert other['attributes'] == attributes_b
+
+    outer, inner = first['geometry']
+    assert same_cycle(square, outer) and ring_area(outer) > 0
+    assert same_cycle(hole, inner) and ring_area(inner) < 0
+    ring, = other['geometry']
+    assert same_cycle(second[::-1], ring) and ring_area(ring) > 0
+
+
+def test_tile_store_tiles_match_reference_decode(tmp_path, sample_collection):
+    zoom = 10
+    store = TileStore(str(tmp_path / 'tiles.mbtiles'), min_zoom=zoom, max_zoom=zoom)
+    features = sample_collection['features']
+    store.build(features)
+
+    target = next(feature for feature in features if feature.get('id') == 7)
+    outer, hole = target['geometry']['coordinates']
+    corners = [tile_pixel(lon, lat, zoom) for lon, lat in outer[:-1]]
+    assert len({(tx, ty) for tx, ty, _, _ in corners}) == 1  # Alan tek tile'da
+    tx, ty = corners[0][:2]
+
+    data, etag = store.get_tile(zoom, tx, ty)
+    layer = decode_tile(gzip.decompress(bytes(data)))['risk']
+    assert len({feature['id'] for feature in layer['features']}) == len(layer['features'])
+
+    decoded, = [feature for feature in layer['features'] if feature['attributes']['id'] == '7']
+    assert decoded['type'] == POLYGON
+    assert decoded['attributes'] == {
+        'id': '7', 'name': 'Çamlık Orman Alanı – Güney', 'landuse': 123, 'area': 12.345678901234,
+        'combined_risk_score': 72.35, 'combined_risk_level': 'Yüksek', 'risk_skoru': 40,
+        'fire_spread_risk': True, 'analysis_failed': False
+    }
+
+    # Geometri: referans projeksiyonla bulunan köşeler (yuvarlama payı 1 piksel)
+    decoded_outer, decoded_hole = decoded['geometry']
+    assert ring_area(decoded_outer) > 0 and ring_area(decoded_hole) < 0
+    for ring, decoded_ring in ((outer, decoded_outer), (hole, decoded_hole)):
+        expected = [tile_pixel(lon, lat, zoom)[2:] for lon, lat in ring[:-1]]
+        assert len(decoded_ring) == len(expected)
+        for px, py in expected:
+            assert any(abs(px - x) <= 1 and abs(py - y) <= 1 for x, y in decoded_ring)
+
+    # Alan sonuçtan çıkınca tile'ı yeniden kodlanır; diğer alanların MVT id'leri değişmez
+    feature_ids = {feature['id'] for feature in layer['features']}
+    assert len(feature_ids) > 1
+    store.build([feature for feature in features if feature is not target])
+    data, new_etag = store.get_tile(zoom, tx, ty)
+    remaining = decode_tile(gzip.decompress(bytes(data)))['risk']['features']
+    assert {feature['id'] for feature in remaining} == feature_ids - {decoded['id']}
+    assert new_etag != etag
+
+    # Hiç alan kalmayan tile saklanmaz
+    store.build([])
+    assert store.get_tile(zoom, tx, ty) is None
+
+
+def test_get_tile_rejects_out_of_range_coordinates(tmp_path, sample_collection):
+    store = TileStore(str(tmp_path / 'tiles.mbtiles'), min_zoom=8, max_zoom=10)
+    store.build(sample_collection['features'])
+
+    assert store.in_range(10, 1023, 1023) and store.in_range(0, 0, 0)
+    for z, x, y in ((11, 0, 0), (10, 1024, 0), (10, 0, 1024), (10, -1, 0), (10 ** 6, 0, 0)):
+        assert not store.in_range(z, x, y)
+        assert store.get_tile(z, x, y) is None
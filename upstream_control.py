@@ -0,0 +1,278 @@
+import os
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from quota_budget import quota_budget
+from metrics import UPSTREAM_CONCURRENCY_LIMIT, UPSTREAM_RETRIES, UPSTREAM_CIRCUIT_OPEN, UPSTREAM_SHORT_CIRCUITS
+
+# Yeniden deneme ve geri çekilme (backoff) ayarları
+UPSTREAM_MAX_RETRIES = int(os.environ.get('UPSTREAM_MAX_RETRIES', 2))
+BACKOFF_BASE = 0.5  # saniye
+BACKOFF_CAP = float(os.environ.get('UPSTREAM_BACKOFF_CAP', 30))  # Bundan uzun Retry-After beklenmez, hızlıca düşülür
+
+# Devre kesici ayarları
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', 5))  # Art arda hata sayısı
+CIRCUIT_RESET_SECONDS = float(os.environ.get('CIRCUIT_RESET_SECONDS', 60))  # Açık kalma süresi, sonra tek deneme
+
+# AIMD ayarları
+DECREASE_FACTOR = 0.5  # 429 / 5xx / zaman aşımında limit yarıya iner
+SLOW_DECREASE_FACTOR = 0.9  # Gecikme hedefin üstündeyse hafif azaltma
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Devre açıkken çağrı yapılmadan fırlatılır; çağıran cache'e veya deterministik sonuca düşer"""
+
+
+class UpstreamOverloaded(Exception):
+    """429 / 5xx gibi servis kaynaklı, yeniden denenebilir hata"""
+
+    def __init__(self, message, status_code=None, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value):
+    """Retry-After başlığını saniyeye çevirir (saniye ya da HTTP tarihi)"""
+    if value in (None, ''):
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def is_overload_status(status_code):
+    return status_code == 429 or (status_code is not None and status_code >= 500)
+
+
+def raise_for_overload(response):
+    """HTTP yanıtı 429 / 5xx ise UpstreamOverloaded fırlatır; diğer yanıtları değiştirmez"""
+    if is_overload_status(response.status_code):
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        raise UpstreamOverloaded(f"HTTP {response.status_code}", response.status_code, retry_after)
+    return response
+
+
+def overload_from_exception(error):
+    """SDK hatası (ör. groq.RateLimitError) 429 / 5xx ise UpstreamOverloaded'a çevirir, değilse None"""
+    status_code = getattr(error, 'status_code', None)
+    if not is_overload_status(status_code):
+        return None
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    return UpstreamOverloaded(str(error), status_code, parse_retry_after(headers.get('retry-after')))
+
+
+class UpstreamController:
+    """
+    Bir dış servis için eşzamanlılık limiti (AIMD), Retry-After'a uyan sapmalı üstel
+    geri çekilme ve devre kesici. Aynı API anahtarını kullanan tüm çağrılar aynı
+    denetleyiciyi paylaşır.
+    """
+
+    def __init__(self, name, max_concurrency, min_concurrency=1, latency_target=2.0,
+                 max_retries=UPSTREAM_MAX_RETRIES, failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+                 reset_seconds=CIRCUIT_RESET_SECONDS):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.latency_target = latency_target
+        self.max_retries = max_retries
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.reset()
+
+    def reset(self):
+        """Limit, devre kesici ve sayaçları başlangıç durumuna döndürür (benchmark / test için)"""
+        with self.condition:
+            self.limit = float(self.max_concurrency)
+            self.paused_until = 0.0  # Retry-After süresince yeni çağrı başlatılmaz
+            self.last_decrease = 0.0
+
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self.probe_in_flight = False
+            self.stats = {'calls': 0, 'overloaded': 0, 'failures': 0, 'retries': 0, 'short_circuited': 0}
+            UPSTREAM_CONCURRENCY_LIMIT.labels(self.name).set(self.limit)
+            UPSTREAM_CIRCUIT_OPEN.labels(self.name).set(0)
+            self.condition.notify_all()
+
+    # --- Devre kesici ---
+
+    def available(self):
+        """Devre çağrıya izin veriyor mu (yan etkisiz kontrol)"""
+        with self.condition:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                return time.time() - self.opened_at >= self.reset_seconds
+            return not self.probe_in_flight
+
+    def _enter_circuit(self):
+        with self.condition:
+            if self.state == OPEN and time.time() - self.opened_at >= self.reset_seconds:
+                self.state = HALF_OPEN
+                self.probe_in_flight = False
+            if self.state == OPEN or (self.state == HALF_OPEN and self.probe_in_flight):
+                self.stats['short_circuited'] += 1
+                UPSTREAM_SHORT_CIRCUITS.labels(self.name).inc()
+                raise CircuitOpenError(f"{self.name} devresi açık")
+            if self.state == HALF_OPEN:
+                self.probe_in_flight = True  # Devre yarı açıkken tek deneme çağrısı
+
+    def _record_success(self, latency):
+        with self.condition:
+            self.consecutive_failures = 0
+            self.probe_in_flight = False
+            if self.state != CLOSED:
+                logging.info(f"{self.name} devresi kapandı")
+                self.state = CLOSED
+                UPSTREAM_CIRCUIT_OPEN.labels(self.name).set(0)
+            if latency > self.latency_target:
+                self._decrease(SLOW_DECREASE_FACTOR)
+            else:
+                # Additive increase: yaklaşık limit kadar başarılı çağrıda +1
+                self._set_limit(self.limit + 1.0 / self.limit)
+
+    def _record_failure(self, overloaded):
+        with self.condition:
+            self.stats['failures'] += 1
+            if overloaded:
+                self.stats['overloaded'] += 1
+                self._decrease(DECREASE_FACTOR)
+            self.consecutive_failures += 1
+            self.probe_in_flight = False
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logging.warning(f"{self.name} devresi açıldı ({self.consecutive_failures} ardışık hata), "
+                                    f"{self.reset_seconds:.0f} sn boyunca cache / deterministik sonuç kullanılacak")
+                self.state = OPEN
+                self.opened_at = time.time()
+                UPSTREAM_CIRCUIT_OPEN.labels(self.name).set(1)
+
+    # --- AIMD eşzamanlılık limiti ---
+
+    def _set_limit(self, value):
+        self.limit = min(float(self.max_concurrency), max(float(self.min_concurrency), value))
+        UPSTREAM_CONCURRENCY_LIMIT.labels(self.name).set(self.limit)
+        self.condition.notify_all()
+
+    def _decrease(self, factor):
+        # Aynı anda dönen hatalar limiti tek seferde tabana indirmesin
+        now = time.time()
+        if now - self.last_decrease < self.latency_target:
+            return
+        self.last_decrease = now
+        self._set_limit(self.limit * factor)
+
+    def _acquire(self):
+        with self.condition:
+            while True:
+                wait = self.paused_until - time.time()
+                if wait <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    self.stats['calls'] += 1
+                    return
+                self.condition.wait(timeout=wait if wait > 0 else None)
+
+    def _release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify()
+
+    def pause(self, seconds):
+        """Retry-After süresince tüm çağrıları bekletir"""
+        with self.condition:
+            self.paused_until = max(self.paused_until, time.time() + seconds)
+
+    # --- Çağrı ---
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """Retry-After varsa ona uyar; yoksa tam sapmalı (full jitter) üstel geri çekilme"""
+        if retry_after is not None:
+            return retry_after + random.uniform(0, BACKOFF_BASE)
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+    def call(self, fn, transient=(), throttle=None):
+        """
+        fn'i eşzamanlılık limiti içinde çağırır. UpstreamOverloaded ve transient hatalar
+        geri çekilmeyle yeniden denenir; son hata çağırana iletilir. Devre açıksa
+        CircuitOpenError fırlatılır.
+        throttle (rate limit beklemesi) her denemeden önce, eşzamanlılık slotu alınmadan
+        çağrılır; bekleme süresi gecikme ölçümüne girmez ve AIMD limitini düşürmez.
+        """
+        attempt = 0
+        while True:
+            self._enter_circuit()
+            if throttle is not None:
+                throttle()
+            self._acquire()
+            start = time.perf_counter()
+            try:
+                result = fn()
+            except UpstreamOverloaded as e:
+                error, retry_after, overloaded = e, e.retry_after, True
+            except transient as e:
+                error, retry_after, overloaded = e, None, True
+            except Exception:
+                self._record_failure(False)
+                raise
+            else:
+                self._record_success(time.perf_counter() - start)
+                return result
+            finally:
+                self._release()
+                # Her deneme aylık kotadan düşülür (başarısız olanlar da)
+                quota_budget.record(self.name)
+
+            self._record_failure(overloaded)
+            delay = self.backoff_delay(attempt, retry_after)
+            if attempt >= self.max_retries or delay > BACKOFF_CAP:
+                raise error
+            if retry_after is not None:
+                self.pause(retry_after)
+            attempt += 1
+            with self.condition:
+                self.stats['retries'] += 1
+            UPSTREAM_RETRIES.labels(self.name).inc()
+            logging.warning(f"{self.name} aşırı yük ({error}), {delay:.1f} sn sonra tekrar denenecek ({attempt}/{self.max_retries})")
+            time.sleep(delay)
+
+    def status(self):
+        with self.condition:
+            return {
+                'state': self.state,
+                'concurrency_limit': round(self.limit, 2),
+                'in_flight': self.in_flight,
+                'consecutive_failures': self.consecutive_failures,
+                'paused_for': round(max(0.0, self.paused_until - time.time()), 1),
+                **self.stats
+            }
+
+
+# Servis başına paylaşılan denetleyiciler (aynı API anahtarını kullanan tüm yollar için)
+WEATHER_MAX_CONCURRENCY = int(os.environ.get('WEATHER_MAX_CONCURRENCY', 4))
+GROQ_MAX_CONCURRENCY = int(os.environ.get('GROQ_MAX_CONCURRENCY', 4))
+
+weather_controller = UpstreamController('weatherapi', WEATHER_MAX_CONCURRENCY, latency_target=2.0)
+# Groq SDK 429 / 5xx'i Retry-After'a uyarak kendisi yeniden dener; burada ek deneme yapılmaz
+groq_controller = UpstreamController('groq', GROQ_MAX_CONCURRENCY, latency_target=10.0, max_retries=0)
+
+
+def upstream_status():
+    """/analysis_status için servis başına denetleyici durumu"""
+    return {controller.name: controller.status() for controller in (weather_controller, groq_controller)}
@@ -0,0 +1,485 @@
+import os
+import math
+import gzip
+import struct
+import sqlite3
+import hashlib
+import threading
+import json
+from datetime import datetime
+from spatial_index import feature_id, risk_properties, geometry_polygons, polygons_bbox
+from geometry_simplifier import zoom_tolerance, simplify_ring
+
+# Vektör tile ayarları
+TILE_DB_PATH = os.environ.get('TILE_DB_PATH', 'data/risk_tiles.mbtiles')  # static/ dışında: tile'lar sadece /tiles ile sunulur
+TILE_MIN_ZOOM = int(os.environ.get('TILE_MIN_ZOOM', 8))
+TILE_MAX_ZOOM = int(os.environ.get('TILE_MAX_ZOOM', 12))
+TILE_EXTENT = 4096  # MVT tile koordinat çözünürlüğü
+TILE_BUFFER = 64  # Kenar çizgilerinin kesilmemesi için tile dışı pay
+LAYER_NAME = 'risk'
+MAX_MERCATOR_LAT = 85.05112878
+
+
+# --- Protobuf kodlama yardımcıları ---
+
+def _varint(value):
+    """Protobuf varint kodlaması"""
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 31)
+
+
+def _key(field, wire_type):
+    return _varint((field << 3) | wire_type)
+
+
+def _length_delimited(field, payload):
+    return _key(field, 2) + _varint(len(payload)) + payload
+
+
+def _packed(field, values):
+    return _length_delimited(field, b''.join(_varint(v) for v in values))
+
+
+def _encode_value(value):
+    """MVT Value mesajı"""
+    if isinstance(value, bool):
+        return _key(7, 0) + _varint(1 if value else 0)
+    if isinstance(value, int):
+        if value >= 0:
+            return _key(5, 0) + _varint(value)
+        return _key(6, 0) + _varint((value << 1) ^ (value >> 63))
+    if isinstance(value, float):
+        return _key(3, 1) + struct.pack('<d', value)
+    return _length_delimited(1, str(value).encode('utf-8'))
+
+
+# --- Geometri yardımcıları ---
+
+def lonlat_to_global(lon, lat, zoom):
+    """Koordinatı zoom seviyesindeki global tile koordinatına (tile birimi) çevirir"""
+    lat = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, lat))
+    scale = 2 ** zoom
+    x = (lon + 180.0) / 360.0 * scale
+    lat_rad = math.radians(lat)
+    y = (1.0 - math.log(math.tan(lat_rad) + 1.0 / math.cos(lat_rad)) / math.pi) / 2.0 * scale
+    return x, y
+
+
+def tile_range(bbox, zoom):
+    """bbox'ı kapsayan tile aralığı: (min_x, min_y, max_x, max_y)"""
+    max_index = 2 ** zoom - 1
+    x0, y1 = lonlat_to_global(bbox[0], bbox[1], zoom)
+    x1, y0 = lonlat_to_global(bbox[2], bbox[3], zoom)
+    return (
+        max(0, int(x0)),
+        max(0, int(y0)),
+        min(max_index, int(x1)),
+        min(max_index, int(y1))
+    )
+
+
+def _clip_ring(ring, min_v, max_v):
+    """Sutherland-Hodgman ile halkayı kare pencereye kırpar"""
+    def clip(points, inside, intersect):
+        if not points:
+            return points
+        result = []
+        prev = points[-1]
+        prev_in = inside(prev)
+        for point in points:
+            cur_in = inside(point)
+            if cur_in:
+                if not prev_in:
+                    result.append(intersect(prev, point))
+                result.append(point)
+            elif prev_in:
+                result.append(intersect(prev, point))
+            prev, prev_in = point, cur_in
+        return result
+
+    def at_x(x):
+        return lambda a, b: (x, a[1] + (b[1] - a[1]) * (x - a[0]) / (b[0] - a[0]))
+
+    def at_y(y):
+        return lambda a, b: (a[0] + (b[0] - a[0]) * (y - a[1]) / (b[1] - a[1]), y)
+
+    points = clip(ring, lambda p: p[0] >= min_v, at_x(min_v))
+    points = clip(points, lambda p: p[0] <= max_v, at_x(max_v))
+    points = clip(points, lambda p: p[1] >= min_v, at_y(min_v))
+    points = clip(points, lambda p: p[1] <= max_v, at_y(max_v))
+    return points
+
+
+def _signed_area(ring):
+    area = 0
+    for i in range(len(ring)):
+        x1, y1 = ring[i - 1]
+        x2, y2 = ring[i]
+        area += x1 * y2 - x2 * y1
+    return area
+
+
+def _encode_geometry(polygons):
+    """Tile koordinatlarındaki poligonları MVT geometri komutlarına çevirir"""
+    commands = []
+    cursor_x = cursor_y = 0
+    for polygon in polygons:
+        for ring_index, ring in enumerate(polygon):
+            # MVT: dış halka pozitif, iç halkalar negatif alanlı olmalı
+            area = _signed_area(ring)
+            if (ring_index == 0 and area < 0) or (ring_index > 0 and area > 0):
+                ring = ring[::-1]
+
+            x, y = ring[0]
+            commands.append((1 & 0x7) | (1 << 3))  # MoveTo
+            commands.append(_zigzag(x - cursor_x))
+            commands.append(_zigzag(y - cursor_y))
+            cursor_x, cursor_y = x, y
+
+            commands.append((2 & 0x7) | ((len(ring) - 1) << 3))  # LineTo
+            for x, y in ring[1:]:
+                commands.append(_zigzag(x - cursor_x))
+                commands.append(_zigzag(y - cursor_y))
+                cursor_x, cursor_y = x, y
+
+            commands.append((7 & 0x7) | (1 << 3))  # ClosePath
+    return commands
+
+
+def _tile_polygons(polygons, zoom, tx, ty):
+    """Poligonları tek bir tile'ın tam sayı koordinatlarına projekte edip kırpar"""
+    min_v = -TILE_BUFFER
+    max_v = TILE_EXTENT + TILE_BUFFER
+    result = []
+    for polygon in polygons:
+        rings = []
+        for ring_index, ring in enumerate(polygon):
+            projected = []
+            for point in ring:
+                gx, gy = lonlat_to_global(point[0], point[1], zoom)
+                projected.append(((gx - tx) * TILE_EXTENT, (gy - ty) * TILE_EXTENT))
+            clipped = _clip_ring(projected, min_v, max_v)
+
+            # Tam sayıya yuvarla ve ardışık tekrarları at
+            ints = []
+            for x, y in clipped:
+                point = (int(round(x)), int(round(y)))
+                if not ints or ints[-1] != point:
+                    ints.append(point)
+            if len(ints) > 1 and ints[0] == ints[-1]:
+                ints.pop()
+
+            if len(ints) < 3 or _signed_area(ints) == 0:
+                if ring_index == 0:
+                    break
+                continue
+            rings.append(ints)
+        if rings:
+            result.append(rings)
+    return result
+
+
+def _tile_attributes(feature, index):
+    """Tile'a yazılacak risk öznitelikleri (None değerler hariç)"""
+    attributes = {}
+    for key, value in risk_properties(feature, index).items():
+        if value is None or isinstance(value, (dict, list)):
+            continue
+        attributes[key] = value
+    return attributes
+
+
+def _geometry_payload(polygons):
+    """Poligonların MVT geometri komutları, packed varint olarak kodlanmış"""
+    return b''.join(_varint(v) for v in _encode_geometry(polygons))
+
+
+def _encode_layer(tile_features):
+    """
+    Katmanı kodlar.
+    tile_features: [(numeric_id, attributes, geometry_payload)]
+    """
+    keys = []
+    key_index = {}
+    values = []
+    value_index = {}
+    encoded_features = []
+
+    for numeric_id, attributes, geometry in tile_features:
+        tags = []
+        for key, value in attributes.items():
+            if key not in key_index:
+                key_index[key] = len(keys)
+                keys.append(key)
+            value_key = (type(value).__name__, value)
+            if value_key not in value_index:
+                value_index[value_key] = len(values)
+                values.append(value)
+            tags.append(key_index[key])
+            tags.append(value_index[value_key])
+
+        feature_bytes = (
+            _key(1, 0) + _varint(numeric_id) +
+            _packed(2, tags) +
+            _key(3, 0) + _varint(3) +  # POLYGON
+            _length_delimited(4, geometry)
+        )
+        encoded_features.append(_length_delimited(2, feature_bytes))
+
+    layer = (
+        _key(15, 0) + _varint(2) +
+        _length_delimited(1, LAYER_NAME.encode('utf-8')) +
+        b''.join(encoded_features) +
+        b''.join(_length_delimited(3, key.encode('utf-8')) for key in keys) +
+        b''.join(_length_delimited(4, _encode_value(value)) for value in values) +
+        _key(5, 0) + _varint(TILE_EXTENT)
+    )
+    return _length_delimited(3, layer)
+
+
+def encode_tile(tile_features):
+    """
+    Tile içeriğini MVT (protobuf) olarak kodlar.
+    tile_features: [(numeric_id, attributes, polygons)]
+    """
+    return _encode_layer([(numeric_id, attributes, _geometry_payload(polygons))
+                          for numeric_id, attributes, polygons in tile_features])
+
+
+# Tile'lar ve her feature'ın tile başına kodlanmış parçaları. tile_parts sayesinde bir tile,
+# içindeki diğer feature'ların kaynağı okunmadan yeniden kodlanabilir.
+TILE_SCHEMA = [
+    "CREATE TABLE metadata (name TEXT PRIMARY KEY, value TEXT)",
+    """CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER,
+       tile_row INTEGER, tile_data BLOB, etag TEXT)""",
+    "CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row)",
+    # id: tile'daki MVT feature id'si (feature silinmedikçe değişmez)
+    """CREATE TABLE tile_features (id INTEGER PRIMARY KEY, fid TEXT UNIQUE NOT NULL, digest TEXT NOT NULL,
+       attributes TEXT NOT NULL, minx REAL, miny REAL, maxx REAL, maxy REAL, seen INTEGER NOT NULL DEFAULT 1)""",
+    # Feature'ın tile koordinatlarına kırpılmış geometrisi (y XYZ düzeninde)
+    """CREATE TABLE tile_parts (zoom INTEGER, x INTEGER, y INTEGER, feature INTEGER, geometry BLOB,
+       PRIMARY KEY (zoom, x, y, feature)) WITHOUT ROWID""",
+    "CREATE INDEX tile_parts_feature ON tile_parts (feature)"
+]
+TILE_SCHEMA_VERSION = '2'  # Şema değişirse mevcut dosya baştan üretilir
+
+
+class TileStore:
+    """
+    Analiz sonuçlarından üretilen vektör tile'ları MBTiles benzeri bir SQLite
+    dosyasında tutar. Tile'lar analiz bittikten sonra önceden üretilir; her feature'ın
+    içerik özeti saklandığı için sadece değişen (veya silinen) feature'ların düştüğü
+    tile'lar yeniden kodlanır. Güncelleme tek transaction'dır, okuyucular eski ya da
+    yeni tile'ları görür.
+    """
+
+    def __init__(self, db_path=TILE_DB_PATH, min_zoom=TILE_MIN_ZOOM, max_zoom=TILE_MAX_ZOOM):
+        self.db_path = db_path
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.build_lock = threading.Lock()
+        self.local = threading.local()
+
+    def build(self, features):
+        """Tile'ları tam sonuçla eşitler: değişen feature'lar güncellenir, sonuçta olmayanlar silinir"""
+        return self._sync(features, complete=True)
+
+    def update(self, features, indices):
+        """
+        Sadece 'indices' sıra numaralarındaki feature'ların tile'larını günceller (ara
+        sonuçlar için; silme yapılmaz). Kimlikler sıraya bağlı olabildiğinden akışın tamamı verilir.
+        """
+        return self._sync(features, complete=False, indices=set(indices))
+
+    def _compatible(self, conn):
+        """Mevcut dosya bu şema ve zoom aralığıyla mı üretilmiş"""
+        try:
+            settings = dict(conn.execute(
+                "SELECT name, value FROM metadata WHERE name IN ('schema_version', 'minzoom', 'maxzoom')"
+            ).fetchall())
+        except sqlite3.OperationalError:
+            return False
+        return settings == {'schema_version': TILE_SCHEMA_VERSION, 'minzoom': str(self.min_zoom), 'maxzoom': str(self.max_zoom)}
+
+    def _reset(self, conn):
+        """Eski biçimdeki tabloları transaction içinde silip şemayı yeniden oluşturur"""
+        for table in ('tiles', 'metadata', 'tile_features', 'tile_parts'):
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+        for statement in TILE_SCHEMA:
+            conn.execute(statement)
+
+    def _add_parts(self, conn, numeric_id, polygons, bbox):
+        """Feature'ı her zoom'da kapsadığı tile'lara kırpıp kaydeder; etkilenen tile'ları döndürür"""
+        touched = []
+        rows = []
+        for zoom in range(self.min_zoom, self.max_zoom + 1):
+            tolerance = zoom_tolerance(zoom)
+            simplified = [
+                [r for r in (simplify_ring(ring, tolerance, is_outer=(j == 0))
+                             for j, ring in enumerate(polygon)) if r]
+                for polygon in polygons
+            ]
+            min_x, min_y, max_x, max_y = tile_range(bbox, zoom)
+            for tx in range(min_x, max_x + 1):
+                for ty in range(min_y, max_y + 1):
+                    tile_polygons = _tile_polygons(simplified, zoom, tx, ty)
+                    if tile_polygons:
+                        rows.append((zoom, tx, ty, numeric_id, _geometry_payload(tile_polygons)))
+                        touched.append((zoom, tx, ty))
+        conn.executemany("INSERT INTO tile_parts VALUES (?, ?, ?, ?, ?)", rows)
+        return touched
+
+    def _remove_parts(self, conn, numeric_id):
+        """Feature'ın kayıtlı parçalarını siler; bulunduğu tile'ları döndürür"""
+        touched = conn.execute("SELECT zoom, x, y FROM tile_parts WHERE feature = ?", (numeric_id,)).fetchall()
+        conn.execute("DELETE FROM tile_parts WHERE feature = ?", (numeric_id,))
+        return touched
+
+    def _encode_tiles(self, conn, tiles):
+        """Tile'ları kayıtlı parçalarından yeniden kodlar; parçası kalmayan tile silinir"""
+        for zoom, tx, ty in sorted(tiles):
+            # MBTiles TMS satır düzenini kullanır (y ekseni ters)
+            tile_row = (2 ** zoom - 1) - ty
+            parts = conn.execute(
+                """SELECT p.feature, f.attributes, p.geometry FROM tile_parts p JOIN tile_features f ON f.id = p.feature
+                   WHERE p.zoom = ? AND p.x = ? AND p.y = ? ORDER BY p.feature""",
+                (zoom, tx, ty)
+            ).fetchall()
+            if not parts:
+                conn.execute("DELETE FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?", (zoom, tx, tile_row))
+                continue
+            data = gzip.compress(_encode_layer([(numeric_id, json.loads(attributes), geometry)
+                                                for numeric_id, attributes, geometry in parts]), mtime=0)
+            conn.execute("INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?, ?)",
+                         (zoom, tx, tile_row, data, hashlib.md5(data).hexdigest()))
+
+    def _sync(self, features, complete, indices=None):
+        with self.build_lock:
+            start_time = datetime.now()
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    if not self._compatible(conn):
+                        # Dosya yok, eski biçimde ya da zoom aralığı değişmiş: baştan üretilir
+                        self._reset(conn)
+                    if complete:
+                        conn.execute("UPDATE tile_features SET seen = 0")
+
+                    dirty = set()
+                    changed = 0
+                    for i, feature in enumerate(features):
+                        if indices is not None and i not in indices:
+                            continue
+                        polygons = geometry_polygons(feature.get('geometry'))
+                        bbox = polygons_bbox(polygons)
+                        if bbox is None:
+                            continue
+                        fid = feature_id(feature, i)
+                        attributes = _tile_attributes(feature, i)
+                        digest = hashlib.md5(json.dumps([attributes, polygons], ensure_ascii=False, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+                        row = conn.execute("SELECT id, digest FROM tile_features WHERE fid = ?", (fid,)).fetchone()
+                        if row is not None and row[1] == digest:
+                            if complete:
+                                conn.execute("UPDATE tile_features SET seen = 1 WHERE id = ?", (row[0],))
+                            continue
+
+                        encoded_attributes = json.dumps(attributes, ensure_ascii=False, separators=(',', ':'))
+                        if row is None:
+                            numeric_id = conn.execute(
+                                "INSERT INTO tile_features (fid, digest, attributes, minx, miny, maxx, maxy) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                (fid, digest, encoded_attributes) + tuple(bbox)
+                            ).lastrowid
+                        else:
+                            numeric_id = row[0]
+                            dirty.update(self._remove_parts(conn, numeric_id))
+                            conn.execute(
+                                """UPDATE tile_features SET digest = ?, attributes = ?, minx = ?, miny = ?, maxx = ?, maxy = ?, seen = 1
+                                   WHERE id = ?""",
+                                (digest, encoded_attributes) + tuple(bbox) + (numeric_id,)
+                            )
+                        dirty.update(self._add_parts(conn, numeric_id, polygons, bbox))
+                        changed += 1
+
+                    # Tam sonuçta bulunmayan feature'lar tile'lardan çıkarılır
+                    removed = 0
+                    if complete:
+                        for (numeric_id,) in conn.execute("SELECT id FROM tile_features WHERE seen = 0").fetchall():
+                            dirty.update(self._remove_parts(conn, numeric_id))
+                            removed += 1
+                        conn.execute("DELETE FROM tile_features WHERE seen = 0")
+
+                    self._encode_tiles(conn, dirty)
+
+                    bounds = conn.execute("SELECT MIN(minx), MIN(miny), MAX(maxx), MAX(maxy) FROM tile_features").fetchone()
+                    metadata = {
+                        'name': 'Orman yangını risk katmanı',
+                        'format': 'pbf',
+                        'minzoom': str(self.min_zoom),
+                        'maxzoom': str(self.max_zoom),
+                        'bounds': ','.join(str(v) for v in bounds) if bounds[0] is not None else '',
+                        'generated_at': datetime.now().isoformat(),
+                        'json': json.dumps({'vector_layers': [{'id': LAYER_NAME, 'minzoom': self.min_zoom, 'maxzoom': self.max_zoom}]}),
+                        'schema_version': TILE_SCHEMA_VERSION
+                    }
+                    conn.executemany("INSERT OR REPLACE INTO metadata VALUES (?, ?)", metadata.items())
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+            finally:
+                conn.close()
+
+            duration = (datetime.now() - start_time).total_seconds()
+            print(f"Vektör tile'lar güncellendi: {changed} değişen, {removed} silinen alan, "
+                  f"{len(dirty)} tile yeniden kodlandı, {duration:.2f} saniye")
+            return len(dirty)
+
+    def _connection(self):
+        """Thread başına okuma bağlantısı; dosya yenilendiyse yeniden açılır"""
+        mtime = os.path.getmtime(self.db_path)
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.mtime != mtime:
+            if conn is not None:
+                conn.close()
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            self.local.conn = conn
+            self.local.mtime = mtime
+        return conn
+
+    def available(self):
+        return os.path.exists(self.db_path)
+
+    def in_range(self, z, x, y):
+        """Tile koordinatı üretilen zoom aralığında ve o zoom'un ızgarasında mı"""
+        return 0 <= z <= self.max_zoom and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+    def get_tile(self, z, x, y):
+        """Tile verisini ve ETag'ini döndürür, tile yoksa (veya koordinat geçersizse) None"""
+        if not self.in_range(z, x, y) or not self.available():
+            return None
+        row = self._connection().execute(
+            "SELECT tile_data, etag FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+            (z, x, (2 ** z - 1) - y)
+        ).fetchone()
+        return row
+
+
+# Global tile store instance
+tile_store = TileStore()